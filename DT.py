@@ -1,22 +1,93 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, abort, g, jsonify, request
 from datetime import datetime
+from functools import lru_cache
+import json
+import os
 import random
-from flask_socketio import SocketIO
+import time
+from flask_socketio import SocketIO, emit, join_room, leave_room
+from fleet_store import ColumnDelta, FleetStore
+from delta_log import DeltaLog
+from refresh_engine import RefreshEngine, DRIFT_STEPS
+from simulation import Simulation
+from ingest import TelemetryIngestor, TelemetryError
+from http_cache import CachedBody
+from assets import AssetPipeline
+from pc_query import QueryError, collect_pcs, parse_fields, parse_filters, parse_page, parse_selector, stream_pcs
+from persistence import StateJournal
+import layout
+from history import History, parse_range
+from cluster import ClusterClient, RemoteSimulation
+from commands import CommandQueue
+from actions import EVENT_ACTIONS, STATUSES, ActionError, ActionMachine
+from views import ViewError, ViewRegistry, parse_view, wire_view
+import outbound
+from outbound import Backpressure, Coalescer
+from metrics import SIZE_BUCKETS, Registry, SamplingProfiler, count_packets, timed
+import codec
 
-app = Flask(__name__)
-socketio = SocketIO(app)
-pcs_data = []
+# Snapshot + change log directory; set DT_STATE_DIR to '' to run without persistence
+STATE_DIR = os.environ.get('DT_STATE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'state'))
+# host:port of a cluster broker (python cluster.py); when set this process is
+# one of several workers sharing the broker's fleet instead of owning one
+BROKER = os.environ.get('DT_BROKER')
+# JSON layout config (see layouts/) used when a fresh lab is generated
+LAYOUT = os.environ.get('DT_LAYOUT')
+# Deltas to socket clients are merged per PC for this long; 0 sends each one immediately
+EMIT_WINDOW = float(os.environ.get('DT_EMIT_WINDOW_MS', outbound.WINDOW * 1e3)) / 1e3
 
-def initialize_pcs():
-    global pcs_data
-    pcs_data = []
+app = Flask(__name__, static_folder=None)
+assets = AssetPipeline()
+# serve.py picks the async mode (and monkey patches) before importing this
+# module; anything else (python DT.py, the broker, benchmarks) runs threaded
+# rather than picking an installed gevent that nobody patched for
+socketio = SocketIO(app, async_mode=os.environ.get('DT_ASYNC_MODE') or 'threading')
+# Prometheus metrics (GET /metrics) and the on-demand sampling profiler
+metrics = Registry()
+request_latency = metrics.histogram(
+    'dt_http_request_duration_seconds', 'Time to produce a response, by Flask endpoint (streamed bodies excluded)',
+    ('endpoint', 'method'))
+request_count = metrics.counter('dt_http_requests_total', 'Responses by Flask endpoint and status', ('endpoint', 'method', 'status'))
+handler_latency = metrics.histogram(
+    'dt_handler_duration_seconds', 'Time spent in socket event handlers, delta fan-out, simulation ticks and page rendering',
+    ('handler',))
+emit_count = metrics.counter('dt_socket_emits_total', 'Socket.IO packets encoded, by event (a broadcast counts once)', ('event',))
+emit_size = metrics.histogram('dt_socket_emit_bytes', 'Encoded Socket.IO packet size, by event', ('event',), SIZE_BUCKETS)
+count_packets(socketio.server, emit_count, emit_size)
+profiler = SamplingProfiler()
+fleet = FleetStore()
+deltas = DeltaLog()
+last_stats = {}
+binary_clients = set()
+clients = set()
+# Clients streaming only the rooms, rows or statuses they subscribed to
+views = ViewRegistry()
+# Called with (seq, changes) for every delta; the cluster broker hooks in here
+delta_listeners = []
+engine = RefreshEngine(fleet)
+machine = ActionMachine()
+# Simulation events only draw actions that apply to the PC's status
+event_actions = {status: [action for action in EVENT_ACTIONS if machine.allowed(status, action, simulated=True)] for status in STATUSES}
+ingestor = TelemetryIngestor(fleet)
+cluster = ClusterClient(BROKER) if BROKER else None
+# Workers leave the journal and the rollups to the broker
+journal = StateJournal(STATE_DIR, fsync=os.environ.get('DT_STATE_FSYNC') == '1') if STATE_DIR and cluster is None else None
+# Without a state directory only the in-memory raw samples are kept
+history = History(os.path.join(STATE_DIR, 'history') if STATE_DIR else None, record=cluster is None)
+
+def initialize_pcs(count=20, config=None):
+    # Seats come from a layout config; without one, the original single
+    # 5-wide room, extended by rows as needed
+    pcs = []
     
-    for i in range(1, 21):
-        if i <= 10:
+    for i, seat in enumerate(layout.seats(config or layout.single_room(count)), 1):
+        # Same 10/7/2/1 status mix as the original 20-seat lab
+        slot = (i - 1) % 20 + 1
+        if slot <= 10:
             status = 'active'
-        elif i <= 17:
+        elif slot <= 17:
             status = 'user'
-        elif i <= 19:
+        elif slot <= 19:
             status = 'conflict'
         else:
             status = 'backup'
@@ -29,111 +100,379 @@ def initialize_pcs():
             'disk': random.randint(15, 45),
             'last_updated': datetime.now().strftime('%H:%M:%S'),
             'position': i - 1, 
-            'location': f'Row-{(i - 1) // 5 + 1}, Seat-{(i - 1) % 5 + 1}',
-            # Perfectly aligned grid positioning
-            'x': ((i - 1) % 5) * 5.0 - 10,  # Evenly spaced in rows (5 units apart)
-            'y': 0,                          # Consistent height
-            'z': -((i - 1) // 5) * 5.0 + 5, # Evenly spaced in columns (5 units apart)
+            'location': seat['location'],
+            # Perfectly aligned grid positioning, 5 units apart
+            'x': seat['x'],
+            'y': seat['y'],
+            'z': seat['z'],
             # Remove randomization for perfect alignment
             'size_variation': 1.0,           # Fixed size (no variation)
             'rotation_y': 0.0,               # No rotation (perfectly aligned)
             'conflict_type': 'hardware_conflict' if status == 'conflict' and random.random() > 0.5 else 'software_conflict' if status == 'conflict' else None,
             'remote_active': random.random() > 0.7 if status in ['user', 'active'] else False,
             'os_version': f"Windows {random.choice(['10', '11'])} Pro",
-            'uptime': random.randint(1, 72)
+            'uptime': random.randint(1, 72),
+            'floor': seat['floor'],
+            'room': seat['room']
         }
-        pcs_data.append(pc)
+        pcs.append(pc)
+    fleet.load(pcs)
+    if journal is not None:
+        journal.snapshot(fleet)
+
+def load_state():
+    # Saved state survives restarts; a fresh lab is only generated the first time
+    if cluster is not None:
+        cluster.join(fleet, deltas)
+    elif journal is None or not journal.recover(fleet):
+        initialize_pcs(int(os.environ.get('DT_PCS', 20)), layout.load(LAYOUT) if LAYOUT else None)
+
+load_state()
+
+def emit_pc_update(changes):
+    # changes maps pc_id -> fields that actually changed, as returned by
+    # fleet.update, or is a refresh's ColumnDelta
+    if not isinstance(changes, ColumnDelta):
+        changes = {pc_id: fields for pc_id, fields in changes.items() if fields}
+    if not changes:
+        return
+    if cluster is not None:
+        # Sequenced by the broker and sent back to every worker, this one included
+        cluster.publish(changes)
+        return
+    if journal is not None:
+        journal.append(changes)
+    since = deltas.seq
+    seq = deltas.append(changes)
+    broadcast_delta(since, seq, changes)
+
+def apply_cluster_delta(seq, changes):
+    # A worker's own changes are already applied locally; re-applying them
+    # in broker order is what keeps replicas converged under concurrent writes
+    with fleet.lock:
+        for pc_id, fields in changes.items():
+            if pc_id in fleet:
+                fleet.update(pc_id, fields)
+        since = deltas.seq
+        if seq != since + 1:
+            deltas.restart(deltas.epoch, seq - 1)
+            since = None
+        deltas.append(changes)
+        broadcast_delta(since, seq, changes)
+
+def broadcast_delta(since, seq, changes):
+    # Socket clients get merged batches once per EMIT_WINDOW; cluster
+    # listeners still get every sequenced delta as it happens. A ColumnDelta
+    # goes out as is, after whatever was pending, instead of being merged.
+    if isinstance(changes, ColumnDelta):
+        flush_pending()
+        send_delta(since, seq, changes)
+    elif coalescer.window:
+        coalescer.add(since, seq, changes)
+    else:
+        send_delta(since, seq, changes)
+    start_emitter()
+    for listener in delta_listeners:
+        listener(seq, changes)
+
+@timed(handler_latency, 'send_delta')
+def send_delta(since, seq, changes):
+    # Clients that are behind are skipped and caught up by emit_loop later
+    skip = backpressure.skip(list(clients), since)
+    socketio.emit('pcs_delta', delta_message(since, seq, changes, 'json'), to='format:json', skip_sid=skip)
+    if binary_clients:
+        socketio.emit('pcs_delta', delta_message(since, seq, changes, 'msgpack'), to='format:msgpack', skip_sid=skip)
+    for key, part in views.split(fleet, changes).items():
+        socketio.emit('view_delta', {'epoch': deltas.epoch, 'seq': seq, 'changes': part}, to=view_room(key), skip_sid=skip)
+    emit_stats_update(skip)
+
+def catch_up(sid, since):
+    # One frame with the latest state of everything a client missed while
+    # it was behind, or a fresh snapshot when the log no longer covers it
+    flush_pending()
+    changes = deltas.since(since)
+    keys = views.views.get(sid)
+    if keys is not None:
+        if changes is None:
+            socketio.emit('view_update', view_update(keys, keys), to=sid)
+            return
+        for key, part in views.split(fleet, changes).items():
+            if key in keys:
+                socketio.emit('view_delta', {'epoch': deltas.epoch, 'seq': deltas.seq, 'changes': part}, to=sid)
+        return
+    fmt = 'msgpack' if sid in binary_clients else 'json'
+    if changes is None:
+        socketio.emit('pcs_snapshot', snapshot_message(fmt), to=sid)
+    else:
+        socketio.emit('pcs_delta', delta_message(since, deltas.seq, changes, fmt), to=sid)
+    socketio.emit('stats_update', fleet.stats(), to=sid)
+
+def queue_depth(sid):
+    # Frames waiting in the client's Engine.IO queue; test clients have none
+    try:
+        eio_sid = socketio.server.manager.eio_sid_from_sid(sid, '/')
+        return socketio.server.eio.sockets[eio_sid].queue.qsize()
+    except (AttributeError, KeyError):
+        return 0
+
+coalescer = Coalescer(EMIT_WINDOW)
+backpressure = Backpressure(queue_depth, int(os.environ.get('DT_EMIT_QUEUE', outbound.MAX_QUEUE)))
+emitter_started = False
+
+def start_emitter():
+    # Started with the first delta so importing DT without running the
+    # server (benchmarks, the cluster broker) still delivers
+    global emitter_started
+    if not emitter_started:
+        emitter_started = True
+        socketio.start_background_task(emit_loop)
+
+def emit_loop():
+    interval = coalescer.window or outbound.WINDOW
+    while True:
+        socketio.sleep(interval)
+        with fleet.lock:
+            flush_pending()
+            for sid, since in backpressure.drained():
+                catch_up(sid, since)
+
+def flush_pending():
+    # Sends the open batch early, so a client answered at deltas.seq isn't
+    # then sent a batch that starts before it (and resyncs)
+    batch = coalescer.take()
+    if batch is not None:
+        send_delta(*batch)
 
-initialize_pcs()
+def delta_message(since, seq, changes, fmt):
+    # MessagePack clients get the columnar typed-array layout as one binary
+    # frame; JSON clients get it as 'columns' for a ColumnDelta
+    message = {'epoch': deltas.epoch, 'since': since, 'seq': seq}
+    if fmt == 'msgpack':
+        return codec.encode({**message, 'changes': codec.delta_columns(changes, True)}, 'msgpack')
+    if isinstance(changes, ColumnDelta):
+        return {**message, 'columns': codec.delta_columns(changes, False)}
+    return {**message, 'changes': changes}
 
-def emit_pc_update(pc_id=None):
-    if pc_id:
-        pc = next((p for p in pcs_data if p['id'] == pc_id), None)
-        if pc:
-            socketio.emit('pc_update', {'pc': pc})
+def snapshot_message(fmt):
+    message = {'epoch': deltas.epoch, 'seq': deltas.seq, 'stats': fleet.stats()}
+    if fmt == 'msgpack':
+        return codec.encode({**message, 'pcs': codec.fleet_columns(fleet, True)}, 'msgpack')
+    return {**message, 'pcs': fleet.all()}
+
+def emit_stats_update(skip=None):
+    # Counters are maintained by the fleet store, so this is only a dict compare
+    global last_stats
+    stats = fleet.stats()
+    if stats != last_stats:
+        last_stats = stats
+        socketio.emit('stats_update', stats, skip_sid=skip)
+
+@timed(handler_latency, 'simulation_tick')
+def simulation_tick(pcs_per_tick, events_per_tick):
+    # Drift plus random action events, sent as a single delta. The event PCs'
+    # command locks are held so events can't interleave with user actions.
+    pc_ids = machine.rng.sample(fleet.id_list, min(events_per_tick or 0, len(fleet)))
+    return commands.execute_many(pc_ids, simulation_step, pcs_per_tick)
+
+def simulation_step(pc_ids, pcs_per_tick):
+    with fleet.lock:
+        rows = engine.drift(pcs_per_tick)
+        changes = engine.changes(rows, rows, DRIFT_STEPS)
+        events = [(pc_id, machine.rng.choice(event_actions[fleet.field(pc_id, 'status')])) for pc_id in pc_ids]
+        _, applied = apply_actions(events, datetime.now().strftime('%H:%M:%S'), simulated=True)
+        if applied:
+            changes = dict(changes.items())
+            for pc_id, fields in applied.items():
+                changes.setdefault(pc_id, {}).update(fields)
+        emit_pc_update(changes)
+    return len(rows) + len(pc_ids)
+
+simulation = RemoteSimulation(cluster) if cluster is not None else Simulation(socketio, simulation_tick, rate=1.0)
+
+def snapshot_loop(interval=5):
+    # Compacts the change log into a new snapshot once enough has piled up
+    while True:
+        socketio.sleep(interval)
+        if journal.due(len(fleet)):
+            journal.snapshot(fleet)
+
+def history_loop():
+    while True:
+        socketio.sleep(history.interval)
+        history.sample(fleet)
+
+def start_background_tasks():
+    if journal is not None:
+        socketio.start_background_task(snapshot_loop)
+    if cluster is not None:
+        socketio.start_background_task(cluster.listen, apply_cluster_delta)
+    socketio.start_background_task(history_loop)
+    if os.environ.get('DT_PROFILE') == '1':
+        profiler.start()
+
+@socketio.on('connect')
+def handle_connect():
+    join_room('format:json')
+    clients.add(request.sid)
+
+@socketio.on('disconnect')
+def handle_disconnect(*args):
+    binary_clients.discard(request.sid)
+    with fleet.lock:
+        clients.discard(request.sid)
+        views.unsubscribe(request.sid)
+        backpressure.forget(request.sid)
+
+@socketio.on('sync')
+@timed(handler_latency, 'sync')
+def handle_sync(data):
+    # Reconnecting clients send the last (epoch, seq) they applied and get a
+    # catch-up diff; a snapshot is only sent when the log can't cover the gap.
+    # format='msgpack' switches the client to binary deltas and snapshots.
+    if not isinstance(data, dict):
+        data = {}
+    fmt = data.get('format', 'json')
+    if fmt not in codec.available_formats():
+        fmt = 'json'
+    set_client_format(request.sid, fmt)
+    since = data.get('seq')
+    with fleet.lock:
+        leave_view(request.sid)
+        flush_pending()
+        if isinstance(data.get('epoch'), str) and data['epoch'] == deltas.epoch:
+            changes = deltas.since(since)
+            if changes is not None:
+                emit('pcs_delta', delta_message(since, deltas.seq, changes, fmt))
+                return
+        emit('pcs_snapshot', snapshot_message(fmt))
+
+def set_client_format(sid, fmt):
+    if fmt == 'msgpack':
+        leave_room('format:json')
+        join_room('format:msgpack')
+        binary_clients.add(sid)
     else:
-        socketio.emit('pcs_refresh', {'pcs': pcs_data})
+        leave_room('format:msgpack')
+        join_room('format:json')
+        binary_clients.discard(sid)
+
+@socketio.on('subscribe')
+@timed(handler_latency, 'subscribe')
+def handle_subscribe(data):
+    # Subscribed clients stream only the layout rooms their camera covers, or
+    # the PCs matching a room/row/status selector, instead of the whole fleet.
+    # Each channel (one room, one room + row, one status...) is a Socket.IO
+    # room, so a delta is only sent to clients that asked for its PCs.
+    # view_update lists the channels in view and carries the PCs of channels
+    # entered since the last subscribe; changes then arrive as view_delta.
+    try:
+        selector, region = parse_view(data)
+        with fleet.lock:
+            keys = views.resolve(fleet.rooms(), selector, region)
+    except ViewError as e:
+        return {'success': False, 'message': str(e)}
+    leave_room('format:json')
+    leave_room('format:msgpack')
+    binary_clients.discard(request.sid)
+    with fleet.lock:
+        added, removed = views.subscribe(request.sid, keys)
+        for key in removed:
+            leave_room(view_room(key))
+        for key in added:
+            join_room(view_room(key))
+        message = view_update(keys, added)
+        emit('view_update', message)
+    return {'success': True, 'channels': len(keys), 'added': len(message['pcs'])}
+
+def view_update(keys, added):
+    # The channels in view plus the PCs of the newly added ones
+    rows = sorted(set().union(*(views.rows(fleet, key) for key in added)))
+    fields, channels = wire_view(keys)
+    return {
+        'epoch': deltas.epoch,
+        'seq': deltas.seq,
+        'fields': fields,
+        'channels': channels,
+        'pcs': fleet.rows_to_dicts(rows),
+        'stats': fleet.stats()
+    }
+
+def leave_view(sid):
+    for key in views.unsubscribe(sid):
+        leave_room(view_room(key))
+
+def view_room(key):
+    shape, values = key
+    return f'view:{json.dumps(dict(zip(shape, values)), sort_keys=True)}'
 
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.endpoint or 'unmatched'
+        request_latency.observe(time.perf_counter() - started, endpoint, request.method)
+        request_count.inc(1, endpoint, request.method, response.status_code)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/profiler', methods=['GET'])
+def profiler_status():
+    return jsonify({'success': True, 'profiler': profiler.stats()})
+
+@app.route('/api/profiler/start', methods=['POST'])
+def profiler_start():
+    # {"interval_ms": 10}; starting again clears the previous samples
+    data = request.get_json(silent=True) or {}
+    try:
+        started = profiler.start(data['interval_ms'] / 1e3 if data.get('interval_ms') is not None else None)
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    message = 'Profiler started' if started else 'Profiler already running'
+    return jsonify({'success': True, 'message': message, 'profiler': profiler.stats()})
+
+@app.route('/api/profiler/stop', methods=['POST'])
+def profiler_stop():
+    stopped = profiler.stop()
+    message = 'Profiler stopped' if stopped else 'Profiler not running'
+    return jsonify({'success': True, 'message': message, 'profiler': profiler.stats()})
+
+@app.route('/api/profiler/stacks', methods=['GET'])
+def profiler_stacks():
+    # Collapsed stacks with sample counts, e.g. for flamegraph.pl or speedscope
+    return Response(profiler.collapsed(), mimetype='text/plain')
+
 @app.route('/')
 def replica_view():  
-    return render_3d_template("Main 3D Lab", show_controls=False)
+    return cached_3d_page("Main 3D Lab", show_controls=False).response(request)
 
 @app.route('/control')
 def main_3d_view():  
-    return render_3d_template("Control Panel - 3D Lab", show_controls=True)
+    return cached_3d_page("Control Panel - 3D Lab", show_controls=True).response(request)
 
+@lru_cache(maxsize=None)
+def cached_3d_page(title, show_controls):
+    # The page doesn't depend on fleet state (that arrives over the socket),
+    # so each variant is rendered and compressed once per process
+    return CachedBody(render_3d_template(title, show_controls))
+
+@timed(handler_latency, 'render_3d_template')
 def render_3d_template(title, show_controls):
     return f"""
     <!DOCTYPE html>
     <html>
     <head>
         <title>{title}</title>
-        <style>
-            body {{ margin: 0; overflow: hidden; font-family: Arial, sans-serif; }}
-            #info {{
-                position: absolute;
-                top: 10px;
-                width: 100%;
-                text-align: center;
-                color: white;
-                background-color: rgba(0,0,0,0.7);
-                padding: 10px;
-                z-index: 100;
-            }}
-            #stats {{
-                position: absolute;
-                top: 60px;
-                left: 10px;
-                background-color: rgba(0,0,0,0.7);
-                color: white;
-                padding: 10px;
-                border-radius: 5px;
-                z-index: 100;
-            }}
-            #controls {{
-                position: absolute;
-                bottom: 20px;
-                left: 50%;
-                transform: translateX(-50%);
-                background-color: rgba(0,0,0,0.7);
-                color: white;
-                padding: 10px;
-                border-radius: 5px;
-                z-index: 100;
-                display: flex;
-                gap: 10px;
-                display: {'block' if show_controls else 'none'};
-            }}
-            button {{
-                padding: 8px 15px;
-                background-color: #4CAF50;
-                color: white;
-                border: none;
-                border-radius: 4px;
-                cursor: pointer;
-            }}
-            button:hover {{ background-color: #45a049; }}
-            #pc-details {{
-                position: absolute;
-                top: 60px;
-                right: 10px;
-                background-color: rgba(0,0,0,0.7);
-                color: white;
-                padding: 15px;
-                border-radius: 5px;
-                z-index: 100;
-                max-width: 300px;
-                display: none;
-            }}
-            .progress-bar {{ width: 100%; background-color: #ddd; border-radius: 4px; margin: 5px 0; }}
-            .progress-fill {{ height: 20px; border-radius: 4px; }}
-            .cpu-fill {{ background-color: #f44336; }}
-            .ram-fill {{ background-color: #2196F3; }}
-            .disk-fill {{ background-color: #4CAF50; }}
-        </style>
+        <link rel="stylesheet" href="{assets.url('css/lab.css')}">
     </head>
-    <body>
+    <body class="{'control-panel' if show_controls else 'replica-view'}">
         <div id="info">
             {title} | <a href="/{'control' if not show_controls else ''}" style="color: white;">
                 Switch to {'Control Panel' if not show_controls else 'Replica View'}
@@ -177,491 +516,72 @@ def render_3d_template(title, show_controls):
             <button onclick="toggleGrid()">Toggle Grid</button>
         </div>
         
-        <script src="https://cdn.jsdelivr.net/npm/three@0.132.2/build/three.min.js"></script>
-        <script src="https://cdn.jsdelivr.net/npm/three@0.132.2/examples/js/controls/OrbitControls.js"></script>
-        <script src="https://cdnjs.cloudflare.com/ajax/libs/socket.io/4.0.1/socket.io.js"></script>
-        
-        <script>
-            // Scene setup
-            const scene = new THREE.Scene();
-            scene.background = new THREE.Color(0xADD8E6);
-            
-            const camera = new THREE.PerspectiveCamera(75, window.innerWidth / window.innerHeight, 0.1, 1000);
-            camera.position.set(10, 15, 15);
-            
-            const renderer = new THREE.WebGLRenderer({{ antialias: true }});
-            renderer.setSize(window.innerWidth, window.innerHeight);
-            renderer.shadowMap.enabled = true;
-            renderer.shadowMap.type = THREE.PCFSoftShadowMap;
-            document.body.appendChild(renderer.domElement);
-            
-            // Controls
-            const controls = new THREE.OrbitControls(camera, renderer.domElement);
-            controls.enableDamping = true;
-            controls.dampingFactor = 0.05;
-            controls.target.set(0, 0.5, 0);
-            
-            // Lighting
-            const ambientLight = new THREE.AmbientLight(0x404040, 0.6);
-            scene.add(ambientLight);
-            
-            const directionalLight = new THREE.DirectionalLight(0xffffff, 0.8);
-            directionalLight.position.set(10, 20, 10);
-            directionalLight.castShadow = true;
-            directionalLight.shadow.mapSize.width = 2048;
-            directionalLight.shadow.mapSize.height = 2048;
-            scene.add(directionalLight);
-            
-            // Floor
-            const floorWidth = 36;
-            const floorDepth = 36;
-            const floorGeometry = new THREE.PlaneGeometry(floorWidth, floorDepth);
-            const floorMaterial = new THREE.MeshPhongMaterial({{ color: 0xAAAAAA }});
-            const floor = new THREE.Mesh(floorGeometry, floorMaterial);
-            floor.rotation.x = -Math.PI / 2;
-            floor.receiveShadow = true;
-            scene.add(floor);
-            
-            // Grid helper
-            const gridHelper = new THREE.GridHelper(floorWidth, 36, 0xCCCCCC, 0x999999);
-            gridHelper.position.y = 0.01;
-            scene.add(gridHelper);
-            
-            // Walls
-            const wallHeight = 8;
-            const wallMaterial = new THREE.MeshPhongMaterial({{ color: 0xF0F0F0 }});
-            const wallThickness = 0.2;
-            
-            // Front wall
-            const frontWallGeometry = new THREE.BoxGeometry(floorWidth, wallHeight, wallThickness);
-            const frontWall = new THREE.Mesh(frontWallGeometry, wallMaterial);
-            frontWall.position.set(0, wallHeight / 2, -floorDepth / 2 - wallThickness / 2);
-            frontWall.receiveShadow = true;
-            scene.add(frontWall);
-            
-            // Back wall with door
-            const doorWidth = 3;
-            const doorHeight = 4;
-            const wallSegmentWidth = (floorWidth - doorWidth) / 2;
-            
-            const backWallLeftGeometry = new THREE.BoxGeometry(wallSegmentWidth, wallHeight, wallThickness);
-            const backWallLeft = new THREE.Mesh(backWallLeftGeometry, wallMaterial);
-            backWallLeft.position.set(-wallSegmentWidth / 2 - doorWidth / 2, wallHeight / 2, floorDepth / 2 + wallThickness / 2);
-            backWallLeft.receiveShadow = true;
-            scene.add(backWallLeft);
-            
-            const backWallRightGeometry = new THREE.BoxGeometry(wallSegmentWidth, wallHeight, wallThickness);
-            const backWallRight = new THREE.Mesh(backWallRightGeometry, wallMaterial);
-            backWallRight.position.set(wallSegmentWidth / 2 + doorWidth / 2, wallHeight / 2, floorDepth / 2 + wallThickness / 2);
-            backWallRight.receiveShadow = true;
-            scene.add(backWallRight);
-            
-            // Door
-            const doorGroup = new THREE.Group();
-            doorGroup.position.set(-doorWidth / 2, 0, floorDepth / 2 + wallThickness / 2);
-            doorGroup.rotation.y = -Math.PI / 4;
-            
-            const doorGeometry = new THREE.BoxGeometry(doorWidth, doorHeight, wallThickness * 1.1);
-            const doorMaterial = new THREE.MeshPhongMaterial({{ color: 0x964B00 }});
-            const door = new THREE.Mesh(doorGeometry, doorMaterial);
-            door.position.set(doorWidth / 2, doorHeight / 2, 0);
-            door.receiveShadow = true;
-            doorGroup.add(door);
-            scene.add(doorGroup);
-            
-            // Left wall
-            const leftWallGeometry = new THREE.BoxGeometry(wallThickness, wallHeight, floorDepth + 2 * wallThickness);
-            const leftWall = new THREE.Mesh(leftWallGeometry, wallMaterial);
-            leftWall.position.set(-floorWidth / 2 - wallThickness / 2, wallHeight / 2, 0);
-            leftWall.receiveShadow = true;
-            scene.add(leftWall);
-            
-            // Right wall
-            const rightWallGeometry = new THREE.BoxGeometry(wallThickness, wallHeight, floorDepth + 2 * wallThickness);
-            const rightWall = new THREE.Mesh(rightWallGeometry, wallMaterial);
-            rightWall.position.set(floorWidth / 2 + wallThickness / 2, wallHeight / 2, 0);
-            rightWall.receiveShadow = true;
-            scene.add(rightWall);
-            
-            // Ceiling
-            const ceilingGeometry = new THREE.PlaneGeometry(floorWidth, floorDepth);
-            const ceilingMaterial = new THREE.MeshPhongMaterial({{ color: 0xE0E0E0, side: THREE.DoubleSide }});
-            const ceiling = new THREE.Mesh(ceilingGeometry, ceilingMaterial);
-            ceiling.rotation.x = Math.PI / 2;
-            ceiling.position.y = wallHeight;
-            ceiling.receiveShadow = true;
-            scene.add(ceiling);
-            
-            // Projector Screen
-            const screenWidth = 8;
-            const screenHeight = 4.5;
-            const screenGeometry = new THREE.PlaneGeometry(screenWidth, screenHeight);
-            const screenMaterial = new THREE.MeshBasicMaterial({{ color: 0xFFFFFF, side: THREE.DoubleSide }});
-            const projectorScreen = new THREE.Mesh(screenGeometry, screenMaterial);
-            const screenY = wallHeight * 0.6;
-            projectorScreen.position.set(0, screenY, -floorDepth / 2 + wallThickness * 0.51);
-            scene.add(projectorScreen);
-            
-            // Projector
-            const projectorHeight = 0.3;
-            const projectorStandHeight = screenY - (projectorHeight / 2) - 0.15;
-            const projectorStandGeometry = new THREE.BoxGeometry(0.5, projectorStandHeight, 0.5);
-            const projectorStandMaterial = new THREE.MeshPhongMaterial({{ color: 0x888888 }});
-            const projectorStand = new THREE.Mesh(projectorStandGeometry, projectorStandMaterial);
-            projectorStand.position.set(0, projectorStandHeight / 2, 9);
-            projectorStand.castShadow = true;
-            scene.add(projectorStand);
-            
-            const projectorGeometry = new THREE.BoxGeometry(1.0, projectorHeight, 1.2);
-            const projectorMaterial = new THREE.MeshPhongMaterial({{ color: 0x333333 }});
-            const projector = new THREE.Mesh(projectorGeometry, projectorMaterial);
-            projector.position.set(0, projectorStandHeight + projectorHeight / 2, 9);
-            projector.castShadow = true;
-            scene.add(projector);
-            
-            // PC materials
-            const pcMaterials = {{
-                'active': new THREE.MeshPhongMaterial({{ color: 0x4CAF50, specular: 0x555555, shininess: 30 }}),
-                'user': new THREE.MeshPhongMaterial({{ color: 0x2196F3, specular: 0x555555, shininess: 30 }}),
-                'conflict': new THREE.MeshPhongMaterial({{ color: 0xf44336, specular: 0x555555, shininess: 30 }}),
-                'backup': new THREE.MeshPhongMaterial({{ color: 0xFFC107, specular: 0x555555, shininess: 30 }})
-            }};
-            
-            // PC models
-            const pcMeshes = {{}};
-            let pcs = [];
-            let selectedPc = null;
-            
-            // Socket.io connection
-            const socket = io();
-            
-            // Create a realistic PC model
-            function createPCModel(pc) {{
-                const group = new THREE.Group();
-                
-                // Desk
-                const deskGeometry = new THREE.BoxGeometry(2.0 * pc.size_variation, 0.7, 1.5);
-                const deskMaterial = new THREE.MeshPhongMaterial({{ color: 0x8B4513, specular: 0x555555, shininess: 10 }});
-                const desk = new THREE.Mesh(deskGeometry, deskMaterial);
-                desk.position.y = 0.35;
-                desk.castShadow = true;
-                desk.receiveShadow = true;
-                group.add(desk);
-                
-                // PC Tower with LED
-                const towerGeometry = new THREE.BoxGeometry(0.3 * pc.size_variation, 0.8, 0.8);
-                const tower = new THREE.Mesh(towerGeometry, pcMaterials[pc.status]);
-                tower.position.set(-0.8 * pc.size_variation, 0.4, 0);
-                tower.castShadow = true;
-                tower.receiveShadow = true;
-                group.add(tower);
-                
-                // LED effect on tower
-                const ledGeometry = new THREE.SphereGeometry(0.05 * pc.size_variation, 16, 16);
-                const ledMaterial = new THREE.MeshBasicMaterial({{ color: pc.status === 'conflict' ? 0xff0000 : pc.remote_active ? 0xFFA500 : 0x00ff00 }});
-                const led = new THREE.Mesh(ledGeometry, ledMaterial);
-                led.position.set(-0.8 * pc.size_variation, 0.6, 0.41);
-                group.add(led);
-                
-                // Monitor with stand
-                const monitorGeometry = new THREE.BoxGeometry(1.2 * pc.size_variation, 0.7, 0.1);
-                const monitor = new THREE.Mesh(monitorGeometry, new THREE.MeshPhongMaterial({{ color: 0x333333, specular: 0x555555, shininess: 50 }}));
-                monitor.position.set(0, 0.85, -0.5);
-                monitor.castShadow = true;
-                monitor.receiveShadow = true;
-                group.add(monitor);
-                
-                // Monitor stand
-                const standGeometry = new THREE.BoxGeometry(0.4 * pc.size_variation, 0.2, 0.4);
-                const stand = new THREE.Mesh(standGeometry, new THREE.MeshPhongMaterial({{ color: 0x333333 }}));
-                stand.position.set(0, 0.45, -0.5);
-                stand.castShadow = true;
-                group.add(stand);
-                
-                // Screen
-                const screenGeometry = new THREE.PlaneGeometry(1.0 * pc.size_variation, 0.6);
-                const screenMaterial = new THREE.MeshBasicMaterial({{ 
-                    color: pc.status === 'conflict' ? 0xff0000 : pc.remote_active ? 0xFFA500 : 0x000000,
-                    side: THREE.DoubleSide
-                }});
-                const screen = new THREE.Mesh(screenGeometry, screenMaterial);
-                screen.position.set(0, 0.85, -0.55);
-                group.add(screen);
-                
-                // Keyboard
-                const keyboardGeometry = new THREE.BoxGeometry(1.0 * pc.size_variation, 0.05, 0.4);
-                const keyboard = new THREE.Mesh(keyboardGeometry, new THREE.MeshPhongMaterial({{ color: 0x222222 }}));
-                keyboard.position.set(0, 0.375, -0.2);
-                keyboard.castShadow = true;
-                group.add(keyboard);
-                
-                // Position and rotation
-                group.position.set(pc.x, 0, pc.z);
-                group.rotation.y = pc.rotation_y;
-                group.userData.pcId = pc.id;
-                
-                return group;
-            }}
-            
-            // Load initial data
-            function loadInitialData() {{
-                fetch('/api/pcs')
-                    .then(response => response.json())
-                    .then(data => {{
-                        pcs = data;
-                        renderPCs();
-                        updateStats();
-                    }});
-            }}
-            
-            // Render all PCs
-            function renderPCs() {{
-                Object.values(pcMeshes).forEach(mesh => scene.remove(mesh));
-                Object.keys(pcMeshes).forEach(key => delete pcMeshes[key]);
-                
-                pcs.forEach(pc => {{
-                    pcMeshes[pc.id] = createPCModel(pc);
-                    scene.add(pcMeshes[pc.id]);
-                }});
-            }}
-            
-            // Update stats
-            function updateStats() {{
-                const active = pcs.filter(pc => pc.status === 'active').length;
-                const user = pcs.filter(pc => pc.status === 'user').length;
-                const hardwareConflict = pcs.filter(pc => pc.status === 'conflict' && pc.conflict_type === 'hardware_conflict').length;
-                const softwareConflict = pcs.filter(pc => pc.status === 'conflict' && pc.conflict_type === 'software_conflict').length;
-                const remoteSessions = pcs.filter(pc => pc.remote_active).length;
-                
-                document.getElementById('active-count').textContent = active;
-                document.getElementById('user-count').textContent = user;
-                document.getElementById('hardware-conflict-count').textContent = hardwareConflict;
-                document.getElementById('software-conflict-count').textContent = softwareConflict;
-                document.getElementById('remote-count').textContent = remoteSessions;
-            }}
-            
-            // Show PC details
-            function showPCDetails(pcId) {{
-                const pc = pcs.find(p => p.id === pcId);
-                if (!pc) return;
-                
-                selectedPc = pc;
-                const details = document.getElementById('pc-details');
-                
-                document.getElementById('pc-title').textContent = pc.id;
-                document.getElementById('pc-status').textContent = `Status: ${{pc.status.toUpperCase()}}`;
-                document.getElementById('pc-conflict-type').textContent = pc.conflict_type ? `Conflict Type: ${{pc.conflict_type.replace('_', ' ').toUpperCase()}}` : '';
-                document.getElementById('pc-remote-status').textContent = `Remote: ${{pc.remote_active ? 'Active' : 'Inactive'}}`;
-                document.getElementById('pc-location').textContent = `Location: ${{pc.location}}`;
-                document.getElementById('pc-last-updated').textContent = `Updated: ${{pc.last_updated}}`;
-                document.getElementById('pc-os-version').textContent = `OS: ${{pc.os_version}}`;
-                document.getElementById('pc-uptime').textContent = `Uptime: ${{pc.uptime}} hours`;
-                
-                document.getElementById('pc-cpu').textContent = pc.cpu;
-                document.getElementById('cpu-bar').style.width = `${{pc.cpu}}%`;
-                document.getElementById('pc-ram').textContent = pc.ram;
-                document.getElementById('ram-bar').style.width = `${{pc.ram}}%`;
-                document.getElementById('pc-disk').textContent = pc.disk;
-                document.getElementById('disk-bar').style.width = `${{pc.disk}}%`;
-                
-                // Action buttons (only in control panel)
-                const actionsDiv = document.getElementById('pc-actions');
-                actionsDiv.innerHTML = '';
-                
-                if ({'true' if show_controls else 'false'}) {{
-                    const actions = [
-                        {{ name: 'Restart', action: 'restart', color: '#4CAF50' }},
-                        {{ name: 'Shutdown', action: 'shutdown', color: '#f44336' }},
-                        {{ name: 'Remote', action: 'remote', color: '#2196F3' }}
-                    ];
-                    
-                    if (pc.status === 'conflict') {{
-                        actions.push({{ name: 'Resolve', action: 'resolve', color: '#FFC107' }});
-                    }}
-                    if (pc.status === 'active') {{
-                        actions.push({{ name: 'Assign', action: 'assign', color: '#2196F3' }});
-                    }}
-                    if (pc.status === 'user') {{
-                        actions.push({{ name: 'Release', action: 'release', color: '#4CAF50' }});
-                    }}
-                    
-                    actions.forEach(action => {{
-                        const btn = document.createElement('button');
-                        btn.textContent = action.name;
-                        btn.style.backgroundColor = action.color;
-                        btn.style.margin = '5px';
-                        btn.onclick = () => handleAction(pc.id, action.action);
-                        actionsDiv.appendChild(btn);
-                    }});
-                }}
-                
-                details.style.display = 'block';
-            }}
-            
-            // Handle PC actions
-            function handleAction(pcId, action) {{
-                fetch(`/api/pcs/${{pcId}}/action`, {{
-                    method: 'POST',
-                    headers: {{ 'Content-Type': 'application/json' }},
-                    body: JSON.stringify({{ action: action }})
-                }})
-                .then(response => response.json())
-                .then(data => {{
-                    if (data.success) {{
-                        alert(data.message);
-                    }} else {{
-                        alert('Error: ' + data.message);
-                    }}
-                }});
-            }}
-            
-            // Close details
-            function closeDetails() {{
-                document.getElementById('pc-details').style.display = 'none';
-                selectedPc = null;
-            }}
-            
-            // Refresh data
-            function refreshData() {{
-                fetch('/api/pcs/refresh', {{ method: 'POST' }})
-                    .then(response => response.json())
-                    .then(data => {{
-                        if (data.success) {{
-                            loadInitialData();
-                        }}
-                    }});
-            }}
-            
-            // Reset camera
-            function resetCamera() {{
-                camera.position.set(10, 15, 15);
-                controls.target.set(0, 0, 0);
-                controls.update();
-            }}
-            
-            // Toggle grid
-            function toggleGrid() {{
-                gridHelper.visible = !gridHelper.visible;
-            }}
-            
-            // Handle clicks
-            function onMouseClick(event) {{
-                const mouse = new THREE.Vector2(
-                    (event.clientX / window.innerWidth) * 2 - 1,
-                    -(event.clientY / window.innerHeight) * 2 + 1
-                );
-                
-                const raycaster = new THREE.Raycaster();
-                raycaster.setFromCamera(mouse, camera);
-                
-                const intersects = raycaster.intersectObjects(Object.values(pcMeshes), true);
-                
-                if (intersects.length > 0) {{
-                    let obj = intersects[0].object;
-                    while (obj.parent && !obj.userData.pcId) {{
-                        obj = obj.parent;
-                    }}
-                    if (obj.userData.pcId) {{
-                        showPCDetails(obj.userData.pcId);
-                    }}
-                }}
-            }}
-            
-            // Handle window resize
-            function onWindowResize() {{
-                camera.aspect = window.innerWidth / window.innerHeight;
-                camera.updateProjectionMatrix();
-                renderer.setSize(window.innerWidth, window.innerHeight);
-            }}
-            
-            // Socket.io events
-            socket.on('pc_update', (data) => {{
-                const index = pcs.findIndex(p => p.id === data.pc.id);
-                if (index !== -1) {{
-                    pcs[index] = data.pc;
-                    
-                    // Update 3D model
-                    if (pcMeshes[data.pc.id]) {{
-                        scene.remove(pcMeshes[data.pc.id]);
-                        pcMeshes[data.pc.id] = createPCModel(data.pc);
-                        scene.add(pcMeshes[data.pc.id]);
-                    }}
-                    
-                    updateStats();
-                    
-                    // Update details if open
-                    if (selectedPc && selectedPc.id === data.pc.id) {{
-                        showPCDetails(data.pc.id);
-                    }}
-                }}
-            }});
-            
-            socket.on('pcs_refresh', (data) => {{
-                pcs = data.pcs;
-                renderPCs();
-                updateStats();
-            }});
-            
-            // Animation loop
-            function animate() {{
-                requestAnimationFrame(animate);
-                controls.update();
-                
-                // Animate conflict PCs and remote sessions
-                Object.values(pcMeshes).forEach(pcMesh => {{
-                    const pc = pcs.find(p => p.id === pcMesh.userData.pcId);
-                    if (pc) {{
-                        const screen = pcMesh.children.find(
-                            child => child.type === 'Mesh' && child.geometry.type === 'PlaneGeometry'
-                        );
-                        const led = pcMesh.children.find(
-                            child => child.type === 'Mesh' && child.geometry.type === 'SphereGeometry'
-                        );
-                        if (screen && led) {{
-                            if (pc.status === 'conflict') {{
-                                const intensity = 0.5 + 0.5 * Math.sin(Date.now() * 0.005);
-                                screen.material.color.setRGB(intensity, 0, 0);
-                                led.material.color.setRGB(intensity, 0, 0);
-                            }} else if (pc.remote_active) {{
-                                const intensity = 0.5 + 0.5 * Math.sin(Date.now() * 0.003);
-                                screen.material.color.setRGB(intensity, 0.5, 0);
-                                led.material.color.setRGB(intensity, 0.5, 0);
-                            }}
-                        }}
-                    }}
-                }});
-                
-                renderer.render(scene, camera);
-            }}
-            
-            // Event listeners
-            window.addEventListener('click', onMouseClick, false);
-            window.addEventListener('resize', onWindowResize, false);
-            
-            // Initialize
-            loadInitialData();
-            animate();
-        </script>
+        <script src="{assets.url('vendor/three.min.js')}"{assets.integrity('vendor/three.min.js')}></script>
+        <script src="{assets.url('vendor/OrbitControls.js')}"{assets.integrity('vendor/OrbitControls.js')}></script>
+        <script src="{assets.url('vendor/socket.io.min.js')}"{assets.integrity('vendor/socket.io.min.js')}></script>
+        <script src="{assets.url('js/lab.js')}"></script>
     </body>
     </html>
     """
 
+@app.route('/assets/<path:filename>')
+def static_asset(filename):
+    asset = assets.get(filename)
+    if asset is None:
+        abort(404)
+    return asset.response(request)
+
 @app.route('/api/pcs', methods=['GET'])
 def get_pcs():
-    return jsonify(pcs_data)
+    # ?status=&conflict_type=&remote_active=&row= filter through the fleet
+    # indexes, fields= projects, limit=/cursor= page. Without limit/cursor the
+    # response stays the plain array it has always been.
+    try:
+        criteria = parse_filters(request.args)
+        fields = parse_fields(request.args)
+        after, limit = parse_page(request.args)
+    except QueryError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    paged = 'limit' in request.args or 'cursor' in request.args
+    fmt, shape = codec.negotiate(request)
+    if fmt == 'json' and shape == 'rows':
+        return Response(stream_pcs(fleet, criteria, fields, after, limit, paged), mimetype='application/json')
+
+    # Binary and columnar bodies are compact enough to build in one go
+    pcs, next_cursor = collect_pcs(fleet, criteria, fields, after, limit)
+    body = codec.pcs_columns(pcs, fmt == 'msgpack', fields) if shape == 'columnar' else pcs
+    if paged:
+        body = {'pcs': body, 'next_cursor': next_cursor}
+    return Response(codec.encode(body, fmt), mimetype=codec.mimetype(fmt))
+
+@app.route('/api/layout', methods=['GET'])
+def get_layout():
+    # Room extents (seat positions) per floor, for clients to cull whole rooms
+    with fleet.lock:
+        return jsonify({'success': True, 'rooms': fleet.rooms()})
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    return jsonify(fleet.stats())
 
 @app.route('/api/pcs/refresh', methods=['POST'])
 def refresh_pcs():
+    # Answers with the refreshed fields in the columnar delta layout; the
+    # whole fleet only with an explicit ?layout=rows or ?layout=columnar
     try:
-        for pc in pcs_data:
-            if pc['status'] != 'backup':
-                pc['cpu'] = random.randint(20, 80)
-                pc['ram'] = random.randint(20, 90)
-                pc['disk'] = random.randint(15, 55)
-                pc['uptime'] = random.randint(1, 72)
-            pc['last_updated'] = datetime.now().strftime('%H:%M:%S')
-        emit_pc_update()
-        return jsonify({'success': True, 'message': 'PC data refreshed', 'pcs': pcs_data})
+        fmt, shape = codec.negotiate(request)
+        with fleet.lock:
+            rows, touched = engine.refresh()
+            changes = engine.changes(rows, touched)
+            emit_pc_update(changes)
+            if 'layout' not in request.args:
+                body = {'changes': codec.delta_columns(changes, fmt == 'msgpack')}
+            elif shape == 'columnar':
+                body = {'pcs': codec.fleet_columns(fleet, fmt == 'msgpack')}
+            else:
+                body = {'pcs': fleet.all()}
+        body = {'success': True, 'message': 'PC data refreshed', **body}
+        return Response(codec.encode(body, fmt), mimetype=codec.mimetype(fmt))
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -670,75 +590,201 @@ def pc_action(pc_id):
     data = request.get_json()
     action = data.get('action')
 
-    pc = next((p for p in pcs_data if p['id'] == pc_id), None)
-    if not pc:
+    if pc_id not in fleet:
         return jsonify({'success': False, 'message': 'PC not found'}), 404
 
     try:
-        if action == 'restart':
-            pc.update({
-                'status': 'active',
-                'cpu': random.randint(10, 40),
-                'ram': random.randint(20, 60),
-                'disk': random.randint(10, 30),
-                'conflict_type': None,
-                'uptime': 0
-            })
-            message = f'{pc_id} restarted successfully'
-            
-        elif action == 'shutdown':
-            pc.update({
-                'cpu': 0,
-                'ram': 0,
-                'disk': 0,
-                'status': 'active' if pc['status'] in ['user', 'conflict'] else pc['status'],
-                'remote_active': False,
-                'uptime': 0
-            })
-            message = f'{pc_id} shutdown complete'
-            
-        elif action == 'remote':
-            pc['remote_active'] = not pc['remote_active']
-            message = f'{pc_id} remote session {"started" if pc["remote_active"] else "ended"}'
-            
-        elif action == 'resolve' and pc['status'] == 'conflict':
-            pc.update({
-                'status': 'active',
-                'cpu': random.randint(10, 40),
-                'ram': random.randint(20, 60),
-                'disk': random.randint(10, 30),
-                'conflict_type': None
-            })
-            message = f'{pc_id} conflict resolved'
-            
-        elif action == 'assign' and pc['status'] == 'active':
-            pc.update({
-                'status': 'user',
-                'cpu': random.randint(40, 80),
-                'ram': random.randint(50, 90),
-                'disk': random.randint(20, 50)
-            })
-            message = f'{pc_id} assigned to user'
-            
-        elif action == 'release' and pc['status'] == 'user':
-            pc.update({
-                'status': 'active',
-                'cpu': random.randint(10, 40),
-                'ram': random.randint(20, 60),
-                'disk': random.randint(10, 30),
-                'remote_active': False
-            })
-            message = f'{pc_id} released from user'
-            
-        else:
-            return jsonify({'success': False, 'message': 'Invalid action or status'}), 400
-
-        pc['last_updated'] = datetime.now().strftime('%H:%M:%S')
-        emit_pc_update(pc_id)
+        message, pc = run_action(pc_id, action)
         return jsonify({'success': True, 'message': message, 'pc': pc})
-        
+    except ActionError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+def run_action(pc_id, action):
+    # Workers hand actions to the broker, so the guard is checked against
+    # its fleet under its command queue; the change comes back as a delta
+    if cluster is not None:
+        return cluster.call('action', pc_id, action)
+    return commands.execute(pc_id, action)
+
+def run_bulk_action(pc_ids, action):
+    if cluster is not None:
+        return cluster.call('bulk_action', pc_ids, action)
+    return commands.execute_many(pc_ids, perform_bulk_action, action)
+
+def perform_action(pc_id, action):
+    # Runs under the PC's command lock, so the status the transition is
+    # looked up by is the one the write is applied to
+    changes, message = machine.plan(fleet, pc_id, action)
+    changes['last_updated'] = datetime.now().strftime('%H:%M:%S')
+    with fleet.lock:
+        emit_pc_update({pc_id: fleet.update(pc_id, changes)})
+        return message, fleet.get(pc_id)
+
+def perform_bulk_action(pc_ids, action):
+    # Runs with the command locks of every PC held; all changes go out as one delta
+    with fleet.lock:
+        results, applied = apply_actions([(pc_id, action) for pc_id in pc_ids], datetime.now().strftime('%H:%M:%S'))
+        emit_pc_update(applied)
+    return results
+
+def apply_actions(actions, stamp, simulated=False):
+    # (pc_id, action) pairs through the transition table; callers hold the
+    # fleet lock and the PCs' command locks and emit the applied changes.
+    # Only simulated events may take the event-only transitions.
+    results = []
+    applied = {}
+    for pc_id, action in actions:
+        if pc_id not in fleet:
+            results.append({'id': pc_id, 'success': False, 'message': 'PC not found'})
+            continue
+        try:
+            changes, message = machine.plan(fleet, pc_id, action, simulated)
+        except ActionError as e:
+            results.append({'id': pc_id, 'success': False, 'message': str(e)})
+            continue
+        changes['last_updated'] = stamp
+        applied.setdefault(pc_id, {}).update(fleet.update(pc_id, changes))
+        results.append({'id': pc_id, 'success': True, 'message': message})
+    return results, applied
+
+commands = CommandQueue(perform_action)
+
+metrics.gauge('dt_fleet_pcs', 'PCs in the fleet', lambda: len(fleet))
+metrics.gauge('dt_socket_clients', 'Connected Socket.IO clients', lambda: len(clients))
+metrics.gauge('dt_socket_view_clients', 'Clients streaming a view or channel subscription', lambda: len(views))
+metrics.gauge('dt_socket_binary_clients', 'Clients receiving MessagePack deltas', lambda: len(binary_clients))
+metrics.gauge('dt_delta_seq', 'Sequence number of the latest delta', lambda: deltas.seq)
+metrics.counter_from('dt_outbound_batches_total', 'Merged delta frames sent', lambda: coalescer.batches)
+metrics.counter_from('dt_outbound_deltas_total', 'Deltas merged into outbound frames', lambda: coalescer.deltas_in)
+metrics.gauge('dt_outbound_last_batch_pcs', 'PCs in the last merged frame', lambda: coalescer.last_batch)
+metrics.gauge('dt_outbound_last_window_seconds', 'Time the last merged frame waited before going out', lambda: coalescer.last_latency)
+metrics.counter_from('dt_outbound_dropped_frames_total', 'Frames skipped for clients that were behind', lambda: backpressure.dropped)
+metrics.counter_from('dt_outbound_catchups_total', 'Catch-up frames sent to clients that drained their queue', lambda: backpressure.catchups)
+metrics.gauge('dt_outbound_clients_behind', 'Clients currently skipped for a full queue', lambda: len(backpressure.behind))
+metrics.counter_from('dt_commands_processed_total', 'PC commands run through the command queue', lambda: commands.processed)
+metrics.counter_from('dt_commands_failed_total', 'PC commands that raised', lambda: commands.failed)
+metrics.gauge('dt_commands_queued', 'PC commands waiting for or holding a shard lock', lambda: sum(commands.depth))
+metrics.gauge('dt_simulation_running', '1 while the simulation loop runs', lambda: int(simulation.running))
+metrics.gauge('dt_profiler_running', '1 while the sampling profiler runs', lambda: int(profiler.running))
+
+@app.route('/api/pcs/actions', methods=['POST'])
+def bulk_pc_action():
+    # {"action": ..., "ids": [...]} or {"action": ..., "selector": {"status": "conflict", "row": 3}}
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'message': 'Request body must be a JSON object'}), 400
+    action = data.get('action')
+    if action not in machine.actions:
+        message = f'Unknown action {action}' if action is not None else 'Request needs an action'
+        return jsonify({'success': False, 'message': message}), 400
+    try:
+        pc_ids = select_pcs(data)
+    except QueryError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    try:
+        results = run_bulk_action(pc_ids, action)
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
+    applied = sum(result['success'] for result in results)
+    return jsonify({
+        'success': True,
+        'message': f'{action} applied to {applied} of {len(results)} PCs',
+        'applied': applied,
+        'failed': len(results) - applied,
+        'results': results
+    })
+
+def select_pcs(data):
+    if 'ids' in data:
+        pc_ids = data['ids']
+        if not isinstance(pc_ids, list) or not all(isinstance(pc_id, str) for pc_id in pc_ids):
+            raise QueryError('ids must be a list of PC ids')
+        return list(dict.fromkeys(pc_ids))
+    criteria_list = parse_selector(data.get('selector'))
+    with fleet.lock:
+        rows = set()
+        for criteria in criteria_list:
+            rows.update(fleet.find_rows(**criteria))
+        return [fleet.id_list[row] for row in sorted(rows)]
+
+@app.route('/api/pcs/<pc_id>/history', methods=['GET'])
+def pc_history(pc_id):
+    if pc_id not in fleet:
+        return jsonify({'success': False, 'message': 'PC not found'}), 404
+    try:
+        start, stop, step = parse_range(request.args, time.time())
+    except QueryError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    return jsonify({'success': True, 'pc_id': pc_id, **history.query(pc_id, start, stop, step)})
+
+def ingest_telemetry(payload):
+    with fleet.lock:
+        result, changes = ingestor.ingest(payload)
+        emit_pc_update(changes)
+    return result
+
+@app.route('/api/telemetry', methods=['POST'])
+def post_telemetry():
+    try:
+        result = ingest_telemetry(request.get_json(silent=True))
+    except TelemetryError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    return jsonify({'success': True, **result})
+
+@socketio.on('telemetry')
+@timed(handler_latency, 'telemetry')
+def handle_telemetry(data):
+    # Streaming agents get the result back as the Socket.IO ack
+    try:
+        return {'success': True, **ingest_telemetry(data)}
+    except TelemetryError as e:
+        return {'success': False, 'message': str(e)}
+
+@app.route('/api/outbound', methods=['GET'])
+def outbound_status():
+    # Emit batching and slow-client metrics
+    with fleet.lock:
+        return jsonify({
+            'success': True,
+            'clients': len(clients),
+            'coalescing': coalescer.stats(),
+            'backpressure': backpressure.stats()
+        })
+
+@app.route('/api/simulation', methods=['GET'])
+def simulation_status():
+    return jsonify({'success': True, 'simulation': simulation.stats()})
+
+@app.route('/api/simulation/start', methods=['POST'])
+def simulation_start():
+    data = request.get_json(silent=True) or {}
+    try:
+        simulation.configure(data.get('rate'), data.get('pcs_per_tick'), data.get('events_per_tick'))
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    started = simulation.start()
+    message = 'Simulation started' if started else 'Simulation already running'
+    return jsonify({'success': True, 'message': message, 'simulation': simulation.stats()})
+
+@app.route('/api/simulation/stop', methods=['POST'])
+def simulation_stop():
+    stopped = simulation.stop()
+    message = 'Simulation stopped' if stopped else 'Simulation not running'
+    return jsonify({'success': True, 'message': message, 'simulation': simulation.stats()})
+
+@app.route('/api/simulation/rate', methods=['POST'])
+def simulation_rate():
+    data = request.get_json(silent=True) or {}
+    try:
+        simulation.configure(data.get('rate'), data.get('pcs_per_tick'), data.get('events_per_tick'))
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    return jsonify({'success': True, 'message': 'Simulation rate updated', 'simulation': simulation.stats()})
 
 if __name__ == '__main__':
-    socketio.run(app, debug=True, host='0.0.0.0', port=5000, allow_unsafe_werkzeug=True)
+    start_background_tasks()
+    # No reloader: its parent process would import this module too, loading
+    # and journaling its own fleet and running a second simulation and history
+    socketio.run(app, debug=True, use_reloader=False, host='0.0.0.0', port=5000, allow_unsafe_werkzeug=True)
@@ -0,0 +1,139 @@
+import random
+
+from fleet_store import FIELDS
+
+STATUSES = ('active', 'user', 'conflict', 'backup')
+ANY = '*'
+
+# What each action does, by the status it is applied in. 'set' fields are
+# fixed values, 'random' fields are drawn from inclusive ranges, 'choice'
+# fields from a list, and 'toggle' flips a boolean field (the message is then
+# picked by the new value). An action with no rule for a status is invalid.
+RULES = (
+    {
+        'action': 'restart', 'from': ANY,
+        'set': {'status': 'active', 'conflict_type': None, 'uptime': 0},
+        'random': {'cpu': (10, 40), 'ram': (20, 60), 'disk': (10, 30)},
+        'message': '{id} restarted successfully'
+    },
+    {
+        'action': 'shutdown', 'from': ('user', 'conflict'),
+        'set': {'cpu': 0, 'ram': 0, 'disk': 0, 'status': 'active', 'remote_active': False, 'uptime': 0},
+        'message': '{id} shutdown complete'
+    },
+    {
+        'action': 'shutdown', 'from': ('active', 'backup'),
+        'set': {'cpu': 0, 'ram': 0, 'disk': 0, 'remote_active': False, 'uptime': 0},
+        'message': '{id} shutdown complete'
+    },
+    {
+        'action': 'remote', 'from': ANY,
+        'toggle': 'remote_active',
+        'message': {True: '{id} remote session started', False: '{id} remote session ended'}
+    },
+    {
+        'action': 'resolve', 'from': ('conflict',),
+        'set': {'status': 'active', 'conflict_type': None},
+        'random': {'cpu': (10, 40), 'ram': (20, 60), 'disk': (10, 30)},
+        'message': '{id} conflict resolved'
+    },
+    {
+        'action': 'assign', 'from': ('active',),
+        'set': {'status': 'user'},
+        'random': {'cpu': (40, 80), 'ram': (50, 90), 'disk': (20, 50)},
+        'message': '{id} assigned to user'
+    },
+    {
+        'action': 'release', 'from': ('user',),
+        'set': {'status': 'active', 'remote_active': False},
+        'random': {'cpu': (10, 40), 'ram': (20, 60), 'disk': (10, 30)},
+        'message': '{id} released from user'
+    }
+)
+
+# Transitions only the simulation's random events may take; they are not
+# actions a client can request
+EVENT_RULES = (
+    {
+        'action': 'fail', 'from': ('active', 'user'),
+        'set': {'status': 'conflict'},
+        'choice': {'conflict_type': ('hardware_conflict', 'software_conflict')},
+        'message': '{id} reported a conflict'
+    },
+)
+
+# Actions the simulation draws its random events from
+EVENT_ACTIONS = ('assign', 'release', 'remote', 'fail', 'resolve')
+
+
+class ActionError(ValueError):
+    pass
+
+
+class Transition:
+    __slots__ = ('action', 'fixed', 'ranges', 'choices', 'toggle', 'messages')
+
+    def __init__(self, rule):
+        self.action = rule['action']
+        self.fixed = dict(rule.get('set', {}))
+        self.ranges = tuple((name, low, high) for name, (low, high) in rule.get('random', {}).items())
+        self.choices = tuple(rule.get('choice', {}).items())
+        self.toggle = rule.get('toggle')
+        self.messages = rule['message']
+        for name in [*self.fixed, *(name for name, _, _ in self.ranges), *(name for name, _ in self.choices), self.toggle]:
+            if name is not None and (name not in FIELDS or name == 'id'):
+                raise ValueError(f'Rule for {self.action} changes unknown field {name}')
+
+    def plan(self, pc_id, current, rng):
+        # current(name) reads the PC's present value; only toggles need it
+        changes = dict(self.fixed)
+        for name, low, high in self.ranges:
+            changes[name] = rng.randint(low, high)
+        for name, options in self.choices:
+            changes[name] = rng.choice(options)
+        message = self.messages
+        if self.toggle is not None:
+            value = not current(self.toggle)
+            changes[self.toggle] = value
+            message = message[value]
+        return changes, message.format(id=pc_id)
+
+
+def compile_rules(rules, statuses, table):
+    for rule in rules:
+        transition = Transition(rule)
+        for status in (statuses if rule['from'] == ANY else rule['from']):
+            key = (status, transition.action)
+            if key in table:
+                raise ValueError(f'Two rules for {transition.action} from {status}')
+            table[key] = transition
+    return table
+
+
+class ActionMachine:
+    # RULES compiled once into a (status, action) -> Transition dict, so
+    # checking whether an action applies is a single lookup and needs no PC
+    # state beyond its status. Simulated events look up a second table that
+    # also holds EVENT_RULES.
+    def __init__(self, rules=RULES, statuses=STATUSES, seed=None, event_rules=EVENT_RULES):
+        self.rng = random.Random(seed)
+        self.table = compile_rules(rules, statuses, {})
+        self.event_table = compile_rules(event_rules, statuses, dict(self.table))
+        self.actions = frozenset(action for _, action in self.table)
+
+    def allowed(self, status, action, simulated=False):
+        return (status, action) in (self.event_table if simulated else self.table)
+
+    def actions_for(self, status):
+        return sorted(action for (from_status, action) in self.table if from_status == status)
+
+    def transition(self, status, action, simulated=False):
+        transition = (self.event_table if simulated else self.table).get((status, action))
+        if transition is None:
+            raise ActionError('Invalid action or status')
+        return transition
+
+    def plan(self, fleet, pc_id, action, simulated=False):
+        # (changes, message) for one PC; callers hold the PC's command lock
+        transition = self.transition(fleet.field(pc_id, 'status'), action, simulated)
+        return transition.plan(pc_id, lambda name: fleet.field(pc_id, name), self.rng)
@@ -0,0 +1,131 @@
+import base64
+import hashlib
+import os
+import sys
+import urllib.request
+
+from http_cache import CachedBody
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+# Fingerprinted URLs never change content, so clients may cache them forever
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+MIMETYPES = {'.js': 'application/javascript', '.css': 'text/css'}
+
+# Third-party libraries the page used to pull from CDNs at these pinned
+# versions, with the SHA-256 of each file. Pinned files are committed under
+# static/vendor; `python assets.py` downloads any that are missing and
+# refuses a file that doesn't match its pin. A library that isn't vendored
+# is loaded from its CDN, with the pin as its Subresource Integrity hash.
+# An entry without a pin is never vendored: fill it in from a trusted copy
+# (`python assets.py --pin` prints the digests of what the CDN serves now).
+VENDOR = {
+    'vendor/three.min.js': ('https://cdn.jsdelivr.net/npm/three@0.132.2/build/three.min.js', None),
+    'vendor/OrbitControls.js': ('https://cdn.jsdelivr.net/npm/three@0.132.2/examples/js/controls/OrbitControls.js', None),
+    'vendor/socket.io.min.js': (
+        'https://cdn.socket.io/4.8.1/socket.io.min.js', 'b0e735814f8dcfecd6cdb8a7ce95a297a7e1e5f2727a29e6f5901801d52fa0c5'
+    )
+}
+
+
+class VendorError(Exception):
+    pass
+
+
+def sha256(body):
+    return hashlib.sha256(body).hexdigest()
+
+
+class AssetPipeline:
+    # Fingerprints and pre-compresses everything under static/ at startup,
+    # so serving an asset is a dict lookup plus encoding negotiation
+    def __init__(self, root=STATIC_DIR, prefix='/assets/'):
+        self.root = root
+        self.prefix = prefix
+        self.build()
+
+    def build(self):
+        self.urls = {}
+        self.assets = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in sorted(filenames):
+                base, ext = os.path.splitext(filename)
+                if ext not in MIMETYPES:
+                    continue
+                path = os.path.join(dirpath, filename)
+                with open(path, 'rb') as f:
+                    body = f.read()
+                name = os.path.relpath(path, self.root).replace(os.sep, '/')
+                if name in VENDOR and sha256(body) != VENDOR[name][1]:
+                    # Unpinned or altered; served from the CDN instead
+                    print(f'Not serving {name}: it does not match its pinned SHA-256', file=sys.stderr)
+                    continue
+                digest = sha256(body)[:12]
+                fingerprinted = f'{name[:-len(ext)]}.{digest}{ext}'
+                self.assets[fingerprinted] = CachedBody(body, MIMETYPES[ext], IMMUTABLE)
+                self.urls[name] = self.prefix + fingerprinted
+
+    def url(self, name):
+        if name in self.urls:
+            return self.urls[name]
+        if name in VENDOR:
+            return VENDOR[name][0]
+        raise KeyError(f'Unknown asset {name}')
+
+    def integrity(self, name):
+        # Attributes for a script tag still pointing at its CDN copy
+        if name in self.urls or name not in VENDOR or VENDOR[name][1] is None:
+            return ''
+        digest = base64.b64encode(bytes.fromhex(VENDOR[name][1])).decode('ascii')
+        return f' integrity="sha256-{digest}" crossorigin="anonymous"'
+
+    def get(self, fingerprinted):
+        return self.assets.get(fingerprinted)
+
+
+def download(url):
+    with urllib.request.urlopen(url) as response:
+        return response.read()
+
+
+def vendor(root=STATIC_DIR):
+    # Fetches the pinned files that aren't in static/vendor yet; unpinned
+    # ones are left on their CDN and reported at the end
+    unpinned = []
+    for name, (url, pinned) in VENDOR.items():
+        path = os.path.join(root, *name.split('/'))
+        if pinned is None:
+            unpinned.append(name)
+            continue
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                if sha256(f.read()) == pinned:
+                    print(f'{name}: already vendored')
+                    continue
+        body = download(url)
+        if sha256(body) != pinned:
+            raise VendorError(f'{name}: {url} has SHA-256 {sha256(body)}, expected {pinned}')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(body)
+        print(f'{name}: {len(body)} bytes from {url}')
+    if unpinned:
+        raise VendorError(f'No pinned SHA-256 in assets.VENDOR for {", ".join(unpinned)}; still loaded from the CDN')
+
+
+def pin():
+    for name, (url, pinned) in VENDOR.items():
+        digest = sha256(download(url))
+        status = 'matches the pin' if digest == pinned else 'not pinned' if pinned is None else f'pinned {pinned}'
+        print(f'{name} {digest} ({status})')
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['--pin']:
+        pin()
+    else:
+        try:
+            vendor(*sys.argv[1:])
+        except VendorError as e:
+            sys.exit(str(e))
@@ -0,0 +1,9 @@
+# Imported first by the in-process benchmarks: makes the app importable from
+# here and keeps their throwaway fleets out of the app's saved state
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+sys.path.insert(0, ROOT)
+os.environ['DT_STATE_DIR'] = ''
@@ -0,0 +1,150 @@
+# Runs serve.py through a simulation burst with one websocket client reading
+# as frames arrive and one long-polling client that only polls every few
+# seconds, so frames pile up in its server-side queue. Prints the emit
+# batching and slow-client metrics from /api/outbound next to the server's
+# memory, once with the default queue limit and once with the limit
+# effectively off. After the burst both clients must reach the latest seq.
+#   python benchmarks/bench_backpressure.py [pcs] [seconds] [rate] [pcs per tick]
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+from cluster_harness import ROOT, free_port, request, wait_http
+from load_test import SocketClient
+
+SLOW_POLL = 6.0
+CATCH_UP_TIMEOUT = 30.0
+
+
+def follow(client, name, data):
+    # Tracks the delta sequence the way the browser does, resyncing on a gap
+    client.frames += 1
+    if name == 'pcs_snapshot' or (name == 'pcs_delta' and data['since'] == client.seq):
+        client.seq = data['seq']
+    elif name == 'pcs_delta' and (client.seq is None or data['seq'] > client.seq):
+        client.emit('sync', {'epoch': data['epoch'], 'seq': client.seq})
+
+
+class TrackingClient(SocketClient):
+    def __init__(self, port):
+        self.seq = None
+        self.frames = 0
+        super().__init__(port)
+        self.emit('sync', {})
+
+    def read(self):
+        try:
+            while True:
+                packet = self.ws.receive()
+                if packet == '2':
+                    self.ws.send('3')
+                elif packet.startswith('42'):
+                    follow(self, *json.loads(packet[2:]))
+        except Exception:
+            self.open = False
+
+
+class PollingClient:
+    # Engine.IO long-polling session that waits `interval` seconds between polls
+    def __init__(self, port, interval):
+        base = f'http://127.0.0.1:{port}/socket.io/?EIO=4&transport=polling'
+        self.url = f"{base}&sid={json.loads(urllib.request.urlopen(base).read().decode()[1:])['sid']}"
+        self.interval = interval
+        self.seq = None
+        self.frames = 0
+        self.open = True
+        self.post('40')
+        self.emit('sync', {})
+        threading.Thread(target=self.read, daemon=True).start()
+
+    def post(self, payload):
+        urllib.request.urlopen(urllib.request.Request(self.url, data=payload.encode(), method='POST'), timeout=30).read()
+
+    def emit(self, name, data):
+        self.post('42' + json.dumps([name, data]))
+
+    def read(self):
+        try:
+            while self.open:
+                for packet in urllib.request.urlopen(self.url, timeout=60).read().decode().split('\x1e'):
+                    if packet == '2':
+                        self.post('3')
+                    elif packet.startswith('42'):
+                        follow(self, *json.loads(packet[2:]))
+                time.sleep(self.interval)
+        except Exception:
+            self.open = False
+
+    def close(self):
+        self.open = False
+
+
+def get_json(port, path):
+    with urllib.request.urlopen(f'http://127.0.0.1:{port}{path}', timeout=30) as response:
+        return json.loads(response.read())
+
+
+def rss_mb(pid):
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def run(pcs, seconds, rate, pcs_per_tick, queue_limit):
+    port = free_port()
+    env = dict(os.environ, DT_STATE_DIR='', DT_PCS=str(pcs))
+    if queue_limit is not None:
+        env['DT_EMIT_QUEUE'] = str(queue_limit)
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'serve.py'), '--mode', 'threading', '--host', '127.0.0.1', '--port', str(port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    clients = []
+    try:
+        wait_http(port)
+        fast = TrackingClient(port)
+        slow = PollingClient(port, SLOW_POLL)
+        clients = [fast, slow]
+        while fast.seq is None or slow.seq is None:
+            time.sleep(0.1)
+        print(f"{'s':>4}{'batches':>9}{'avg PCs':>9}{'window ms':>11}{'behind':>8}{'dropped':>9}{'max depth':>11}{'RSS MB':>8}")
+        request('POST', port, '/api/simulation/start', {'rate': rate, 'pcs_per_tick': pcs_per_tick})
+        for second in range(1, seconds + 1):
+            time.sleep(1)
+            metrics = get_json(port, '/api/outbound')
+            batching, pressure = metrics['coalescing'], metrics['backpressure']
+            print(f"{second:4}{batching['batches']:9}{batching['avg_batch']:9}{batching['avg_window_ms']:11}"
+                  f"{pressure['behind']:8}{pressure['dropped_frames']:9}{pressure['max_queue_depth']:11}{rss_mb(server.pid):8.0f}")
+        ticks = get_json(port, '/api/simulation')['simulation']['ticks']
+        request('POST', port, '/api/simulation/stop')
+        slow.interval = 0.0
+        start = time.perf_counter()
+        time.sleep(0.5)
+        while time.perf_counter() - start < CATCH_UP_TIMEOUT and (slow.seq != fast.seq or not slow.open):
+            time.sleep(0.1)
+        caught_up = slow.seq == fast.seq and slow.open
+        print(f'{ticks} ticks sent as {fast.frames} frames to the fast client and {slow.frames} to the slow one; '
+              + (f'slow client caught up to seq {slow.seq} in {time.perf_counter() - start:.1f} s' if caught_up
+                 else f'slow client did not catch up (seq {slow.seq} vs {fast.seq}, connected: {slow.open})'))
+    finally:
+        for client in clients:
+            client.close()
+        server.terminate()
+        server.wait()
+
+
+def main(pcs='20000', seconds='10', rate='50', pcs_per_tick='500'):
+    print(f'{pcs} PCs, simulation at {rate} ticks/s of {pcs_per_tick} PCs for {seconds} s, slow client polls every {SLOW_POLL:.0f} s')
+    for label, limit in (('default queue limit', None), ('queue limit off', 10 ** 9)):
+        print(label)
+        run(int(pcs), int(seconds), float(rate), int(pcs_per_tick), limit)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,147 @@
+# Emit latency with many Socket.IO clients spread over the rooms of a
+# layout: every client on the whole-fleet broadcast, then each subscribed to
+# one room's channel. First in-process (server time per emit_pc_update, and
+# how many frames it sends), then over real websockets against serve.py
+# (time from an action's POST until its delta reaches the interested
+# clients, and whether clients in other rooms got it).
+#   python benchmarks/bench_channels.py [clients] [rooms] [rounds] [mode]
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import _common
+# Fan-out is what's measured, so deltas go out as they happen rather than batched
+os.environ['DT_EMIT_WINDOW_MS'] = '0'
+LAYOUT = tempfile.NamedTemporaryFile('w', suffix='.json', delete=False)
+os.environ['DT_LAYOUT'] = LAYOUT.name
+
+from cluster_harness import ROOT, free_port, request, wait_http
+from load_test import connect_clients
+
+DELIVERY_TIMEOUT = 5.0
+EVENTS = ('pcs_delta', 'view_delta')
+
+
+def write_layout(rooms):
+    json.dump({'floors': 1, 'rooms_per_floor': rooms, 'room': {'rows': 4, 'seats': 5}}, LAYOUT)
+    LAYOUT.close()
+
+
+def get_json(port, path):
+    with urllib.request.urlopen(f'http://127.0.0.1:{port}{path}', timeout=30) as response:
+        return json.loads(response.read())
+
+
+def emit_cost(clients, rounds):
+    import DT
+    from refresh_engine import DRIFT_STEPS
+
+    fleet = DT.fleet
+    rooms = [room['room'] for room in fleet.rooms()]
+    test_clients = [DT.socketio.test_client(DT.app) for _ in range(clients)]
+
+    def frames():
+        return sum(len(client.get_received()) for client in test_clients)
+
+    def one_pc():
+        # A cpu change leaves the stats alone, so only the delta itself goes out
+        pc_id = random.choice(fleet.id_list)
+        with fleet.lock:
+            start = time.perf_counter()
+            DT.emit_pc_update({pc_id: fleet.update(pc_id, {'cpu': (fleet.field(pc_id, 'cpu') + 1) % 100})})
+            return time.perf_counter() - start
+
+    def drift():
+        with fleet.lock:
+            rows = DT.engine.drift(len(fleet) // 10)
+            changes = DT.engine.changes(rows, rows, DRIFT_STEPS)
+            start = time.perf_counter()
+            DT.emit_pc_update(changes)
+            return time.perf_counter() - start
+
+    print(f'in-process: {clients} clients, {len(fleet)} PCs in {len(rooms)} rooms')
+    print(f"{'':12}{'delta':>12}{'emit ms':>10}{'frames':>8}")
+    frames()
+    for setup in ('broadcast', 'channels'):
+        if setup == 'channels':
+            for i, client in enumerate(test_clients):
+                client.emit('subscribe', {'floor': 1, 'room': rooms[i % len(rooms)]})
+            frames()
+        for name, fn in (('one PC', one_pc), ('10% drift', drift)):
+            times = [fn() for _ in range(rounds)]
+            print(f'{setup:12}{name:>12}{statistics.median(times) * 1e3:10.2f}{frames() / rounds:8.0f}')
+    for client in test_clients:
+        client.disconnect()
+
+
+def delivery(port, clients, rooms, rounds, subscribed):
+    # Median and slowest delivery to interested clients, the share of them
+    # that got the delta, and how many clients in other rooms got it
+    latencies = []
+    delivered = expected = strays = 0
+    for _ in range(rounds):
+        index = random.randrange(len(rooms))
+        pc_id = get_json(port, f'/api/pcs?room={rooms[index]}&fields=id&limit=1')['pcs'][0]['id']
+        interested = [c for i, c in enumerate(clients) if not subscribed or i % len(rooms) == index]
+        for client in clients:
+            client.pc_id = pc_id
+            client.received.clear()
+        start = time.perf_counter()
+        deadline = start + DELIVERY_TIMEOUT
+        request('POST', port, f'/api/pcs/{pc_id}/action', {'action': 'remote'})
+        for client in interested:
+            if client.received.wait(max(0.0, deadline - time.perf_counter())):
+                latencies.append(client.received_at - start)
+        time.sleep(0.2)
+        expected += len(interested)
+        delivered += sum(client.received.is_set() for client in interested)
+        strays += sum(client.received.is_set() for client in clients) - sum(client.received.is_set() for client in interested)
+    return statistics.median(latencies) if latencies else 0.0, max(latencies, default=0.0), delivered / expected, strays
+
+
+def live(clients, rounds, mode):
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'serve.py'), '--mode', mode, '--host', '127.0.0.1', '--port', str(port)],
+        env=dict(os.environ), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    pool = []
+    try:
+        wait_http(port)
+        rooms = [room['room'] for room in get_json(port, '/api/layout')['rooms']]
+        failed = connect_clients(port, clients, pool)
+        for client in pool:
+            client.events = EVENTS
+        print(f'live ({mode}): {len(pool)} websocket clients ({failed} failed), {len(rooms)} rooms')
+        print(f"{'':12}{'median ms':>10}{'max ms':>10}{'delivered':>10}{'strays':>8}")
+        for setup in ('broadcast', 'channels'):
+            if setup == 'channels':
+                for i, client in enumerate(pool):
+                    client.emit('subscribe', {'floor': 1, 'room': rooms[i % len(rooms)]})
+                time.sleep(2)
+            median, slowest, share, strays = delivery(port, pool, rooms, rounds, setup == 'channels')
+            print(f'{setup:12}{median * 1e3:10.1f}{slowest * 1e3:10.1f}{share:10.1%}{strays:8}')
+    finally:
+        for client in pool:
+            client.close()
+        server.terminate()
+        server.wait()
+
+
+def main(clients='1000', rooms='50', rounds='20', mode='threading'):
+    write_layout(int(rooms))
+    try:
+        emit_cost(int(clients), int(rounds))
+        live(int(clients), int(rounds), mode)
+    finally:
+        os.unlink(LAYOUT.name)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,62 @@
+# Memory and latency of FleetStore against the old list-of-dicts pcs_data
+import random
+import sys
+import time
+import tracemalloc
+
+import _common
+
+import DT
+from fleet_store import FleetStore
+
+
+def build_dicts(count):
+    DT.initialize_pcs(count)
+    return DT.fleet.all()
+
+
+def measure(build):
+    tracemalloc.start()
+    obj = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, size
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main(count=50000, lookups=2000):
+    pcs = build_dicts(count)
+    random_ids = [f'PC-{str(random.randint(1, count)).zfill(2)}' for _ in range(lookups)]
+
+    pcs_data, list_bytes = measure(lambda: [dict(pc) for pc in pcs])
+    store, store_bytes = measure(lambda: _loaded(pcs))
+
+    list_lookup = timed(lambda: [next(p for p in pcs_data if p['id'] == pc_id) for pc_id in random_ids[:50]], 1) / 50
+    store_lookup = timed(lambda: [store.get(pc_id) for pc_id in random_ids], 1) / lookups
+    list_filter = timed(lambda: [p for p in pcs_data if p['status'] == 'conflict'], 5)
+    store_filter = timed(lambda: store.find_rows(status='conflict'), 5)
+    list_count = timed(lambda: sum(1 for p in pcs_data if p['remote_active']), 5)
+    store_count = timed(lambda: store.count(remote_active=True), 5)
+
+    print(f'PCs: {count}')
+    print(f"{'':24}{'list of dicts':>16}{'FleetStore':>16}")
+    print(f"{'memory (MiB)':24}{list_bytes / 2**20:16.2f}{store_bytes / 2**20:16.2f}")
+    print(f"{'lookup by id (us)':24}{list_lookup * 1e6:16.2f}{store_lookup * 1e6:16.2f}")
+    print(f"{'status=conflict (ms)':24}{list_filter * 1e3:16.2f}{store_filter * 1e3:16.2f}")
+    print(f"{'count remote (ms)':24}{list_count * 1e3:16.2f}{store_count * 1e3:16.4f}")
+
+
+def _loaded(pcs):
+    store = FleetStore()
+    store.load(pcs)
+    return store
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,56 @@
+# A day of fleet samples for 1k PCs, then history range queries at each
+# resolution for random PCs
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import _common
+
+import DT
+from history import SAMPLE_INTERVAL, History
+
+
+def main(count=1000, hours=24, queries=200):
+    DT.initialize_pcs(count)
+    directory = tempfile.mkdtemp(prefix='dt-history-')
+    try:
+        history = History(directory)
+        stop = time.time() // 3600 * 3600
+        start = stop - hours * 3600
+        samples = int(hours * 3600 / SAMPLE_INTERVAL)
+        begin = time.perf_counter()
+        for k in range(samples):
+            DT.engine.drift()
+            history.sample(DT.fleet, now=start + k * SAMPLE_INTERVAL)
+        seconds = time.perf_counter() - begin
+        size = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(directory) for name in names)
+        print(f'{count} PCs, {samples} samples over {hours} h: {seconds * 1e3 / samples:.3f} ms per sample, {size:,} bytes on disk')
+        print(f'ring buffer: {history.ring.nbytes / count:.0f} bytes per PC')
+
+        ids = DT.fleet.ids()
+        cases = {
+            'last hour, raw': (stop - 3600, stop, SAMPLE_INTERVAL),
+            'day, 1m': (start, stop, 60),
+            'day, 5m': (start, stop, 300),
+            'day, 1h': (start, stop, 3600)
+        }
+        print(f"{'':18}{'resolution':>12}{'points':>8}{'avg ms':>10}{'max ms':>10}")
+        for name, (lo, hi, step) in cases.items():
+            timings = []
+            for _ in range(queries):
+                pc_id = random.choice(ids)
+                begin = time.perf_counter()
+                result = history.query(pc_id, lo, hi, step, now=stop)
+                timings.append(time.perf_counter() - begin)
+            print(f"{name:18}{result['resolution']:>12}{len(result['history']['t']):8}"
+                  f'{sum(timings) / len(timings) * 1e3:10.2f}{max(timings) * 1e3:10.2f}')
+        history.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
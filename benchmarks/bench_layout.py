@@ -0,0 +1,59 @@
+# Generates a multi-floor campus from a layout config and times region,
+# room and row queries against a linear scan of the fleet
+import os
+import random
+import sys
+import time
+
+import _common
+
+import DT
+import layout
+
+
+def timed(fn, repeat=200):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1e3, result
+
+
+def main(floors=5, rooms_per_floor=100):
+    config = dict(layout.load(os.path.join(os.path.dirname(__file__), '..', 'layouts', 'campus.json')),
+                  floors=floors, rooms_per_floor=rooms_per_floor, rooms_per_row=10)
+    start = time.perf_counter()
+    DT.initialize_pcs(config=config)
+    fleet = DT.fleet
+    print(f'{len(fleet)} seats in {len(fleet.rooms())} rooms on {floors} floors, '
+          f'generated and loaded in {time.perf_counter() - start:.2f} s')
+
+    room = random.choice(fleet.rooms())
+    region = (room['x0'], room['z0'], room['x1'], room['z1'])
+    records = fleet.records
+
+    def scan_region():
+        x0, z0, x1, z1 = region
+        return [r.row for r in records if r.floor == room['floor'] and x0 <= r.x <= x1 and z0 <= r.z <= z1]
+
+    cases = {
+        'region (one room)': (lambda: fleet.find_rows(region=region, floor=room['floor']), scan_region),
+        'room': (lambda: fleet.find_rows(room=room['room']), lambda: [r.row for r in records if r.room == room['room']]),
+        'room + row': (
+            lambda: fleet.find_rows(room=room['room'], lab_row=3),
+            lambda: [r.row for r in records if r.room == room['room'] and r.lab_row == 3]
+        ),
+        'floor region 50x50': (
+            lambda: fleet.find_rows(region=(0, 0, 50, -50), floor=2),
+            lambda: [r.row for r in records if r.floor == 2 and 0 <= r.x <= 50 and -50 <= r.z <= 0]
+        )
+    }
+    print(f"{'':22}{'rows':>6}{'index ms':>10}{'scan ms':>10}")
+    for name, (indexed, scan) in cases.items():
+        index_ms, rows = timed(indexed)
+        scan_ms, expected = timed(scan, 5)
+        assert rows == sorted(expected), name
+        print(f'{name:22}{len(rows):6}{index_ms:10.3f}{scan_ms:10.2f}')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,67 @@
+# Overhead of the instrumentation: per-request cost of the latency hooks,
+# per-emit cost of counting packets, time to render /metrics, and how much
+# slower simulation ticks run with the sampling profiler on
+import os
+import sys
+import time
+
+import _common
+os.environ['DT_EMIT_WINDOW_MS'] = '0'
+
+import DT
+from socketio import packet
+
+
+def per_call(fn, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        fn()
+    return (time.perf_counter() - start) / count
+
+
+def requests(count):
+    client = DT.app.test_client()
+    return per_call(lambda: client.get('/api/stats'), count)
+
+
+def main(pcs=10000, count=5000):
+    DT.initialize_pcs(pcs)
+    app = DT.app
+
+    # Best of three alternating runs; single runs are noisier than the difference
+    hooks = (app.before_request_funcs[None], app.after_request_funcs[None])
+    requests(200)
+    instrumented = bare = float('inf')
+    for _ in range(3):
+        instrumented = min(instrumented, requests(count))
+        app.before_request_funcs[None], app.after_request_funcs[None] = [], []
+        bare = min(bare, requests(count))
+        app.before_request_funcs[None], app.after_request_funcs[None] = hooks
+    print(f'GET /api/stats: {bare * 1e6:.1f} us bare, {instrumented * 1e6:.1f} us with latency hooks '
+          f'(+{(instrumented - bare) * 1e6:.1f} us)')
+
+    data = ['pcs_delta', {'epoch': 'x', 'since': 1, 'seq': 2, 'changes': {'PC-01': {'cpu': 10, 'ram': 20}}}]
+    counted_class = DT.socketio.server.packet_class
+    counted = per_call(lambda: counted_class(packet.EVENT, data=data).encode(), count * 10)
+    bare = per_call(lambda: packet.Packet(packet.EVENT, data=data).encode(), count * 10)
+    print(f'encode a small delta: {bare * 1e6:.2f} us bare, {counted * 1e6:.2f} us counted '
+          f'(+{(counted - bare) * 1e6:.2f} us)')
+
+    client = DT.app.test_client()
+    print(f'/metrics: {per_call(lambda: client.get("/metrics"), 200) * 1e3:.2f} ms per scrape')
+
+    def ticks():
+        return per_call(lambda: DT.simulation_tick(pcs // 10, 10), 200)
+    ticks()
+    off = ticks()
+    for interval in (0.01, 0.001):
+        DT.profiler.start(interval)
+        on = ticks()
+        DT.profiler.stop()
+        time.sleep(interval * 2)
+        print(f'simulation tick ({pcs // 10} PCs): {off * 1e3:.2f} ms, {on * 1e3:.2f} ms with the profiler '
+              f'sampling every {interval * 1e3:g} ms ({DT.profiler.stats()["samples"]} samples)')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,64 @@
+# Startup-to-ready from saved state: load the snapshot and replay a log
+# tail just under the snapshot threshold (a full refresh plus PC actions)
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import _common
+
+import DT
+from fleet_store import FleetStore
+from persistence import SNAPSHOT_CHANGES_PER_PC, StateJournal
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def write_state(directory, count, actions):
+    DT.initialize_pcs(count)
+    journal = StateJournal(directory)
+    seconds, _ = timed(lambda: journal.snapshot(DT.fleet))
+    rows, touched = DT.engine.refresh()
+    journal.append(DT.engine.changes(rows, touched))
+    ids = DT.fleet.ids()
+    for _ in range(actions):
+        pc_id = random.choice(ids)
+        journal.append({pc_id: DT.fleet.update(pc_id, {'status': 'conflict', 'conflict_type': 'software_conflict'})})
+    journal.close()
+    return seconds, DT.fleet.all()
+
+
+def main(*sizes):
+    for count in sizes or (10000, 100000):
+        # Tail sized to just under the point where a new snapshot would be due
+        actions = max(SNAPSHOT_CHANGES_PER_PC * count - count - 1, 0)
+        directory = tempfile.mkdtemp(prefix='dt-state-')
+        try:
+            snapshot_seconds, expected = write_state(directory, count, actions)
+            generate_seconds, _ = timed(lambda: DT.initialize_pcs(count))
+            size = os.path.getsize(os.path.join(directory, 'snapshot.npz'))
+            fleet = FleetStore()
+            journal = StateJournal(directory)
+            load_seconds, _ = timed(lambda: journal.load_snapshot(fleet))
+            fleet = FleetStore()
+            journal = StateJournal(directory)
+            recover_seconds, _ = timed(lambda: journal.recover(fleet))
+            journal.close()
+            assert fleet.all() == expected, 'recovered fleet differs from the saved one'
+            print(f'\n{count} PCs, log tail of {count + actions} PC changes')
+            print(f'  generate fresh lab  {generate_seconds * 1e3:9.1f} ms')
+            print(f'  write snapshot      {snapshot_seconds * 1e3:9.1f} ms  ({size:,} bytes)')
+            print(f'  load snapshot       {load_seconds * 1e3:9.1f} ms')
+            print(f'  snapshot + replay   {recover_seconds * 1e3:9.1f} ms')
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
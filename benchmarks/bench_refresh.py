@@ -0,0 +1,61 @@
+# Vectorized RefreshEngine against the old per-PC random.randint refresh loop
+import random
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+import _common
+
+import DT
+import codec
+from refresh_engine import RefreshEngine
+
+
+def legacy_refresh(pcs_data):
+    for pc in pcs_data:
+        if pc['status'] != 'backup':
+            pc['cpu'] = random.randint(20, 80)
+            pc['ram'] = random.randint(20, 90)
+            pc['disk'] = random.randint(15, 55)
+            pc['uptime'] = random.randint(1, 72)
+        pc['last_updated'] = datetime.now().strftime('%H:%M:%S')
+
+
+def best_of(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(count=1000000):
+    start = time.perf_counter()
+    DT.initialize_pcs(count)
+    print(f'Built {count} PCs in {time.perf_counter() - start:.1f} s')
+    engine = RefreshEngine(DT.fleet, seed=1)
+
+    legacy_count = min(count, 100000)
+    pcs_data = DT.fleet.rows_to_dicts(range(legacy_count))
+    legacy, _ = best_of(lambda: legacy_refresh(pcs_data), 1)
+
+    masked, (rows, touched) = best_of(engine.refresh)
+    everything = np.ones(len(DT.fleet), bool)
+    whole, _ = best_of(lambda: engine.refresh(mask=everything))
+    delta, changes = best_of(lambda: engine.changes(rows, touched))
+    frame, _ = best_of(lambda: codec.encode(codec.delta_columns(changes, False), 'json'), 1)
+    per_pc, _ = best_of(lambda: dict(changes.items()), 1)
+
+    print(f'legacy loop, {legacy_count} PCs: {legacy * 1e3:9.1f} ms')
+    print(f'engine, non-backup mask:   {masked * 1e3:9.1f} ms ({len(rows)} rows)')
+    print(f'engine, whole fleet:       {whole * 1e3:9.1f} ms')
+    print(f'delta build for emit:      {delta * 1e3:9.1f} ms')
+    print(f'columnar JSON frame:       {frame * 1e3:9.1f} ms')
+    print(f'per-PC dicts (old delta):  {per_pc * 1e3:9.1f} ms')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
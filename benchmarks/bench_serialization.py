@@ -0,0 +1,54 @@
+# Encode time and bytes on the wire: JSON rows (the old jsonify payload)
+# against MessagePack rows and the columnar typed-array layout
+import json
+import sys
+import time
+
+import _common
+
+import DT
+import codec
+
+
+def best_of(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, len(body)
+
+
+def encoders(pcs, changes):
+    encoders = {
+        'json rows': lambda: json.dumps(pcs),
+        'json columnar': lambda: codec.encode(codec.fleet_columns(DT.fleet, False), 'json'),
+        'json delta': lambda: json.dumps(dict(changes.items())),
+        'json delta columnar': lambda: codec.encode(codec.delta_columns(changes, False), 'json')
+    }
+    if codec.msgpack is not None:
+        encoders.update({
+            'msgpack rows': lambda: codec.encode(pcs, 'msgpack'),
+            'msgpack columnar': lambda: codec.encode(codec.fleet_columns(DT.fleet, True), 'msgpack'),
+            'msgpack delta columnar': lambda: codec.encode(codec.delta_columns(changes, True), 'msgpack')
+        })
+    return encoders
+
+
+def main(*sizes):
+    if codec.msgpack is None:
+        print('msgpack is not installed; only the JSON layouts are measured')
+    for count in sizes or (1000, 10000, 100000):
+        DT.initialize_pcs(count)
+        pcs = DT.fleet.all()
+        rows, touched = DT.engine.refresh()
+        changes = DT.engine.changes(rows, touched)
+        print(f'\n{count} PCs (snapshot, and a full refresh delta)')
+        print(f"{'':26}{'encode ms':>12}{'bytes':>14}{'bytes/PC':>10}")
+        for name, fn in encoders(pcs, changes).items():
+            seconds, size = best_of(fn)
+            print(f'{name:26}{seconds * 1e3:12.2f}{size:14,}{size / count:10.1f}')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
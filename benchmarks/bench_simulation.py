@@ -0,0 +1,38 @@
+# How many PCs per tick fit in the tick budget, including the delta emit
+import statistics
+import sys
+import time
+
+import _common
+
+import DT
+
+
+def tick_ms(pcs_per_tick, ticks):
+    durations = []
+    for _ in range(ticks):
+        start = time.perf_counter()
+        DT.simulation_tick(pcs_per_tick, 0)
+        durations.append((time.perf_counter() - start) * 1e3)
+    return statistics.median(durations), max(durations)
+
+
+def main(fleet_size=200000, rate=10, ticks=10):
+    DT.initialize_pcs(fleet_size)
+    budget = 1e3 / rate
+    print(f'fleet {fleet_size} PCs, {rate} ticks/s, budget {budget:.1f} ms')
+    print(f"{'pcs/tick':>10}{'median ms':>12}{'max ms':>10}")
+    sustained = 0
+    batch = 100
+    while batch <= fleet_size:
+        median, worst = tick_ms(batch, ticks)
+        print(f'{batch:>10}{median:>12.2f}{worst:>10.2f}')
+        if worst > budget:
+            break
+        sustained = batch
+        batch *= 2
+    print(f'max sustained within budget: ~{sustained} PCs/tick')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,63 @@
+# Transitions per second through the compiled action table: bare lookups,
+# validation, planning a PC's changes, and planning plus applying them to
+# the fleet (single and one bulk pass)
+import random
+import sys
+import time
+
+import _common
+
+import DT
+from actions import RULES, STATUSES, ActionMachine
+
+
+def rate(fn, count):
+    start = time.perf_counter()
+    fn(count)
+    return count / (time.perf_counter() - start)
+
+
+def main(count=100000, operations=200000):
+    DT.initialize_pcs(count)
+    begin = time.perf_counter()
+    machine = ActionMachine()
+    compile_ms = (time.perf_counter() - begin) * 1e3
+    actions = sorted({rule['action'] for rule in RULES})
+    keys = [(random.choice(STATUSES), random.choice(actions)) for _ in range(1024)]
+    ids = DT.fleet.ids()
+    pairs = [(random.choice(ids), random.choice(actions)) for _ in range(1024)]
+    fleet = DT.fleet
+    stamp = '00:00:00'
+
+    def lookups(n):
+        table = machine.table
+        for i in range(n):
+            table.get(keys[i & 1023])
+
+    def validations(n):
+        for i in range(n):
+            machine.allowed(*keys[i & 1023])
+
+    def plans(n):
+        for i in range(n):
+            pc_id, action = pairs[i & 1023]
+            if machine.allowed(fleet.field(pc_id, 'status'), action):
+                machine.plan(fleet, pc_id, action)
+
+    def applies(n):
+        with fleet.lock:
+            for i in range(n):
+                DT.apply_actions([pairs[i & 1023]], stamp)
+
+    def bulk(n):
+        with fleet.lock:
+            DT.apply_actions([(ids[i % count], 'restart') for i in range(n)], stamp)
+
+    print(f'{len(machine.table)} transitions compiled in {compile_ms:.2f} ms; {count} PCs')
+    for name, fn in (('lookup', lookups), ('allowed', validations), ('plan', plans),
+                     ('plan + apply', applies), ('bulk restart', bulk)):
+        print(f'{name:14}{rate(fn, operations):14,.0f} /s')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
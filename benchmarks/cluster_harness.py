@@ -0,0 +1,201 @@
+# Runs a broker plus N workers on localhost and checks that an action
+# handled by one worker reaches a Socket.IO client connected to another,
+# then measures request throughput for 1, 2 and 4 workers with load spread
+# round-robin, the way a load balancer would.
+#   python benchmarks/cluster_harness.py [pcs] [seconds] [clients]
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+WORKER = (
+    'import sys, DT; DT.start_background_tasks(); '
+    "DT.socketio.run(DT.app, host='127.0.0.1', port=int(sys.argv[1]), allow_unsafe_werkzeug=True, log_output=False)"
+)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_http(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/stats', timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'worker on port {port} did not start')
+
+
+class Cluster:
+    def __init__(self, workers, pcs, state_dir):
+        self.env = dict(
+            os.environ, DT_STATE_DIR=state_dir, DT_BROKER=f'127.0.0.1:{free_port()}', DT_BROKER_KEY=secrets.token_hex(16)
+        )
+        self.pcs = pcs
+        self.count = workers
+        self.processes = []
+        self.ports = []
+
+    def __enter__(self):
+        broker = subprocess.Popen(
+            [sys.executable, '-c', f"import DT, cluster; DT.initialize_pcs({self.pcs}); cluster.main('{self.env['DT_BROKER']}')"],
+            cwd=ROOT, env={name: value for name, value in self.env.items() if name != 'DT_BROKER'},
+            stdout=subprocess.PIPE, text=True
+        )
+        self.processes.append(broker)
+        broker.stdout.readline()
+        for _ in range(self.count):
+            port = free_port()
+            self.processes.append(subprocess.Popen(
+                [sys.executable, '-c', WORKER, str(port)], cwd=ROOT, env=self.env,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            ))
+            self.ports.append(port)
+        for port in self.ports:
+            wait_http(port)
+        return self
+
+    def __exit__(self, *exc):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.wait()
+
+
+def polling_client(port):
+    # Bare Engine.IO long-polling session; returns a function yielding events
+    base = f'http://127.0.0.1:{port}/socket.io/?EIO=4&transport=polling'
+    handshake = urllib.request.urlopen(base).read().decode()
+    sid = json.loads(handshake[1:])['sid']
+    url = f'{base}&sid={sid}'
+    urllib.request.urlopen(urllib.request.Request(url, data=b'40', method='POST')).read()
+
+    def events():
+        for packet in urllib.request.urlopen(url, timeout=30).read().decode().split('\x1e'):
+            if packet.startswith('42'):
+                yield json.loads(packet[2:])
+    return events
+
+
+def check_cross_worker(cluster):
+    if len(cluster.ports) < 2:
+        return
+    events = polling_client(cluster.ports[1])
+    list(events())
+    request('POST', cluster.ports[0], '/api/pcs/PC-01/action', {'action': 'remote'})
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        for name, data in events():
+            if name == 'pcs_delta' and 'PC-01' in data['changes']:
+                print(f'  action on worker :{cluster.ports[0]} reached a client on worker :{cluster.ports[1]}')
+                return
+    raise RuntimeError('delta did not reach the other worker')
+
+
+def check_serialized(cluster, toggles=21):
+    # Concurrent remote toggles on one PC through every worker; none may be lost
+    def remote():
+        pcs = json.loads(urllib.request.urlopen(f'http://127.0.0.1:{cluster.ports[0]}/api/pcs?fields=id,remote_active&limit=1').read())
+        return pcs['pcs'][0]['remote_active']
+    before = remote()
+    statuses = []
+    threads = [
+        threading.Thread(target=lambda port: statuses.append(request('POST', port, '/api/pcs/PC-01/action', {'action': 'remote'})),
+                         args=(cluster.ports[i % len(cluster.ports)],))
+        for i in range(toggles)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    time.sleep(0.5)
+    if remote() != before ^ (statuses.count(200) % 2 == 1):
+        raise RuntimeError('concurrent actions on one PC were lost')
+
+
+def check_converged(cluster):
+    # Every replica ends up with the same fleet once the broker's deltas drain
+    time.sleep(1)
+    views = [
+        urllib.request.urlopen(f'http://127.0.0.1:{port}/api/pcs?fields=id,status,cpu,remote_active').read()
+        for port in cluster.ports
+    ]
+    if any(view != views[0] for view in views):
+        raise RuntimeError('worker replicas diverged')
+
+
+def request(method, port, path, body=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    payload = json.dumps(body) if body is not None else None
+    conn.request(method, path, payload, {'Content-Type': 'application/json'} if payload else {})
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    return response.status
+
+
+def load(ports, pcs, seconds, results):
+    # Mix of telemetry batches, single-PC actions and small paged reads
+    ids = [f'PC-{str(i).zfill(2)}' for i in range(1, pcs + 1)]
+    done = errors = 0
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        port = ports[done % len(ports)]
+        kind = random.random()
+        if kind < 0.5:
+            samples = [{'id': random.choice(ids), 'cpu': random.randint(0, 100)} for _ in range(50)]
+            status = request('POST', port, '/api/telemetry', {'samples': samples})
+        elif kind < 0.8:
+            status = request('POST', port, f'/api/pcs/{random.choice(ids)}/action', {'action': 'remote'})
+        else:
+            status = request('GET', port, '/api/pcs?limit=100')
+        done += 1
+        errors += status >= 500
+    results.put((done, errors))
+
+
+def measure(cluster, seconds, clients):
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=load, args=(cluster.ports[i:] + cluster.ports[:i], cluster.pcs, seconds, results))
+        for i in range(clients)
+    ]
+    for process in processes:
+        process.start()
+    totals = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return sum(done for done, _ in totals) / seconds, sum(errors for _, errors in totals)
+
+
+def main(pcs=1000, seconds=5, clients=8):
+    print(f'{pcs} PCs, {clients} client processes, {seconds} s per run, {os.cpu_count()} CPUs')
+    baseline = None
+    for workers in (1, 2, 4):
+        with tempfile.TemporaryDirectory(prefix='dt-cluster-') as state_dir, Cluster(workers, pcs, state_dir) as cluster:
+            check_cross_worker(cluster)
+            check_serialized(cluster)
+            rate, errors = measure(cluster, seconds, clients)
+            check_converged(cluster)
+            baseline = baseline or rate
+            print(f'  {workers} worker(s): {rate:8.0f} req/s  ({rate / baseline:.2f}x, {errors} errors)')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
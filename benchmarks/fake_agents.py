@@ -0,0 +1,98 @@
+# Fake agent fleet posting telemetry batches, for load-testing /api/telemetry
+#
+#   python benchmarks/fake_agents.py                       # in-process, no network
+#   python benchmarks/fake_agents.py --url http://localhost:5000 --agents 8
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.request
+
+import _common
+
+
+def make_batch(ids, size, columnar):
+    picked = random.sample(ids, min(size, len(ids)))
+    if columnar:
+        return {
+            'ids': picked,
+            'cpu': [random.randint(0, 100) for _ in picked],
+            'ram': [random.randint(0, 100) for _ in picked],
+            'disk': [random.randint(0, 100) for _ in picked],
+            'uptime': [random.randint(0, 500) for _ in picked]
+        }
+    return {'samples': [
+        {'id': pc_id, 'cpu': random.randint(0, 100), 'ram': random.randint(0, 100),
+         'disk': random.randint(0, 100), 'uptime': random.randint(0, 500)}
+        for pc_id in picked
+    ]}
+
+
+def post(url, body):
+    request = urllib.request.Request(
+        f'{url}/api/telemetry', data=body, headers={'Content-Type': 'application/json'}, method='POST'
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def run_remote(args):
+    with urllib.request.urlopen(f'{args.url}/api/pcs') as response:
+        ids = [pc['id'] for pc in json.loads(response.read())]
+    # Pre-encode a pool of batches so the generator isn't the bottleneck
+    bodies = [json.dumps(make_batch(ids, args.batch, args.columnar)).encode() for _ in range(16)]
+    sent = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    def agent():
+        i = 0
+        while time.perf_counter() < deadline:
+            result = post(args.url, bodies[i % len(bodies)])
+            i += 1
+            with lock:
+                sent[0] += result.get('accepted', 0)
+
+    threads = [threading.Thread(target=agent) for _ in range(args.agents)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sent[0], time.perf_counter() - start
+
+
+def run_local(args):
+    import DT
+    DT.initialize_pcs(args.fleet)
+    ids = DT.fleet.ids()
+    payloads = [make_batch(ids, args.batch, args.columnar) for _ in range(16)]
+    client = DT.app.test_client()
+    sent = 0
+    start = time.perf_counter()
+    i = 0
+    while time.perf_counter() - start < args.duration:
+        response = client.post('/api/telemetry', json=payloads[i % len(payloads)])
+        sent += response.get_json()['accepted']
+        i += 1
+    return sent, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--url', help='server to load; omit to ingest in-process through the Flask test client')
+    parser.add_argument('--agents', type=int, default=4, help='concurrent posting agents (remote mode)')
+    parser.add_argument('--fleet', type=int, default=50000, help='fleet size (in-process mode)')
+    parser.add_argument('--batch', type=int, default=1000, help='samples per batch')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds to run')
+    parser.add_argument('--columnar', action='store_true', help='send the ids/cpu/ram/... columnar form')
+    args = parser.parse_args()
+
+    samples, elapsed = run_remote(args) if args.url else run_local(args)
+    print(f'{samples} samples in {elapsed:.2f} s: {samples / elapsed:,.0f} samples/s '
+          f"(batch {args.batch}, {'columnar' if args.columnar else 'samples'} form)")
+
+
+if __name__ == '__main__':
+    main()
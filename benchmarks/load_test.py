@@ -0,0 +1,167 @@
+# Starts serve.py in each installed async mode and reports how many
+# concurrent websocket clients it sustains (all connected and every one
+# receiving a broadcast delta within DELIVERY_TIMEOUT) and the requests/s
+# on /api/pcs and /api/pcs/<pc_id>/action while those clients stay connected.
+#   python benchmarks/load_test.py [pcs] [seconds] [load processes] [mode ...]
+import importlib.util
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import simple_websocket
+
+from cluster_harness import free_port, request, wait_http
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+CLIENT_STEPS = (50, 200, 500, 1000)
+DELIVERY_TIMEOUT = 5.0
+
+
+class SocketClient:
+    # Socket.IO over a bare websocket. A reader thread answers pings and
+    # notes when one of `events` (a delta) for the watched PC arrives.
+    def __init__(self, port, pc_id='PC-01', events=('pcs_delta',)):
+        self.ws = simple_websocket.Client.connect(f'ws://127.0.0.1:{port}/socket.io/?EIO=4&transport=websocket')
+        self.ws.receive(timeout=10)
+        self.ws.send('40')
+        self.ws.receive(timeout=10)
+        self.pc_id = pc_id
+        self.events = events
+        self.received = threading.Event()
+        self.received_at = None
+        self.open = True
+        threading.Thread(target=self.read, daemon=True).start()
+
+    def read(self):
+        try:
+            while True:
+                packet = self.ws.receive()
+                if packet == '2':
+                    self.ws.send('3')
+                elif packet.startswith('42'):
+                    name, data = json.loads(packet[2:])
+                    if name in self.events and self.pc_id in data['changes']:
+                        self.received_at = time.perf_counter()
+                        self.received.set()
+        except simple_websocket.ConnectionClosed:
+            self.open = False
+
+    def emit(self, name, data):
+        self.ws.send('42' + json.dumps([name, data]))
+
+    def close(self):
+        try:
+            self.ws.close()
+        except simple_websocket.ConnectionClosed:
+            pass
+
+
+def connect_clients(port, count, clients):
+    # Grows the pool to count clients, connecting from a few threads at once
+    errors = []
+    lock = threading.Lock()
+
+    def worker(n):
+        for _ in range(n):
+            try:
+                client = SocketClient(port)
+            except Exception as e:
+                errors.append(e)
+                continue
+            with lock:
+                clients.append(client)
+    missing = count - len(clients)
+    threads = [threading.Thread(target=worker, args=(missing // 10 + (i < missing % 10),)) for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(errors)
+
+
+def broadcast_check(port, clients):
+    # Fraction of clients that saw one action's delta, and the time the last one took
+    for client in clients:
+        client.received.clear()
+    start = time.perf_counter()
+    deadline = start + DELIVERY_TIMEOUT
+    request('POST', port, '/api/pcs/PC-01/action', {'action': 'remote'})
+    latencies = []
+    for client in clients:
+        if client.received.wait(max(0.0, deadline - time.perf_counter())):
+            latencies.append(client.received_at - start)
+    return len(latencies) / len(clients), max(latencies, default=0.0)
+
+
+def load(port, pcs, seconds, results):
+    ids = [f'PC-{str(i).zfill(2)}' for i in range(1, pcs + 1)]
+    done = errors = 0
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        if random.random() < 0.5:
+            status = request('GET', port, '/api/pcs?limit=100')
+        else:
+            status = request('POST', port, f'/api/pcs/{random.choice(ids)}/action', {'action': 'remote'})
+        done += 1
+        errors += status >= 500
+    results.put((done, errors))
+
+
+def measure(port, pcs, seconds, processes):
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=load, args=(port, pcs, seconds, results)) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    totals = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    return sum(done for done, _ in totals) / seconds, sum(errors for _, errors in totals)
+
+
+def run_mode(mode, pcs, seconds, processes):
+    port = free_port()
+    env = dict(os.environ, DT_STATE_DIR='', DT_PCS=str(pcs))
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'serve.py'), '--mode', mode, '--host', '127.0.0.1', '--port', str(port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    clients = []
+    try:
+        wait_http(port)
+        rate, errors = measure(port, pcs, seconds, processes)
+        print(f'  {mode}: {rate:.0f} req/s with no websocket clients ({errors} errors)')
+        sustained = 0
+        for step in CLIENT_STEPS:
+            failed = connect_clients(port, step, clients)
+            delivered, slowest = broadcast_check(port, clients) if clients else (0.0, 0.0)
+            rate, errors = measure(port, pcs, seconds, processes)
+            failed += sum(not client.open for client in clients)
+            print(f'  {mode}: {len(clients):5} clients ({failed} failed or dropped), '
+                  f'{delivered:6.1%} got the delta (last after {slowest * 1e3:.0f} ms), '
+                  f'{rate:.0f} req/s ({errors} errors)')
+            if failed or delivered < 1.0:
+                break
+            sustained = len(clients)
+        print(f'  {mode}: sustained {sustained} concurrent websocket clients')
+    finally:
+        for client in clients:
+            client.close()
+        server.terminate()
+        server.wait()
+
+
+def main(pcs='1000', seconds='5', processes='4', *modes):
+    modes = modes or [mode for mode in ('eventlet', 'gevent') if importlib.util.find_spec(mode)] + ['threading']
+    print(f'{pcs} PCs, {processes} load processes, {seconds} s per measurement, modes: {", ".join(modes)}')
+    for mode in modes:
+        run_mode(mode, int(pcs), int(seconds), int(processes))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
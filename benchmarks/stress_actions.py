@@ -0,0 +1,123 @@
+# Fires thousands of PC actions from many threads at once, alongside
+# bulk row actions, refreshes and telemetry, then checks the final state:
+#   - remote toggles on a few hot PCs are never lost (parity of the count)
+#   - the fleet's indexes and stats counters match its records
+#   - replaying the emitted deltas in order over the starting state gives
+#     exactly the final state
+#   python benchmarks/stress_actions.py [threads] [actions per thread]
+import copy
+import random
+import sys
+import threading
+import time
+
+import _common
+
+import DT
+from fleet_store import INDEXED_FIELDS, STAT_KEYS, stat_keys
+
+ACTIONS = ('restart', 'shutdown', 'remote', 'resolve', 'assign', 'release')
+
+
+def run_threads(count, target):
+    errors = []
+    barrier = threading.Barrier(count)
+
+    def run(i):
+        barrier.wait()
+        try:
+            target(i)
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+def toggle_phase(threads, per_thread):
+    # Every thread toggles the same handful of PCs; a lost update flips parity
+    hot = DT.fleet.ids()[:4]
+    before = {pc_id: DT.fleet.field(pc_id, 'remote_active') for pc_id in hot}
+    counts = {pc_id: 0 for pc_id in hot}
+    lock = threading.Lock()
+    client = DT.app.test_client
+
+    def work(i):
+        http = client()
+        for n in range(per_thread):
+            pc_id = hot[(i + n) % len(hot)]
+            response = http.post(f'/api/pcs/{pc_id}/action', json={'action': 'remote'})
+            assert response.status_code == 200, response.json
+            with lock:
+                counts[pc_id] += 1
+    run_threads(threads, work)
+    lost = [pc_id for pc_id in hot if DT.fleet.field(pc_id, 'remote_active') != (before[pc_id] ^ (counts[pc_id] % 2 == 1))]
+    print(f'  toggles: {sum(counts.values())} on {len(hot)} PCs, lost updates on {len(lost)} PCs')
+    assert not lost
+
+
+def mixed_phase(threads, per_thread):
+    ids = DT.fleet.ids()
+    statuses = {}
+
+    def work(i):
+        http = DT.app.test_client()
+        for n in range(per_thread):
+            if i == 0 and n % 20 == 0:
+                response = http.post('/api/pcs/refresh')
+            elif i == 1 and n % 5 == 0:
+                samples = [{'id': random.choice(ids), 'cpu': random.randint(0, 100)} for _ in range(100)]
+                response = http.post('/api/telemetry', json={'samples': samples})
+            elif i == 2 and n % 10 == 0:
+                selector = {'row': random.randint(1, len(ids) // 5)}
+                response = http.post('/api/pcs/actions', json={'action': random.choice(ACTIONS), 'selector': selector})
+            else:
+                response = http.post(f'/api/pcs/{random.choice(ids)}/action', json={'action': random.choice(ACTIONS)})
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    run_threads(threads, work)
+    print(f'  mixed: responses {dict(sorted(statuses.items()))}')
+    assert set(statuses) <= {200, 400}
+
+
+def check_store(fleet):
+    for name in INDEXED_FIELDS:
+        expected = {}
+        for record in fleet.records:
+            expected.setdefault(getattr(record, name), set()).add(record.row)
+        actual = {value: set(rows.tolist()) for value, rows in fleet.indexes[name].groups(len(fleet)).items()}
+        assert actual == expected, f'{name} index out of sync'
+    counters = dict.fromkeys(STAT_KEYS, 0)
+    for record in fleet.records:
+        for key in stat_keys(record):
+            counters[key] += 1
+    assert fleet.counters == counters, 'stats counters out of sync'
+
+
+def main(threads=32, per_thread=200):
+    DT.initialize_pcs(200)
+    start = {pc['id']: pc for pc in DT.fleet.all()}
+    deltas = []
+    DT.delta_listeners.append(lambda seq, changes: deltas.append((seq, copy.deepcopy(changes))))
+    began = time.perf_counter()
+    toggle_phase(threads, per_thread)
+    mixed_phase(threads, per_thread)
+    elapsed = time.perf_counter() - began
+    print(f'  {DT.commands.stats()["processed"]} commands in {elapsed:.1f} s')
+
+    check_store(DT.fleet)
+    seqs = [seq for seq, _ in deltas]
+    assert seqs == list(range(seqs[0], seqs[0] + len(seqs))), 'delta sequence has gaps'
+    replayed = start
+    for _, changes in deltas:
+        for pc_id, fields in changes.items():
+            replayed[pc_id].update(fields)
+    assert replayed == {pc['id']: pc for pc in DT.fleet.all()}, 'deltas do not replay to the final state'
+    print(f'  invariants hold; {len(deltas)} deltas replay to the final state')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
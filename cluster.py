@@ -0,0 +1,266 @@
+import itertools
+import os
+import pickle
+import queue
+import socket
+import sys
+import threading
+from multiprocessing.connection import Client, Listener
+
+from persistence import capture
+
+DEFAULT_ADDRESS = '127.0.0.1:6000'
+
+REPLY_TIMEOUT = 10
+# Messages a peer may leave unsent before it is disconnected as too slow
+MAX_PENDING = 1000
+
+
+def parse_address(address):
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def authkey():
+    # Authenticated peers can send pickles, so there is no built-in default;
+    # serve.py --workers generates one and hands it to its processes
+    key = os.environ.get('DT_BROKER_KEY')
+    if not key:
+        raise RuntimeError('Set DT_BROKER_KEY to a shared secret for the broker and its workers')
+    return key.encode('utf-8')
+
+
+def dumps(message):
+    return pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def shutdown(conn):
+    # Wakes any thread blocked sending to or receiving from conn
+    try:
+        with socket.socket(fileno=os.dup(conn.fileno())) as sock:
+            sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+class Outbox:
+    # Pickled messages for one connection, written by their own sender
+    # thread so nothing blocks on a slow peer while holding the fleet lock.
+    # A peer that lets more than `limit` messages pile up is disconnected,
+    # which ends its receive loop as well.
+    def __init__(self, conn, limit=MAX_PENDING):
+        self.conn = conn
+        self.limit = limit
+        self.queue = queue.Queue()
+        self.closed = False
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def put(self, data):
+        if self.closed:
+            return False
+        if self.queue.qsize() >= self.limit:
+            self.close()
+            return False
+        self.queue.put(data)
+        return True
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.queue.put(None)
+            shutdown(self.conn)
+
+    def _run(self):
+        while True:
+            data = self.queue.get()
+            if data is None:
+                return
+            try:
+                self.conn.send_bytes(data)
+            except OSError:
+                self.close()
+                return
+
+
+class Broker:
+    # The shared store for a set of worker processes. It runs the app in the
+    # usual single-process role (fleet, journal, history, simulation) and
+    # serializes every change batch the workers publish: each one is applied
+    # here first, journaled, and the resulting delta sent to all workers in
+    # sequence order, so their replicas and delta logs stay identical. PC
+    # actions are run here too, through the broker's own command queue, so
+    # their guards see the one authoritative fleet.
+    def __init__(self, app, address):
+        self.app = app
+        self.listener = Listener(parse_address(address), authkey=authkey())
+        self.workers = []
+        app.delta_listeners.append(self.broadcast)
+
+    def serve(self):
+        while True:
+            conn = self.listener.accept()
+            threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+
+    def handle(self, conn):
+        app = self.app
+        outbox = Outbox(conn)
+        # State and registration under one lock hold, so no delta falls between
+        with app.fleet.lock:
+            outbox.put(dumps(('state', app.deltas.epoch, app.deltas.seq, capture(app.fleet))))
+            self.workers.append(outbox)
+        try:
+            while True:
+                message = conn.recv()
+                if message[0] == 'changes':
+                    self.apply(message[1])
+                elif message[0] == 'call':
+                    # Own thread, so a command waiting on a PC lock doesn't hold up this worker's other messages
+                    threading.Thread(target=self.reply, args=(outbox,) + message[1:], daemon=True).start()
+        except (EOFError, OSError):
+            pass
+        finally:
+            with app.fleet.lock:
+                if outbox in self.workers:
+                    self.workers.remove(outbox)
+            outbox.close()
+            conn.close()
+
+    def apply(self, changes):
+        fleet = self.app.fleet
+        with fleet.lock:
+            applied = {}
+            for pc_id, fields in changes.items():
+                if pc_id in fleet:
+                    try:
+                        applied[pc_id] = fleet.update(pc_id, fields)
+                    except KeyError:
+                        continue
+            self.app.emit_pc_update(applied)
+
+    def reply(self, outbox, token, name, args):
+        # The action's delta is queued before its reply, so the worker has applied it when the reply arrives
+        outbox.put(dumps(('reply', token) + self.call(name, args)))
+
+    def call(self, name, args):
+        # PC actions and simulation controls; the broker runs the only
+        # command queue and simulation loop
+        app = self.app
+        try:
+            if name == 'action':
+                return True, app.commands.execute(*args)
+            if name == 'bulk_action':
+                pc_ids, action = args
+                return True, app.commands.execute_many(pc_ids, app.perform_bulk_action, action)
+            return True, getattr(app.simulation, name)(*args)
+        except Exception as e:
+            return False, e
+
+    def broadcast(self, seq, changes):
+        # Called under the fleet lock from emit_pc_update; pickled once for
+        # all workers and only queued here, the outboxes do the sending
+        data = dumps(('delta', seq, changes))
+        for outbox in list(self.workers):
+            if not outbox.put(data):
+                self.workers.remove(outbox)
+
+
+class ClusterClient:
+    # A worker's link to the broker: loads the broker's state on join,
+    # publishes locally applied changes, forwards PC actions, and feeds the
+    # broker's sequenced deltas back through on_delta (including this
+    # worker's own)
+    def __init__(self, address):
+        self.conn = Client(parse_address(address), authkey=authkey())
+        self.outbox = Outbox(self.conn)
+        self.tokens = itertools.count()
+        self.waiting = {}
+        self.replies = {}
+        self.connected = True
+
+    def join(self, fleet, deltas):
+        _, epoch, seq, columns = self.conn.recv()
+        fleet.load_columns(columns)
+        deltas.restart(epoch, seq)
+
+    def listen(self, on_delta):
+        try:
+            while True:
+                message = self.conn.recv()
+                if message[0] == 'delta':
+                    on_delta(message[1], message[2])
+                elif message[0] == 'reply':
+                    _, token, ok, value = message
+                    self.replies[token] = (ok, value)
+                    event = self.waiting.pop(token, None)
+                    if event is not None:
+                        event.set()
+        except (EOFError, OSError):
+            self.connected = False
+            self.outbox.close()
+            for event in list(self.waiting.values()):
+                event.set()
+
+    def send(self, message):
+        # Queued, so publishing from under the fleet lock never waits on the broker
+        if not self.connected or not self.outbox.put(dumps(message)):
+            raise ConnectionError('Lost connection to the cluster broker')
+
+    def publish(self, changes):
+        self.send(('changes', changes))
+
+    def call(self, name, *args):
+        token = next(self.tokens)
+        event = threading.Event()
+        self.waiting[token] = event
+        self.send(('call', token, name, args))
+        if not event.wait(REPLY_TIMEOUT) or token not in self.replies:
+            self.waiting.pop(token, None)
+            raise ConnectionError('No reply from the cluster broker')
+        ok, value = self.replies.pop(token)
+        if not ok:
+            raise value
+        return value
+
+
+class RemoteSimulation:
+    # Same interface as Simulation, forwarded to the broker's instance
+    def __init__(self, client):
+        self.client = client
+
+    def configure(self, rate=None, pcs_per_tick=None, events_per_tick=None):
+        return self.client.call('configure', rate, pcs_per_tick, events_per_tick)
+
+    def start(self):
+        return self.client.call('start')
+
+    def stop(self):
+        return self.client.call('stop')
+
+    def stats(self):
+        return self.client.call('stats')
+
+    @property
+    def running(self):
+        try:
+            return self.stats()['running']
+        except ConnectionError:
+            return False
+
+
+def main(address=None):
+    # python cluster.py [host:port] -- then start workers with DT_BROKER set
+    address = address or os.environ.get('DT_BROKER') or DEFAULT_ADDRESS
+    os.environ.pop('DT_BROKER', None)
+    try:
+        authkey()
+    except RuntimeError as e:
+        sys.exit(str(e))
+    import DT
+    broker = Broker(DT, address)
+    DT.start_background_tasks()
+    print(f'Broker for {len(DT.fleet)} PCs listening on {address}', flush=True)
+    broker.serve()
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
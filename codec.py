@@ -0,0 +1,111 @@
+import json
+
+import numpy as np
+
+from fleet_store import COLUMN_FIELDS, FIELDS, ColumnDelta
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MIMETYPE = 'application/msgpack'
+FORMATS = ('json', 'msgpack')
+
+# Numeric fields that the columnar layout ships as little-endian typed
+# arrays (raw bytes in MessagePack), so clients can wrap them in a
+# Uint8Array/Uint32Array without parsing
+TYPED_FIELDS = {
+    name: np.dtype(dtype).newbyteorder('<').str
+    for name, dtype in COLUMN_FIELDS.items() if dtype is not object
+}
+
+
+def available_formats():
+    return FORMATS if msgpack is not None else ('json',)
+
+
+def negotiate(request):
+    # ?format= wins over the Accept header; JSON unless MessagePack is both
+    # asked for and installed
+    requested = request.args.get('format')
+    if requested is None:
+        best = request.accept_mimetypes.best_match(['application/json', MSGPACK_MIMETYPE])
+        requested = 'msgpack' if best == MSGPACK_MIMETYPE else 'json'
+    fmt = requested if requested in available_formats() else 'json'
+    shape = 'columnar' if request.args.get('layout') == 'columnar' else 'rows'
+    return fmt, shape
+
+
+def pack_column(name, values, binary):
+    if name in TYPED_FIELDS:
+        array = np.asarray(values, dtype=TYPED_FIELDS[name])
+        return array.tobytes() if binary else array.tolist()
+    return values.tolist() if isinstance(values, np.ndarray) else list(values)
+
+
+def pcs_columns(pcs, binary, fields=None):
+    # [{'id': ..., 'cpu': ...}, ...] -> {'count', 'columns': {field: values}, 'dtypes'}
+    if fields is None:
+        fields = list(pcs[0]) if pcs else []
+    columns = {name: pack_column(name, [pc[name] for pc in pcs], binary) for name in fields}
+    return {
+        'count': len(pcs),
+        'columns': columns,
+        'dtypes': {name: TYPED_FIELDS[name] for name in columns if name in TYPED_FIELDS}
+    }
+
+
+def fleet_columns(fleet, binary, rows=None, fields=None):
+    # pcs_columns straight from the store's columns, skipping per-PC dicts
+    rows = np.arange(len(fleet)) if rows is None else np.asarray(rows, dtype=np.intp)
+    columns = {}
+    for name in fields or FIELDS:
+        values = fleet.column_values(name, rows)
+        if name in TYPED_FIELDS:
+            values = values.astype(TYPED_FIELDS[name])
+            columns[name] = values.tobytes() if binary else values.tolist()
+        else:
+            columns[name] = values.tolist() if isinstance(values, np.ndarray) else values
+    return {
+        'count': len(rows),
+        'columns': columns,
+        'dtypes': {name: TYPED_FIELDS[name] for name in columns if name in TYPED_FIELDS}
+    }
+
+
+def delta_columns(changes, binary):
+    # {pc_id: {field: value}} -> PCs grouped by the set of fields that changed,
+    # each group laid out column-wise; a ColumnDelta already is
+    if isinstance(changes, ColumnDelta):
+        return {
+            'groups': [
+                {'ids': ids, 'columns': {name: pack_column(name, values, binary) for name, values in columns.items()}}
+                for ids, columns in changes.groups
+            ],
+            'dtypes': {
+                name: TYPED_FIELDS[name] for _, columns in changes.groups for name in columns if name in TYPED_FIELDS
+            }
+        }
+    groups = {}
+    for pc_id, fields in changes.items():
+        groups.setdefault(tuple(fields), []).append((pc_id, fields))
+    packed = []
+    dtypes = {}
+    for names, members in groups.items():
+        packed.append({
+            'ids': [pc_id for pc_id, _ in members],
+            'columns': {name: pack_column(name, [fields[name] for _, fields in members], binary) for name in names}
+        })
+        dtypes.update({name: TYPED_FIELDS[name] for name in names if name in TYPED_FIELDS})
+    return {'groups': packed, 'dtypes': dtypes}
+
+
+def encode(payload, fmt):
+    if fmt == 'msgpack':
+        return msgpack.packb(payload, use_bin_type=True)
+    return json.dumps(payload, separators=(',', ':'))
+
+
+def mimetype(fmt):
+    return MSGPACK_MIMETYPE if fmt == 'msgpack' else 'application/json'
@@ -0,0 +1,69 @@
+import threading
+import zlib
+
+SHARDS = 64
+
+
+class CommandQueue:
+    # Serializes commands per PC. Each PC id maps to one of `shards` locks,
+    # so commands for the same PC run one after another (the guard check
+    # and the write can't interleave with another command), while commands
+    # for PCs in other shards run concurrently. handler(pc_id, *args) does
+    # the work and only needs the fleet lock for the write itself.
+    def __init__(self, handler, shards=SHARDS):
+        self.handler = handler
+        self.locks = [threading.Lock() for _ in range(shards)]
+        self.depth = [0] * shards
+        self.counter_lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+
+    def shard(self, pc_id):
+        return zlib.crc32(pc_id.encode('utf-8')) % len(self.locks)
+
+    def execute(self, pc_id, *args):
+        shard = self.shard(pc_id)
+        with self.counter_lock:
+            self.depth[shard] += 1
+        try:
+            with self.locks[shard]:
+                return self.handler(pc_id, *args)
+        except Exception:
+            with self.counter_lock:
+                self.failed += 1
+            raise
+        finally:
+            with self.counter_lock:
+                self.depth[shard] -= 1
+                self.processed += 1
+
+    def execute_many(self, pc_ids, handler, *args):
+        # handler(pc_ids, *args) with the locks of every shard involved held;
+        # taken in index order so concurrent batches can't deadlock
+        shards = sorted({self.shard(pc_id) for pc_id in pc_ids})
+        with self.counter_lock:
+            for shard in shards:
+                self.depth[shard] += 1
+        try:
+            for shard in shards:
+                self.locks[shard].acquire()
+            try:
+                return handler(pc_ids, *args)
+            finally:
+                for shard in shards:
+                    self.locks[shard].release()
+        finally:
+            with self.counter_lock:
+                for shard in shards:
+                    self.depth[shard] -= 1
+                self.processed += len(pc_ids)
+
+    def stats(self):
+        with self.counter_lock:
+            return {
+                'shards': len(self.locks),
+                'queued': sum(self.depth),
+                'max_shard_depth': max(self.depth),
+                'processed': self.processed,
+                'failed': self.failed
+            }
@@ -0,0 +1,53 @@
+import secrets
+from collections import deque
+
+
+class DeltaLog:
+    # Sequenced history of per-PC field changes, bounded by the total number
+    # of PC entries kept so a full-fleet refresh can't grow it without limit
+    def __init__(self, max_changes=100000):
+        self.epoch = secrets.token_hex(4)
+        self.seq = 0
+        self.max_changes = max_changes
+        self.entries = deque()
+        self.size = 0
+
+    def restart(self, epoch, seq):
+        # Continue someone else's sequence, e.g. a cluster broker's
+        self.epoch = epoch
+        self.seq = seq
+        self.entries.clear()
+        self.size = 0
+
+    def append(self, changes):
+        if not changes:
+            return self.seq
+        self.seq += 1
+        self.entries.append((self.seq, changes))
+        self.size += len(changes)
+        while self.size > self.max_changes and len(self.entries) > 1:
+            _, dropped = self.entries.popleft()
+            self.size -= len(dropped)
+        return self.seq
+
+    def oldest(self):
+        # Lowest seq a client can be at and still catch up from the log
+        if not self.entries:
+            return self.seq
+        return self.entries[0][0] - 1
+
+    def since(self, seq):
+        # Merged changes after seq, or None when the log no longer covers it
+        # or seq isn't one (clients send it, so anything can arrive)
+        if type(seq) is not int or seq > self.seq or seq < self.oldest():
+            return None
+        newer = []
+        for entry_seq, changes in reversed(self.entries):
+            if entry_seq <= seq:
+                break
+            newer.append(changes)
+        merged = {}
+        for changes in reversed(newer):
+            for pc_id, fields in changes.items():
+                merged.setdefault(pc_id, {}).update(fields)
+        return merged
@@ -0,0 +1,418 @@
+import threading
+import re
+from sys import intern
+
+import numpy as np
+
+from spatial import SpatialGrid
+
+# Public field order of a PC, matching the dicts the API has always returned
+FIELDS = (
+    'id', 'status', 'cpu', 'ram', 'disk', 'last_updated', 'position', 'location',
+    'x', 'y', 'z', 'size_variation', 'rotation_y', 'conflict_type', 'remote_active',
+    'os_version', 'uptime', 'floor', 'room'
+)
+
+# Hot telemetry lives in NumPy columns, one slot per PC row, so whole-fleet
+# updates are single vectorized writes. last_updated is an object column so
+# one batch timestamp string can be broadcast into it.
+COLUMN_FIELDS = {'cpu': np.uint8, 'ram': np.uint8, 'disk': np.uint8, 'uptime': np.uint32, 'last_updated': object}
+METRIC_FIELDS = ('cpu', 'ram', 'disk', 'uptime')
+
+# Fields with a secondary index: a code per row for the field's value, so
+# matching rows are a vectorized compare instead of a set of rows per value
+INDEXED_FIELDS = ('status', 'conflict_type', 'remote_active', 'lab_row', 'floor', 'room')
+
+# Rows compared per step when a page only needs the first few matches
+SCAN_WINDOW = 65536
+
+# Low-cardinality strings shared across the fleet instead of copied per PC
+INTERNED_FIELDS = ('status', 'last_updated', 'conflict_type', 'os_version', 'room')
+
+# Fields that place a PC in the spatial grid
+POSITION_FIELDS = ('floor', 'x', 'z')
+
+# Summary counters shown in the stats bar
+STAT_KEYS = ('active', 'user', 'hardware_conflict', 'software_conflict', 'remote')
+
+MIN_CAPACITY = 64
+
+ROW_PATTERN = re.compile(r'Row-(\d+)')
+
+
+def stat_keys(record):
+    keys = []
+    if record.status in ('active', 'user'):
+        keys.append(record.status)
+    elif record.status == 'conflict' and record.conflict_type in ('hardware_conflict', 'software_conflict'):
+        keys.append(record.conflict_type)
+    if record.remote_active:
+        keys.append('remote')
+    return keys
+
+
+class PCRecord:
+    __slots__ = (
+        'row', 'id', 'status', 'position', 'location', 'x', 'y', 'z',
+        'size_variation', 'rotation_y', 'conflict_type', 'remote_active', 'os_version',
+        'floor', 'room', 'lab_row'
+    )
+
+    def __init__(self, row, pc):
+        self.row = row
+        for name in self.__slots__[1:]:
+            value = pc.get(name)
+            if name in INTERNED_FIELDS and value is not None:
+                value = intern(value)
+            setattr(self, name, value)
+        if self.lab_row is None:
+            self.lab_row = lab_row_of(self.location)
+
+
+def lab_row_of(location):
+    # 'Row-3, Seat-2' -> 3
+    match = ROW_PATTERN.match(location or '')
+    return int(match.group(1)) if match else None
+
+
+# Record fields that may change after a PC is added
+RECORD_FIELDS = frozenset(PCRecord.__slots__) - {'row', 'id'}
+
+
+class ColumnDelta:
+    # A change batch kept as column slices: groups of (pc ids, {field:
+    # values}), each PC in at most one group. Encoders ship it column-wise
+    # without building per-PC dicts; items() still yields the usual
+    # (pc_id, fields) pairs for everything that works PC by PC.
+    def __init__(self, groups):
+        self.groups = [(ids, columns) for ids, columns in groups if len(ids)]
+
+    def __len__(self):
+        return sum(len(ids) for ids, _ in self.groups)
+
+    def items(self):
+        for ids, columns in self.groups:
+            names = tuple(columns)
+            for pc_id, *values in zip(ids, *(columns[name].tolist() for name in names)):
+                yield pc_id, dict(zip(names, values))
+
+
+class Index:
+    # Value -> code for one field, the code of every row, and how many rows
+    # hold each code. Codes of values no row holds any more are kept for reuse.
+    def __init__(self):
+        self.lookup = {}
+        self.values = []
+        self.counts = []
+        self.codes = np.zeros(MIN_CAPACITY, np.int32)
+
+    def reserve(self, capacity):
+        if capacity > len(self.codes):
+            self.codes = np.concatenate([self.codes, np.zeros(capacity - len(self.codes), np.int32)])
+
+    def code(self, value):
+        return self.lookup.get(value)
+
+    def add(self, value, row):
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.values)
+            self.values.append(value)
+            self.counts.append(0)
+        self.codes[row] = code
+        self.counts[code] += 1
+
+    def move(self, old, value, row):
+        self.counts[self.lookup[old]] -= 1
+        self.add(value, row)
+
+    def count(self, value):
+        code = self.lookup.get(value)
+        return 0 if code is None else self.counts[code]
+
+    def rows(self, value, size):
+        code = self.lookup.get(value)
+        if code is None:
+            return np.array([], np.intp)
+        return np.flatnonzero(self.codes[:size] == code)
+
+    def groups(self, size):
+        # {value: array of rows} for every value some row holds
+        return {
+            value: self.rows(value, size)
+            for value, count in zip(self.values, self.counts) if count
+        }
+
+
+class FleetStore:
+    def __init__(self):
+        # Held by writers that must apply a batch atomically
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        self.records = []
+        self.id_list = []
+        self.rows = {}
+        self.size = 0
+        self.columns = {name: np.zeros(MIN_CAPACITY, dtype) for name, dtype in COLUMN_FIELDS.items()}
+        self.indexes = {name: Index() for name in INDEXED_FIELDS}
+        self.counters = dict.fromkeys(STAT_KEYS, 0)
+        self.grid = SpatialGrid()
+        self.room_bounds = None
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, pc_id):
+        return pc_id in self.rows
+
+    def ids(self):
+        return list(self.id_list)
+
+    def column(self, name):
+        # Writable view of the live rows of a column
+        return self.columns[name][:self.size]
+
+    def _reserve(self, capacity):
+        current = len(self.columns['cpu'])
+        if capacity <= current:
+            return
+        capacity = max(capacity, current * 2)
+        for name, column in self.columns.items():
+            grown = np.zeros(capacity, column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.columns[name] = grown
+        for index in self.indexes.values():
+            index.reserve(capacity)
+        self.grid.reserve(capacity)
+
+    def load(self, pcs):
+        self.clear()
+        pcs = list(pcs)
+        self._reserve(len(pcs))
+        for pc in pcs:
+            self.add(pc)
+
+    def load_columns(self, columns):
+        # Bulk load from {field: values} (e.g. a snapshot); the column fields
+        # are copied in one vectorized write instead of per PC
+        self.clear()
+        count = len(columns['id'])
+        self._reserve(count)
+        names = [name for name in PCRecord.__slots__[1:] if name in columns]
+        for row, values in enumerate(zip(*(columns[name] for name in names))):
+            record = PCRecord(row, dict(zip(names, values)))
+            self.records.append(record)
+            self.id_list.append(record.id)
+            self.rows[record.id] = row
+        if len(self.rows) != count:
+            raise ValueError('Duplicate PC ids in columns')
+        self.size = count
+        for name, column in self.columns.items():
+            values = columns[name]
+            if name in INTERNED_FIELDS:
+                values = [intern(value) if value is not None else None for value in values]
+            column[:count] = values
+        for record in self.records:
+            for name in INDEXED_FIELDS:
+                self.indexes[name].add(getattr(record, name), record.row)
+            for key in stat_keys(record):
+                self.counters[key] += 1
+            self.grid.insert(record.row, record.floor, record.x, record.z)
+
+    def add(self, pc):
+        if pc['id'] in self.rows:
+            raise ValueError(f"Duplicate PC id {pc['id']}")
+        row = self.size
+        self._reserve(row + 1)
+        record = PCRecord(row, pc)
+        self.records.append(record)
+        self.id_list.append(record.id)
+        self.rows[record.id] = row
+        self.size += 1
+        for name, column in self.columns.items():
+            value = pc.get(name)
+            if name in INTERNED_FIELDS and value is not None:
+                value = intern(value)
+            column[row] = value if value is not None or column.dtype == object else 0
+        for name in INDEXED_FIELDS:
+            self.indexes[name].add(getattr(record, name), row)
+        for key in stat_keys(record):
+            self.counters[key] += 1
+        self.grid.insert(row, record.floor, record.x, record.z)
+        self.room_bounds = None
+        return row
+
+    def get(self, pc_id):
+        row = self.rows.get(pc_id)
+        if row is None:
+            return None
+        return self.to_dict(row)
+
+    def field(self, pc_id, name):
+        row = self.rows[pc_id]
+        if name in self.columns:
+            return self.columns[name].item(row)
+        return getattr(self.records[row], name)
+
+    def to_dict(self, row):
+        record = self.records[row]
+        columns = self.columns
+        return {
+            name: columns[name].item(row) if name in columns else getattr(record, name)
+            for name in FIELDS
+        }
+
+    def all(self):
+        return self.rows_to_dicts(range(self.size))
+
+    def rows_to_dicts(self, rows):
+        # Column-at-a-time conversion; much cheaper than to_dict per row at fleet scale
+        rows = np.asarray(rows, dtype=np.intp)
+        values = {name: column[rows].tolist() for name, column in self.columns.items()}
+        records = self.records
+        pcs = []
+        for i, row in enumerate(rows.tolist()):
+            record = records[row]
+            pcs.append({
+                name: values[name][i] if name in values else getattr(record, name)
+                for name in FIELDS
+            })
+        return pcs
+
+    def column_values(self, name, rows):
+        # One field for the given rows: a NumPy array for column fields, a list otherwise
+        if name in self.columns:
+            return self.columns[name][rows]
+        records = self.records
+        return [getattr(records[row], name) for row in rows.tolist()]
+
+    def row_ids(self, rows):
+        if np.array_equal(rows, np.arange(len(rows))):
+            return self.id_list[:len(rows)]
+        ids = self.id_list
+        return [ids[row] for row in rows.tolist()]
+
+    def column_delta(self, groups):
+        # ColumnDelta for [(rows, fields)], copied straight from the columns
+        built = []
+        for rows, fields in groups:
+            rows = np.asarray(rows, dtype=np.intp)
+            built.append((self.row_ids(rows), {name: self.columns[name][rows] for name in fields}))
+        return ColumnDelta(built)
+
+    def update(self, pc_id, changes):
+        # Returns only the fields whose value actually changed
+        row = self.rows[pc_id]
+        record = self.records[row]
+        for name in changes:
+            if name not in self.columns and name not in RECORD_FIELDS:
+                raise KeyError(f'Unknown PC field {name}')
+        changed = {}
+        old_keys = stat_keys(record)
+        for name, value in changes.items():
+            if name in INTERNED_FIELDS and value is not None:
+                value = intern(value)
+            if name in self.columns:
+                column = self.columns[name]
+                if column[row] != value:
+                    column[row] = value
+                    changed[name] = value
+            else:
+                old = getattr(record, name)
+                if old != value:
+                    setattr(record, name, value)
+                    if name in self.indexes:
+                        self.indexes[name].move(old, value, row)
+                    changed[name] = value
+        if any(name in self.indexes for name in changed):
+            for key in old_keys:
+                self.counters[key] -= 1
+            for key in stat_keys(record):
+                self.counters[key] += 1
+        if any(name in changed for name in POSITION_FIELDS + ('room',)):
+            self.grid.move(row, record.floor, record.x, record.z)
+            self.room_bounds = None
+        return changed
+
+    def find_rows(self, after=-1, limit=None, **criteria):
+        # Matching rows in fleet order, starting after the given row. Index
+        # codes are compared a window at a time, so a page stops scanning
+        # once it has its rows; a region narrows the candidates first.
+        region = criteria.pop('region', None)
+        start = max(after + 1, 0)
+        if not criteria and region is None:
+            stop = self.size if limit is None else min(self.size, start + limit)
+            return list(range(start, stop))
+        tests = []
+        for name, value in criteria.items():
+            if name not in self.indexes:
+                raise KeyError(f'{name} is not an indexed field')
+            code = self.indexes[name].code(value)
+            if code is None:
+                return []
+            tests.append((self.indexes[name].codes, code))
+        if region is not None:
+            rows = self.grid.query(*region, floor=criteria.get('floor'))
+            rows = rows[rows >= start]
+            for codes, code in tests:
+                rows = rows[codes[rows] == code]
+            return rows[:limit].tolist()
+        found = []
+        window = self.size if limit is None else max(limit * 4, SCAN_WINDOW)
+        while start < self.size and (limit is None or len(found) < limit):
+            stop = min(self.size, start + window)
+            (codes, code), *others = tests
+            mask = codes[start:stop] == code
+            for codes, code in others:
+                mask &= codes[start:stop] == code
+            found.extend((np.flatnonzero(mask) + start).tolist())
+            start = stop
+        return found[:limit]
+
+    def find(self, **criteria):
+        return self.rows_to_dicts(self.find_rows(**criteria))
+
+    def count(self, **criteria):
+        if len(criteria) == 1 and 'region' not in criteria:
+            (name, value), = criteria.items()
+            return self.indexes[name].count(value)
+        return len(self.find_rows(**criteria))
+
+    def stats(self):
+        return {'total': self.size, **self.counters}
+
+    def rooms(self):
+        # [{'floor', 'room', 'count', 'x0', 'z0', 'x1', 'z1'}] over seat
+        # positions, recomputed only after the layout changes
+        if self.room_bounds is None:
+            bounds = {}
+            for record in self.records:
+                if record.x is None or record.z is None:
+                    continue
+                key = (record.floor, record.room)
+                box = bounds.get(key)
+                if box is None:
+                    bounds[key] = [1, record.x, record.z, record.x, record.z]
+                else:
+                    box[0] += 1
+                    box[1] = min(box[1], record.x)
+                    box[2] = min(box[2], record.z)
+                    box[3] = max(box[3], record.x)
+                    box[4] = max(box[4], record.z)
+            self.room_bounds = [
+                {'floor': floor, 'room': room, 'count': count, 'x0': x0, 'z0': z0, 'x1': x1, 'z1': z1}
+                for (floor, room), (count, x0, z0, x1, z1) in bounds.items()
+            ]
+        return self.room_bounds
+
+    def mask(self, exclude=None):
+        # Boolean row mask of the fleet, minus rows matching any exclude criterion
+        mask = np.ones(self.size, bool)
+        for name, values in (exclude or {}).items():
+            index = self.indexes[name]
+            codes = [code for code in map(index.code, values) if code is not None]
+            if codes:
+                mask &= ~np.isin(index.codes[:self.size], codes)
+        return mask
@@ -0,0 +1,298 @@
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+from pc_query import QueryError
+
+HISTORY_FIELDS = ('cpu', 'ram', 'disk')
+
+# Raw samples: the whole fleet every SAMPLE_INTERVAL seconds, RING_SIZE deep (an hour)
+SAMPLE_INTERVAL = 5
+RING_SIZE = 720
+
+# On-disk rollups: bucket length, segment file length and how long segments are kept
+RESOLUTIONS = {'1m': 60, '1h': 3600}
+SEGMENT_SPAN = {'1m': 86400, '1h': 30 * 86400}
+RETENTION = {'1m': 7 * 86400, '1h': 365 * 86400}
+
+# Upper bound on points per response, and the number aimed for when no step is given
+MAX_POINTS = 5000
+DEFAULT_POINTS = 500
+
+
+def bucket_dtype(count):
+    # One fixed-size record per bucket; averages are stored as hundredths
+    shape = (count, len(HISTORY_FIELDS))
+    return np.dtype([('t', '<i8'), ('min', 'u1', shape), ('max', 'u1', shape), ('avg', '<u2', shape)])
+
+
+def parse_range(args, now):
+    # from/to are Unix seconds; the default window is the last hour
+    try:
+        stop = float(args.get('to', now))
+        start = float(args.get('from', stop - 3600))
+        step = float(args['step']) if 'step' in args else None
+    except ValueError:
+        raise QueryError('from, to and step must be numbers')
+    if not all(map(math.isfinite, (start, stop, step if step is not None else 0.0))):
+        raise QueryError('from, to and step must be finite')
+    if start >= stop:
+        raise QueryError('from must be before to')
+    if step is None:
+        step = max((stop - start) / DEFAULT_POINTS, SAMPLE_INTERVAL)
+    if step <= 0:
+        raise QueryError('step must be positive')
+    if (stop - start) / step > MAX_POINTS:
+        raise QueryError(f'More than {MAX_POINTS} points requested; use a larger step')
+    return start, stop, step
+
+
+def downsample(t, mins, maxs, avgs, step):
+    # Merge consecutive points into step-aligned buckets
+    keys = (t // step) * step
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(t) else np.array([], np.intp)
+    if not len(starts):
+        return t, mins, maxs, avgs
+    counts = np.diff(np.r_[starts, len(t)])[:, None]
+    return (
+        keys[starts],
+        np.minimum.reduceat(mins, starts),
+        np.maximum.reduceat(maxs, starts),
+        np.add.reduceat(avgs, starts) / counts
+    )
+
+
+class Accumulator:
+    # Running min/max/sum of the fleet's samples for the current bucket
+    def __init__(self, seconds, shape):
+        self.seconds = seconds
+        self.shape = shape
+        self.bucket = None
+        self.reset()
+
+    def reset(self):
+        self.min = np.full(self.shape, 255, np.uint8)
+        self.max = np.zeros(self.shape, np.uint8)
+        self.sum = np.zeros(self.shape, np.uint32)
+        self.count = 0
+
+    def add(self, now, values):
+        # Returns the previous bucket once a sample lands in a new one
+        bucket = int(now // self.seconds) * self.seconds
+        closed = None
+        if bucket != self.bucket and self.count:
+            closed = self.close()
+        self.bucket = bucket
+        np.minimum(self.min, values, out=self.min)
+        np.maximum(self.max, values, out=self.max)
+        self.sum += values
+        self.count += 1
+        return closed
+
+    def close(self):
+        avg = np.rint(self.sum * 100.0 / self.count).astype(np.uint16)
+        closed = (self.bucket, self.min, self.max, avg)
+        self.reset()
+        return closed
+
+
+class RollupSeries:
+    # One resolution on disk. Records are appended to segment files named by
+    # their first bucket, next to a JSON list of the PC ids (record rows) the
+    # segment was written for; reads memory-map the segments.
+    def __init__(self, directory, name):
+        self.directory = os.path.join(directory, name)
+        self.name = name
+        self.file = None
+        self.ids = None
+        self.start = None
+        self.indexes = {}
+        os.makedirs(self.directory, exist_ok=True)
+
+    def segments(self):
+        names = [name[:-4] for name in os.listdir(self.directory) if name.endswith('.bin')]
+        return sorted(names, key=lambda name: int(name.split('-')[0]))
+
+    def append(self, ids, bucket, mins, maxs, avgs):
+        if self.file is None or ids is not self.ids or bucket >= self.start + SEGMENT_SPAN[self.name]:
+            self.open(ids, bucket)
+        record = np.zeros(1, bucket_dtype(len(ids)))
+        record['t'] = bucket
+        record['min'] = mins
+        record['max'] = maxs
+        record['avg'] = avgs
+        self.file.write(record.tobytes())
+        self.file.flush()
+
+    def open(self, ids, bucket):
+        self.close()
+        base, suffix = str(bucket), 0
+        while os.path.exists(os.path.join(self.directory, base + '.json')):
+            with open(os.path.join(self.directory, base + '.json'), encoding='utf-8') as f:
+                if json.load(f) == ids:
+                    break
+            suffix += 1
+            base = f'{bucket}-{suffix}'
+        path = os.path.join(self.directory, base)
+        with open(path + '.json', 'w', encoding='utf-8') as f:
+            json.dump(ids, f)
+        self.file = open(path + '.bin', 'ab')
+        # Drop a torn record left by a crash so appends stay aligned
+        itemsize = bucket_dtype(len(ids)).itemsize
+        self.file.truncate(self.file.tell() // itemsize * itemsize)
+        self.ids = ids
+        self.start = bucket
+        self.prune(bucket)
+
+    def prune(self, now):
+        for base in self.segments():
+            if int(base.split('-')[0]) + SEGMENT_SPAN[self.name] < now - RETENTION[self.name]:
+                for ext in ('.bin', '.json'):
+                    os.remove(os.path.join(self.directory, base + ext))
+                self.indexes.pop(base, None)
+
+    def index(self, base):
+        if base not in self.indexes:
+            with open(os.path.join(self.directory, base + '.json'), encoding='utf-8') as f:
+                self.indexes[base] = {pc_id: row for row, pc_id in enumerate(json.load(f))}
+        return self.indexes[base]
+
+    def read(self, pc_id, start, stop):
+        parts = []
+        for base in self.segments():
+            first = int(base.split('-')[0])
+            if first >= stop or first + SEGMENT_SPAN[self.name] <= start:
+                continue
+            index = self.index(base)
+            row = index.get(pc_id)
+            if row is None:
+                continue
+            path = os.path.join(self.directory, base + '.bin')
+            dtype = bucket_dtype(len(index))
+            count = os.path.getsize(path) // dtype.itemsize
+            if not count:
+                continue
+            records = np.memmap(path, dtype, mode='r', shape=(count,))
+            lo, hi = np.searchsorted(records['t'], [start, stop])
+            if lo < hi:
+                chunk = records[lo:hi]
+                parts.append((chunk['t'], chunk['min'][:, row], chunk['max'][:, row], chunk['avg'][:, row] / 100.0))
+        if not parts:
+            empty = np.zeros((0, len(HISTORY_FIELDS)))
+            return np.zeros(0), empty, empty, empty
+        return tuple(np.concatenate(values) for values in zip(*parts))
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class History:
+    # Recent raw samples in a fixed ring per PC plus minute/hour rollups on
+    # disk (when a directory is given), so memory stays bounded however long
+    # the service runs. sample() is called every `interval` seconds. With
+    # record=False the rollups written by another process are only read.
+    def __init__(self, directory=None, interval=SAMPLE_INTERVAL, ring_size=RING_SIZE, record=True):
+        self.interval = interval
+        self.record = record
+        self.ring_size = ring_size
+        self.series = {name: RollupSeries(directory, name) for name in RESOLUTIONS} if directory else {}
+        self.lock = threading.Lock()
+        self.source = None
+        self.ids = []
+        self.rows = {}
+        self.samples = 0
+        self.reset(0)
+
+    def reset(self, count):
+        shape = (count, len(HISTORY_FIELDS))
+        self.ring = np.zeros((self.ring_size,) + shape, np.uint8)
+        self.times = np.full(self.ring_size, np.nan)
+        self.head = 0
+        self.accumulators = {name: Accumulator(seconds, shape) for name, seconds in RESOLUTIONS.items()}
+
+    def flush(self):
+        for name, accumulator in self.accumulators.items():
+            if accumulator.count and name in self.series and self.record:
+                self.series[name].append(self.ids, *accumulator.close())
+
+    def sample(self, fleet, now=None):
+        now = time.time() if now is None else now
+        with fleet.lock:
+            # Rows only mean the same PCs while the fleet keeps its id list
+            if fleet.id_list is not self.source or len(fleet) != len(self.ids):
+                with self.lock:
+                    self.flush()
+                    self.source = fleet.id_list
+                    self.ids = list(fleet.id_list)
+                    self.rows = dict(fleet.rows)
+                    self.reset(len(self.ids))
+            values = np.stack([fleet.column(name) for name in HISTORY_FIELDS], axis=1)
+        with self.lock:
+            self.ring[self.head] = values
+            self.times[self.head] = now
+            self.head = (self.head + 1) % self.ring_size
+            self.samples += 1
+            for name, accumulator in self.accumulators.items():
+                closed = accumulator.add(now, values)
+                if closed is not None and name in self.series and self.record:
+                    self.series[name].append(self.ids, *closed)
+
+    def oldest(self):
+        times = self.times[~np.isnan(self.times)]
+        return times.min() if len(times) else None
+
+    def resolution(self, start, step, now):
+        # The coarsest resolution no coarser than step, falling back to a
+        # coarser one when the finer data no longer reaches back to start
+        if not self.series:
+            return 'raw'
+        if step >= RESOLUTIONS['1h'] or start < now - RETENTION['1m']:
+            return '1h'
+        oldest = self.oldest()
+        if step >= RESOLUTIONS['1m'] or oldest is None or start < oldest:
+            return '1m'
+        return 'raw'
+
+    def read_ring(self, pc_id, start, stop):
+        with self.lock:
+            row = self.rows.get(pc_id)
+            mask = (self.times >= start) & (self.times < stop)
+            if row is None or not mask.any():
+                empty = np.zeros((0, len(HISTORY_FIELDS)))
+                return np.zeros(0), empty, empty, empty
+            order = np.argsort(self.times[mask])
+            t = self.times[mask][order]
+            values = self.ring[mask, row][order]
+        return t, values, values, values.astype(np.float64)
+
+    def query(self, pc_id, start, stop, step, now=None):
+        now = time.time() if now is None else now
+        resolution = self.resolution(start, step, now)
+        if resolution == 'raw':
+            t, mins, maxs, avgs = self.read_ring(pc_id, start, stop)
+            seconds = self.interval
+        else:
+            with self.lock:
+                t, mins, maxs, avgs = self.series[resolution].read(pc_id, start, stop)
+            seconds = RESOLUTIONS[resolution]
+        if step > seconds:
+            t, mins, maxs, avgs = downsample(t, mins, maxs, avgs, step)
+        series = {'t': t.tolist()}
+        for i, name in enumerate(HISTORY_FIELDS):
+            series[name] = {
+                'min': mins[:, i].tolist(),
+                'max': maxs[:, i].tolist(),
+                'avg': np.round(avgs[:, i], 2).tolist()
+            }
+        return {'resolution': resolution, 'step': max(step, seconds), 'from': start, 'to': stop, 'history': series}
+
+    def close(self):
+        with self.lock:
+            for series in self.series.values():
+                series.close()
@@ -0,0 +1,45 @@
+import gzip
+import hashlib
+from datetime import datetime, timezone
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class CachedBody:
+    # A response body rendered once, with its ETag, Last-Modified and
+    # compressed variants computed up front. response() only negotiates the
+    # encoding and answers conditional requests with 304.
+    def __init__(self, body, mimetype='text/html', cache_control='no-cache'):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.mimetype = mimetype
+        self.cache_control = cache_control
+        self.etag = hashlib.sha256(body).hexdigest()[:20]
+        self.last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+        self.bodies = {'identity': body, 'gzip': gzip.compress(body, compresslevel=9)}
+        if brotli is not None:
+            self.bodies['br'] = brotli.compress(body, quality=11)
+
+    def encoding_for(self, request):
+        accepted = request.accept_encodings
+        for encoding in ('br', 'gzip'):
+            if encoding in self.bodies and accepted[encoding]:
+                return encoding
+        return 'identity'
+
+    def response(self, request):
+        encoding = self.encoding_for(request)
+        response = Response(self.bodies[encoding], mimetype=self.mimetype)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = self.cache_control
+        # Each encoding is a different representation, so it gets its own ETag
+        response.set_etag(self.etag if encoding == 'identity' else f'{self.etag}-{encoding}')
+        response.last_modified = self.last_modified
+        return response.make_conditional(request)
@@ -0,0 +1,109 @@
+from datetime import datetime
+
+import numpy as np
+
+from fleet_store import METRIC_FIELDS
+
+# Accepted value range per metric, inclusive
+LIMITS = {'cpu': (0, 100), 'ram': (0, 100), 'disk': (0, 100), 'uptime': (0, 2**32 - 1)}
+
+MAX_BATCH = 100000
+
+
+class TelemetryError(ValueError):
+    pass
+
+
+def to_columns(payload):
+    # Accepts either {'samples': [{'id': ..., 'cpu': ...}, ...]} or the
+    # columnar {'ids': [...], 'cpu': [...], ...} form agents can send cheaply
+    if not isinstance(payload, dict):
+        raise TelemetryError('Payload must be a JSON object')
+    if 'samples' in payload:
+        samples = payload['samples']
+        if not isinstance(samples, list) or not all(isinstance(sample, dict) for sample in samples):
+            raise TelemetryError('samples must be a list of objects')
+        ids = [sample.get('id') for sample in samples]
+        columns = {
+            name: [sample.get(name) for sample in samples]
+            for name in METRIC_FIELDS
+            if any(name in sample for sample in samples)
+        }
+    elif 'ids' in payload:
+        ids = payload['ids']
+        columns = {name: payload[name] for name in METRIC_FIELDS if name in payload}
+        if not isinstance(ids, list) or not all(isinstance(values, list) and len(values) == len(ids) for values in columns.values()):
+            raise TelemetryError('ids and metric arrays must be lists of equal length')
+    else:
+        raise TelemetryError('Payload needs samples or ids')
+    if len(ids) > MAX_BATCH:
+        raise TelemetryError(f'Batch larger than {MAX_BATCH} samples')
+    return ids, columns
+
+
+def to_array(values):
+    # float64 with NaN for missing or non-numeric entries (bools included)
+    return np.array([value if type(value) in (int, float) else np.nan for value in values], dtype=np.float64)
+
+
+def latest(rows, values, mask):
+    # Target rows and values of the selected samples, the last sample per PC winning
+    picked = np.flatnonzero(mask)
+    _, last = np.unique(rows[picked][::-1], return_index=True)
+    picked = picked[len(picked) - 1 - last]
+    return rows[picked], values[picked]
+
+
+class TelemetryIngestor:
+    # Validates a batch of samples as arrays and merges it into the fleet
+    # with one vectorized write per metric under the store lock
+    def __init__(self, fleet):
+        self.fleet = fleet
+        self.batches = 0
+        self.samples = 0
+
+    def ingest(self, payload, stamp=None):
+        ids, columns = to_columns(payload)
+        fleet = self.fleet
+        rejected = []
+
+        rows = np.array([fleet.rows.get(pc_id, -1) if isinstance(pc_id, str) else -1 for pc_id in ids], dtype=np.intp)
+        valid = rows >= 0
+        for i in np.flatnonzero(~valid).tolist():
+            rejected.append({'id': ids[i], 'error': 'Unknown PC'})
+
+        values = {}
+        for name, raw in columns.items():
+            array = to_array(raw)
+            present = np.array([value is not None for value in raw], dtype=bool)
+            low, high = LIMITS[name]
+            bad = present & valid & ~((array >= low) & (array <= high))
+            for i in np.flatnonzero(bad).tolist():
+                rejected.append({'id': ids[i], 'error': f'Invalid {name}'})
+            valid &= ~bad
+            values[name] = (array, present)
+
+        if stamp is None:
+            stamp = datetime.now().strftime('%H:%M:%S')
+        changes = {}
+        with fleet.lock:
+            for name, (array, present) in values.items():
+                update_rows, new = latest(rows, array, valid & present)
+                column = fleet.column(name)
+                new = np.rint(new).astype(column.dtype)
+                diff = column[update_rows] != new
+                update_rows, new = update_rows[diff], new[diff]
+                column[update_rows] = new
+                for row, value in zip(update_rows.tolist(), new.tolist()):
+                    changes.setdefault(fleet.id_list[row], {})[name] = value
+
+            target = np.unique(rows[valid])
+            stamps = fleet.column('last_updated')
+            stale = target[stamps[target] != stamp]
+            stamps[stale] = stamp
+            for row in stale.tolist():
+                changes.setdefault(fleet.id_list[row], {})['last_updated'] = stamp
+
+        self.batches += 1
+        self.samples += len(ids)
+        return {'accepted': int(valid.sum()), 'rejected': rejected}, changes
@@ -0,0 +1,100 @@
+import json
+import math
+
+# Distance between neighbouring seats and rows, gap between rooms, and the
+# height of one floor, in scene units
+SEAT_SPACING = 5.0
+ROOM_GAP = 10.0
+FLOOR_HEIGHT = 4.0
+
+
+class LayoutError(ValueError):
+    pass
+
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def single_room(count, seats=5):
+    # The original lab: one room, `seats` wide, rows added as needed, with
+    # the first seat at (-10, 0, 5)
+    return {
+        'origin': [-10.0, 5.0],
+        'floors': [{'rooms': [{'name': 'Lab', 'rows': math.ceil(count / seats), 'seats': seats, 'origin': [0.0, 0.0]}]}],
+        'limit': count
+    }
+
+
+def expand(config):
+    # Floors as [{'name', 'rooms': [{'name', 'rows', 'seats', 'origin'?}]}];
+    # the compact form {'floors': 3, 'rooms_per_floor': 8, 'room': {...}}
+    # is turned into that
+    floors = config.get('floors')
+    if isinstance(floors, int):
+        template = config.get('room', {'rows': 4, 'seats': 5})
+        floors = [
+            {'rooms': [dict(template, name=f'Room-{f}{r + 1:02d}') for r in range(config.get('rooms_per_floor', 1))]}
+            for f in range(1, floors + 1)
+        ]
+    if not isinstance(floors, list) or not floors:
+        raise LayoutError('Layout needs a list of floors or a floor count')
+    for floor in floors:
+        rooms = floor.get('rooms')
+        if not isinstance(rooms, list) or not rooms:
+            raise LayoutError('Every floor needs a list of rooms')
+        for room in rooms:
+            if not isinstance(room.get('rows'), int) or not isinstance(room.get('seats'), int) or room['rows'] < 1 or room['seats'] < 1:
+                raise LayoutError(f"Room {room.get('name')} needs positive integer rows and seats")
+    return floors
+
+
+def rooms(config):
+    # Every room with its floor number and the position of its first seat.
+    # Rooms without an explicit origin are tiled across the floor in a grid.
+    spacing = config.get('seat_spacing', SEAT_SPACING)
+    gap = config.get('room_gap', ROOM_GAP)
+    base_x, base_z = config.get('origin', [0.0, 0.0])
+    placed = []
+    for number, floor in enumerate(expand(config), 1):
+        floor_rooms = floor['rooms']
+        per_row = config.get('rooms_per_row') or math.ceil(math.sqrt(len(floor_rooms)))
+        width = max(room['seats'] for room in floor_rooms) * spacing + gap
+        depth = max(room['rows'] for room in floor_rooms) * spacing + gap
+        for index, room in enumerate(floor_rooms):
+            if 'origin' in room:
+                x, z = room['origin']
+            else:
+                x, z = (index % per_row) * width, -(index // per_row) * depth
+            placed.append({
+                'floor': floor.get('number', number),
+                'room': room.get('name') or f'Room-{number}{index + 1:02d}',
+                'rows': room['rows'],
+                'seats': room['seats'],
+                'x': base_x + x,
+                'z': base_z + z
+            })
+    return placed
+
+
+def seats(config):
+    # One dict per seat, room by room, row by row; rows run towards -z
+    spacing = config.get('seat_spacing', SEAT_SPACING)
+    height = config.get('floor_height', FLOOR_HEIGHT)
+    limit = config.get('limit')
+    count = 0
+    for room in rooms(config):
+        for row in range(room['rows']):
+            for seat in range(room['seats']):
+                if limit is not None and count >= limit:
+                    return
+                count += 1
+                yield {
+                    'floor': room['floor'],
+                    'room': room['room'],
+                    'location': f'Row-{row + 1}, Seat-{seat + 1}',
+                    'x': room['x'] + seat * spacing,
+                    'y': (room['floor'] - 1) * height,
+                    'z': room['z'] - row * spacing
+                }
@@ -0,0 +1,234 @@
+import math
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+from socketio import packet
+
+# Seconds; request and handler latencies
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bytes; encoded Socket.IO packets
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+# Seconds; bounds on the profiler's sampling interval
+MIN_INTERVAL = 0.001
+MAX_INTERVAL = 10.0
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def label_text(names, values, extra=''):
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Family:
+    # One metric name and its children by label values. Updates take a
+    # lock per family, so recording costs a dict lookup and a few adds.
+    def __init__(self, name, kind, help, labels=(), buckets=None):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets) if buckets else None
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, *labels):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def observe(self, value, *labels):
+        # Histogram children are [count per bucket..., count above the last, sum]
+        with self.lock:
+            child = self.values.get(labels)
+            if child is None:
+                child = self.values[labels] = [0] * (len(self.buckets) + 2)
+                child[-1] = 0.0
+            child[bisect_left(self.buckets, value)] += 1
+            child[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        with self.lock:
+            values = {labels: list(child) if isinstance(child, list) else child for labels, child in self.values.items()}
+        for labels, child in sorted(values.items(), key=lambda item: tuple(map(str, item[0]))):
+            if self.kind != 'histogram':
+                lines.append(f'{self.name}{label_text(self.labels, labels)} {number(child)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), child[:-1]):
+                cumulative += count
+                le = 'le="' + number(bound) + '"'
+                lines.append(f'{self.name}_bucket{label_text(self.labels, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{label_text(self.labels, labels)} {number(child[-1])}')
+            lines.append(f'{self.name}_count{label_text(self.labels, labels)} {cumulative}')
+        return lines
+
+
+class Callback:
+    # A value read when /metrics is scraped, for state the app already keeps
+    def __init__(self, name, kind, help, read):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.read = read
+
+    def render(self):
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}', f'{self.name} {number(self.read())}']
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help, labels=()):
+        return self._add(Family(name, 'counter', help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Family(name, 'histogram', help, labels, buckets))
+
+    def gauge(self, name, help, read):
+        return self._add(Callback(name, 'gauge', help, read))
+
+    def counter_from(self, name, help, read):
+        return self._add(Callback(name, 'counter', help, read))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        # Prometheus text exposition format, version 0.0.4
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def timed(histogram, *labels):
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, *labels)
+        return wrapper
+    return decorate
+
+
+def count_packets(server, counter, sizes):
+    # Counts every Socket.IO packet the server encodes, by event name, with
+    # its encoded size. A broadcast is encoded once for all its recipients,
+    # so this counts emits, not frames per client.
+    base = server.packet_class
+
+    class CountedPacket(base):
+        def encode(self):
+            encoded = super().encode()
+            if self.packet_type in (packet.EVENT, packet.BINARY_EVENT) and self.data:
+                event = str(self.data[0])
+            elif self.packet_type in (packet.ACK, packet.BINARY_ACK):
+                event = 'ack'
+            else:
+                event = 'control'
+            size = sum(map(len, encoded)) if isinstance(encoded, list) else len(encoded)
+            counter.inc(1, event)
+            sizes.observe(size, event)
+            return encoded
+
+    server.packet_class = CountedPacket
+
+
+class SamplingProfiler:
+    # Samples the stack of every thread each `interval` seconds while
+    # running and counts them collapsed ('outer;inner;leaf'), the input
+    # flame graph tools take. Under eventlet or gevent only the OS threads
+    # are visible, so green threads show up as the hub's stack.
+    def __init__(self, interval=0.01, max_stacks=10000):
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.running = False
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.stacks = {}
+        self.samples = 0
+        self.overflow = 0
+        self.started = None
+
+    def start(self, interval=None):
+        if interval is not None:
+            interval = float(interval)
+            if not math.isfinite(interval) or not MIN_INTERVAL <= interval <= MAX_INTERVAL:
+                raise ValueError(f'interval_ms must be between {MIN_INTERVAL * 1e3:g} and {MAX_INTERVAL * 1e3:g}')
+            self.interval = interval
+        if self.running:
+            return False
+        with self.lock:
+            self.reset()
+        self.running = True
+        self.generation += 1
+        self.started = time.time()
+        threading.Thread(target=self._run, args=(self.generation,), daemon=True).start()
+        return True
+
+    def stop(self):
+        if not self.running:
+            return False
+        self.running = False
+        return True
+
+    def _run(self, generation):
+        own = threading.get_ident()
+        while self.running and self.generation == generation:
+            frames = sys._current_frames()
+            with self.lock:
+                for thread_id, frame in frames.items():
+                    if thread_id == own:
+                        continue
+                    names = []
+                    while frame is not None:
+                        code = frame.f_code
+                        names.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                        frame = frame.f_back
+                    stack = ';'.join(reversed(names))
+                    if stack in self.stacks or len(self.stacks) < self.max_stacks:
+                        self.stacks[stack] = self.stacks.get(stack, 0) + 1
+                    else:
+                        self.overflow += 1
+                self.samples += 1
+            del frames
+            time.sleep(self.interval)
+
+    def collapsed(self):
+        with self.lock:
+            stacks = sorted(self.stacks.items(), key=lambda item: -item[1])
+        return ''.join(f'{stack} {count}\n' for stack, count in stacks)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'running': self.running,
+                'interval_ms': round(self.interval * 1e3, 3),
+                'samples': self.samples,
+                'stacks': len(self.stacks),
+                'overflow': self.overflow,
+                'started': self.started
+            }
@@ -0,0 +1,139 @@
+import time
+
+# How long deltas are merged before going out, in seconds
+WINDOW = 0.05
+# Frames a client may have waiting before it counts as behind
+MAX_QUEUE = 64
+
+
+class Coalescer:
+    # Merges sequenced deltas per PC until the window closes, so a burst of
+    # actions or telemetry for one PC goes out as its latest state once. The
+    # merged batch keeps the delta contract: since is the seq before the
+    # first merged delta, seq the last one.
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.pending = None
+        self.since = None
+        self.seq = None
+        self.opened = 0.0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.batches = 0
+        self.deltas_in = 0
+        self.changes_in = 0
+        self.pcs_out = 0
+        self.last_batch = 0
+        self.max_batch = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+
+    def add(self, since, seq, changes):
+        if self.pending is None:
+            self.pending = {}
+            self.since = since
+            self.opened = time.perf_counter()
+        elif since is None:
+            # A gap in the sequence (see apply_cluster_delta) makes the whole batch a resync
+            self.since = None
+        pending = self.pending
+        for pc_id, fields in changes.items():
+            current = pending.get(pc_id)
+            if current is None:
+                pending[pc_id] = dict(fields)
+            else:
+                current.update(fields)
+        self.seq = seq
+        self.deltas_in += 1
+        self.changes_in += len(changes)
+
+    def take(self):
+        # (since, seq, changes) merged since the window opened, or None
+        if self.pending is None:
+            return None
+        batch = (self.since, self.seq, self.pending)
+        latency = time.perf_counter() - self.opened
+        self.batches += 1
+        self.pcs_out += len(self.pending)
+        self.last_batch = len(self.pending)
+        self.max_batch = max(self.max_batch, self.last_batch)
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+        self.total_latency += latency
+        self.pending = None
+        return batch
+
+    def stats(self):
+        return {
+            'window_ms': round(self.window * 1e3, 3),
+            'batches': self.batches,
+            'deltas_in': self.deltas_in,
+            'changes_in': self.changes_in,
+            'pcs_out': self.pcs_out,
+            'avg_batch': round(self.pcs_out / self.batches, 1) if self.batches else 0.0,
+            'last_batch': self.last_batch,
+            'max_batch': self.max_batch,
+            'avg_window_ms': round(self.total_latency / self.batches * 1e3, 3) if self.batches else 0.0,
+            'last_window_ms': round(self.last_latency * 1e3, 3),
+            'max_window_ms': round(self.max_latency * 1e3, 3)
+        }
+
+
+class Backpressure:
+    # Tracks clients whose outbound queue is over `limit` frames. Frames are
+    # not queued behind a client that is behind; it is skipped and remembers
+    # the last seq it was sent, and once its queue drains it gets one
+    # catch-up frame with the latest state instead of every stale one.
+    # depth(sid) returns the number of frames waiting for a client.
+    def __init__(self, depth, limit=MAX_QUEUE):
+        self.depth = depth
+        self.limit = limit
+        self.behind = {}
+        self.dropped = 0
+        self.catchups = 0
+        self.max_depth = 0
+        self.last_depth = {}
+
+    def skip(self, sids, since):
+        # Clients that must not get the next frame: the ones already behind
+        # plus any whose queue just went over the limit (they have `since`)
+        for sid in sids:
+            if sid in self.behind:
+                continue
+            depth = self.depth(sid)
+            self.last_depth[sid] = depth
+            self.max_depth = max(self.max_depth, depth)
+            if depth > self.limit:
+                self.behind[sid] = since
+        self.dropped += len(self.behind)
+        return list(self.behind)
+
+    def drained(self):
+        # [(sid, seq it has)] for clients that are behind but caught up on
+        # their queue; they are no longer tracked as behind
+        ready = []
+        for sid, seq in list(self.behind.items()):
+            depth = self.depth(sid)
+            self.last_depth[sid] = depth
+            if depth <= self.limit // 2:
+                del self.behind[sid]
+                ready.append((sid, seq))
+        self.catchups += len(ready)
+        return ready
+
+    def forget(self, sid):
+        self.behind.pop(sid, None)
+        self.last_depth.pop(sid, None)
+
+    def stats(self):
+        depths = list(self.last_depth.values())
+        return {
+            'queue_limit': self.limit,
+            'behind': len(self.behind),
+            'dropped_frames': self.dropped,
+            'catchups': self.catchups,
+            'max_queue_depth': self.max_depth,
+            'avg_queue_depth': round(sum(depths) / len(depths), 2) if depths else 0.0
+        }
@@ -0,0 +1,157 @@
+import itertools
+import json
+
+from fleet_store import FIELDS
+
+# Rows converted and written per streamed chunk
+CHUNK_SIZE = 1000
+
+MAX_LIMIT = 10000
+# Value combinations a selector with list values may expand to
+MAX_SELECTOR_COMBINATIONS = 1000
+
+# Query parameter -> fleet index it filters on; region=x0,z0,x1,z1 goes
+# through the spatial grid instead
+FILTERS = {
+    'status': 'status', 'conflict_type': 'conflict_type', 'remote_active': 'remote_active', 'row': 'lab_row',
+    'floor': 'floor', 'room': 'room', 'region': 'region'
+}
+
+
+class QueryError(ValueError):
+    pass
+
+
+def parse_filters(args):
+    criteria = {}
+    for param, index in FILTERS.items():
+        value = args.get(param)
+        if value is None:
+            continue
+        if param == 'remote_active':
+            if value.lower() not in ('true', 'false'):
+                raise QueryError('remote_active must be true or false')
+            value = value.lower() == 'true'
+        elif param in ('row', 'floor'):
+            if not value.isdigit():
+                raise QueryError(f'{param} must be a number')
+            value = int(value)
+        elif param == 'region':
+            value = parse_region(value)
+        elif param == 'conflict_type' and value.lower() in ('none', 'null'):
+            value = None
+        criteria[index] = value
+    return criteria
+
+
+def parse_selector(selector):
+    # A JSON selector such as {"status": ["conflict", "user"], "row": 3}, as a
+    # list of criteria whose matches are unioned: a list matches any of its
+    # values, so each combination of values is one index lookup
+    if not isinstance(selector, dict) or not selector:
+        raise QueryError('Request needs ids or a selector')
+    unknown = [name for name in selector if name not in FILTERS]
+    if unknown:
+        raise QueryError(f"Unknown selector fields: {', '.join(unknown)}")
+    choices = []
+    for name, value in selector.items():
+        if name == 'region' and isinstance(value, list):
+            # Four numbers, not alternatives
+            value = [','.join(map(str, value))]
+        choices.append(value if isinstance(value, list) else [value])
+    count = 1
+    for values in choices:
+        count *= len(values)
+    if count > MAX_SELECTOR_COMBINATIONS:
+        raise QueryError(f'Selector lists expand to more than {MAX_SELECTOR_COMBINATIONS} combinations')
+    return [parse_filters(dict(zip(selector, map(str, values)))) for values in itertools.product(*choices)]
+
+
+def parse_region(value):
+    try:
+        region = tuple(float(part) for part in value.split(','))
+    except ValueError:
+        region = ()
+    if len(region) != 4:
+        raise QueryError('region must be x0,z0,x1,z1')
+    return region
+
+
+def parse_fields(args):
+    if not args.get('fields'):
+        return None
+    fields = [name.strip() for name in args['fields'].split(',') if name.strip()]
+    unknown = [name for name in fields if name not in FIELDS]
+    if unknown:
+        raise QueryError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def parse_page(args):
+    # Cursors are the opaque string form of the last row returned
+    try:
+        after = int(args.get('cursor', -1))
+        limit = int(args['limit']) if 'limit' in args else None
+    except ValueError:
+        raise QueryError('cursor and limit must be integers')
+    # -1 is the start; lower rows don't exist and would index from the end
+    if after < -1:
+        raise QueryError('cursor must be a cursor returned by a previous page')
+    if limit is not None and not 1 <= limit <= MAX_LIMIT:
+        raise QueryError(f'limit must be between 1 and {MAX_LIMIT}')
+    return after, limit
+
+
+def iter_rows(fleet, criteria, after, limit):
+    # Row chunks in fleet order, fetched from the indexes a chunk at a time
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining)
+        with fleet.lock:
+            rows = fleet.find_rows(after=after, limit=size, **criteria)
+        if not rows:
+            return
+        yield rows
+        after = rows[-1]
+        if remaining is not None:
+            remaining -= len(rows)
+        if len(rows) < size:
+            return
+
+
+def collect_pcs(fleet, criteria, fields, after, limit):
+    # Same query as stream_pcs, materialised for the binary/columnar encoders
+    pcs = []
+    last = after
+    for rows in iter_rows(fleet, criteria, after, limit):
+        with fleet.lock:
+            chunk = fleet.rows_to_dicts(rows)
+        if fields is not None:
+            chunk = [{name: pc[name] for name in fields} for pc in chunk]
+        pcs.extend(chunk)
+        last = rows[-1]
+    more = limit is not None and bool(fleet.find_rows(after=last, limit=1, **criteria))
+    return pcs, str(last) if more else None
+
+
+def stream_pcs(fleet, criteria, fields, after, limit, paged):
+    # JSON text chunks: a bare array, or {"pcs": [...], "next_cursor": ...}
+    # when paging, so large results are never held in memory whole
+    dumps = json.JSONEncoder(separators=(',', ':')).encode
+    yield '{"pcs":[' if paged else '['
+    first = True
+    last = after
+    for rows in iter_rows(fleet, criteria, after, limit):
+        with fleet.lock:
+            pcs = fleet.rows_to_dicts(rows)
+        if fields is not None:
+            pcs = [{name: pc[name] for name in fields} for pc in pcs]
+        body = dumps(pcs)[1:-1]
+        yield body if first else ',' + body
+        first = False
+        last = rows[-1]
+    if not paged:
+        yield ']'
+        return
+    more = limit is not None and bool(fleet.find_rows(after=last, limit=1, **criteria))
+    yield '],"next_cursor":' + dumps(str(last) if more else None) + '}'
@@ -0,0 +1,186 @@
+import json
+import os
+import time
+
+import numpy as np
+
+from fleet_store import COLUMN_FIELDS, ColumnDelta, PCRecord
+
+SNAPSHOT_FILE = 'snapshot.npz'
+SEGMENT_PREFIX = 'wal-'
+SEGMENT_SUFFIX = '.jsonl'
+
+# A snapshot is taken once the log holds this many PC changes per PC in the
+# fleet (or the interval passes), which bounds replay work at startup
+SNAPSHOT_CHANGES_PER_PC = 2
+SNAPSHOT_INTERVAL = 300
+
+# Record fields saved alongside the typed columns; lab_row is derived again on load
+RECORD_FIELDS = [name for name in PCRecord.__slots__[1:] if name != 'lab_row']
+TYPED_COLUMNS = [name for name, dtype in COLUMN_FIELDS.items() if dtype is not object]
+
+
+def capture(fleet):
+    # {field: values} for the whole fleet, as FleetStore.load_columns takes
+    # it; callers hold the fleet lock
+    columns = {name: fleet.column(name).copy() for name in TYPED_COLUMNS}
+    columns.update({name: [getattr(record, name) for record in fleet.records] for name in RECORD_FIELDS})
+    columns['last_updated'] = fleet.column('last_updated').tolist()
+    return columns
+
+
+def entry_changes(entry):
+    # (pc_id, fields) pairs of a log entry, in either of its layouts
+    if 'changes' in entry:
+        yield from entry['changes'].items()
+        return
+    for ids, columns in entry['columns']:
+        names = tuple(columns)
+        for pc_id, *values in zip(ids, *(columns[name] for name in names)):
+            yield pc_id, dict(zip(names, values))
+
+
+class StateJournal:
+    # Durable fleet state: a compact snapshot (typed NumPy columns plus the
+    # record fields as JSON, in one .npz) and an append-only log of every
+    # applied change batch after it. The log is split into segments named by
+    # their first sequence number; taking a snapshot starts a new segment
+    # and drops the ones it covers. Recovery loads the snapshot and replays
+    # the log entries with a higher sequence number.
+    def __init__(self, directory, fsync=False):
+        self.directory = directory
+        self.fsync = fsync
+        self.seq = 0
+        self.snapshot_seq = 0
+        self.pending = 0
+        self.snapshot_time = time.monotonic()
+        self.file = None
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def segments(self):
+        names = [
+            name for name in os.listdir(self.directory)
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+        ]
+        return sorted(names, key=lambda name: int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+
+    def open_segment(self):
+        if self.file is not None:
+            self.file.close()
+        name = f'{SEGMENT_PREFIX}{self.seq + 1}{SEGMENT_SUFFIX}'
+        self.file = open(self.path(name), 'a', encoding='utf-8')
+
+    def append(self, changes):
+        # One line per batch; callers hold the fleet lock, so lines are in apply order
+        if self.file is None:
+            self.open_segment()
+        self.seq += 1
+        if isinstance(changes, ColumnDelta):
+            # Refreshes stay column-wise: [[ids, {field: values}], ...]
+            entry = {'seq': self.seq, 'columns': [
+                [ids, {name: values.tolist() for name, values in columns.items()}] for ids, columns in changes.groups
+            ]}
+        else:
+            entry = {'seq': self.seq, 'changes': changes}
+        self.file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+        self.pending += len(changes)
+        return self.seq
+
+    def due(self, fleet_size):
+        if not self.pending:
+            return False
+        return (self.pending >= SNAPSHOT_CHANGES_PER_PC * max(fleet_size, 1)
+                or time.monotonic() - self.snapshot_time >= SNAPSHOT_INTERVAL)
+
+    def snapshot(self, fleet):
+        # The copy is taken under the fleet lock and a new log segment started
+        # at the same point; the slow write happens after the lock is released
+        with fleet.lock:
+            seq = self.seq
+            records = capture(fleet)
+            columns = {name: records.pop(name) for name in TYPED_COLUMNS}
+            self.open_segment()
+            self.pending = 0
+            self.snapshot_time = time.monotonic()
+        meta = {'seq': seq, 'count': len(records['id']), 'created': time.time()}
+        temp = self.path(SNAPSHOT_FILE + '.tmp')
+        with open(temp, 'wb') as f:
+            np.savez(
+                f,
+                meta=np.frombuffer(json.dumps(meta).encode('utf-8'), np.uint8),
+                records=np.frombuffer(json.dumps(records, separators=(',', ':')).encode('utf-8'), np.uint8),
+                **columns
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.path(SNAPSHOT_FILE))
+        self.snapshot_seq = seq
+        self.prune(seq)
+        return seq
+
+    def prune(self, seq):
+        # Segments whose entries all precede the snapshot; the current one stays
+        segments = self.segments()
+        for name, following in zip(segments, segments[1:]):
+            if int(following[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]) <= seq + 1:
+                os.remove(self.path(name))
+
+    def load_snapshot(self, fleet):
+        path = self.path(SNAPSHOT_FILE)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            meta = json.loads(data['meta'].tobytes())
+            columns = json.loads(data['records'].tobytes())
+            for name in TYPED_COLUMNS:
+                columns[name] = data[name]
+        fleet.load_columns(columns)
+        return meta['seq']
+
+    def entries(self, after):
+        for name in self.segments():
+            with open(self.path(name), encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A torn last line from a crash mid-write
+                        break
+                    if entry['seq'] > after:
+                        yield entry
+
+    def recover(self, fleet):
+        # Snapshot plus log tail; False when there is no saved state at all
+        seq = self.load_snapshot(fleet)
+        if seq is None:
+            # Log segments without a snapshot have nothing to apply to
+            for name in self.segments():
+                os.remove(self.path(name))
+            return False
+        self.seq = self.snapshot_seq = seq
+        replayed = 0
+        with fleet.lock:
+            for entry in self.entries(seq):
+                for pc_id, fields in entry_changes(entry):
+                    if pc_id in fleet:
+                        fleet.update(pc_id, fields)
+                    replayed += 1
+                self.seq = entry['seq']
+        self.pending = replayed
+        # A segment starting past the last good entry holds only a torn line
+        stale = self.path(f'{SEGMENT_PREFIX}{self.seq + 1}{SEGMENT_SUFFIX}')
+        if os.path.exists(stale):
+            os.remove(stale)
+        self.open_segment()
+        return True
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,72 @@
+from datetime import datetime
+
+import numpy as np
+
+from fleet_store import METRIC_FIELDS
+
+# Inclusive ranges, the same ones refresh_pcs has always drawn from
+REFRESH_RANGES = {'cpu': (20, 80), 'ram': (20, 90), 'disk': (15, 55), 'uptime': (1, 72)}
+
+# Machines whose telemetry is left alone by a refresh
+FROZEN_STATUSES = ('backup',)
+
+# Max per-tick random walk of each metric in the live simulation
+DRIFT_STEPS = {'cpu': 5, 'ram': 3, 'disk': 1}
+
+
+class RefreshEngine:
+    # Redraws telemetry for the whole fleet, or a masked subset, as one
+    # vectorized write per column with a single timestamp per batch
+    def __init__(self, fleet, ranges=None, seed=None):
+        self.fleet = fleet
+        self.ranges = dict(ranges or REFRESH_RANGES)
+        self.rng = np.random.default_rng(seed)
+
+    def default_mask(self):
+        return self.fleet.mask(exclude={'status': FROZEN_STATUSES})
+
+    def refresh(self, mask=None, touch=None, stamp=None):
+        # mask selects the rows that get new metrics (default: all non-backup),
+        # touch the rows that get the batch timestamp (default: every row)
+        fleet = self.fleet
+        if mask is None:
+            mask = self.default_mask()
+        rows = np.flatnonzero(mask)
+        for name, (low, high) in self.ranges.items():
+            column = fleet.column(name)
+            column[rows] = self.rng.integers(low, high + 1, size=len(rows), dtype=column.dtype)
+
+        if stamp is None:
+            stamp = datetime.now().strftime('%H:%M:%S')
+        touched = np.arange(len(fleet)) if touch is None else np.flatnonzero(touch)
+        fleet.column('last_updated')[touched] = stamp
+        return rows, touched
+
+    def drift(self, count=None, mask=None, stamp=None):
+        # One simulation step: random-walk the metrics of up to count
+        # eligible rows (all of them when count is None), clipped to 0-100
+        fleet = self.fleet
+        if mask is None:
+            mask = self.default_mask()
+        rows = np.flatnonzero(mask)
+        if count is not None and count < len(rows):
+            rows = np.unique(self.rng.choice(rows, count))
+        for name, step in DRIFT_STEPS.items():
+            column = fleet.column(name)
+            values = column[rows].astype(np.int16)
+            values += self.rng.integers(-step, step + 1, size=len(rows), dtype=np.int16)
+            column[rows] = np.clip(values, 0, 100)
+
+        if stamp is None:
+            stamp = datetime.now().strftime('%H:%M:%S')
+        fleet.column('last_updated')[rows] = stamp
+        return rows
+
+    def changes(self, rows, touched, fields=None):
+        # Delta for emit_pc_update as a ColumnDelta: metrics and timestamp
+        # for refreshed rows, the timestamp alone for the rest
+        if fields is None:
+            fields = self.ranges
+        fields = tuple(name for name in METRIC_FIELDS if name in fields) + ('last_updated',)
+        stamped = np.setdiff1d(touched, rows, assume_unique=True)
+        return self.fleet.column_delta([(rows, fields), (stamped, ('last_updated',))])
@@ -0,0 +1,98 @@
+import argparse
+import importlib.util
+import os
+import secrets
+import subprocess
+import sys
+import time
+
+MODES = ('eventlet', 'gevent', 'threading')
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def default_mode():
+    # The first async server that is installed; threading is Werkzeug's
+    # threaded server and only meant as a last resort
+    for mode in MODES[:-1]:
+        if importlib.util.find_spec(mode) is not None:
+            return mode
+    return 'threading'
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Run the digital twin server')
+    parser.add_argument('--host', default=os.environ.get('DT_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('DT_PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('DT_WORKERS', 1)),
+                        help='worker processes on consecutive ports, sharing state through a broker')
+    parser.add_argument('--mode', choices=MODES, default=os.environ.get('DT_ASYNC_MODE') or default_mode())
+    parser.add_argument('--broker', default=os.environ.get('DT_BROKER_LISTEN', '127.0.0.1:6000'),
+                        help='address the broker listens on when --workers > 1')
+    parser.add_argument('--debug', action='store_true', default=os.environ.get('DT_DEBUG') == '1')
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error('--workers must be at least 1')
+    return args
+
+
+def run(args):
+    # Monkey patching has to happen before anything imports socket or threading
+    os.environ['DT_ASYNC_MODE'] = args.mode
+    if args.mode == 'eventlet':
+        import eventlet
+        eventlet.monkey_patch()
+    elif args.mode == 'gevent':
+        from gevent import monkey
+        monkey.patch_all()
+    import DT
+    if args.mode == 'threading':
+        print('Warning: threading mode uses the Werkzeug server; install gevent (requirement.txt) for production',
+              file=sys.stderr)
+    DT.start_background_tasks()
+    print(f'Serving on http://{args.host}:{args.port} ({args.mode})', flush=True)
+    DT.socketio.run(
+        DT.app, host=args.host, port=args.port, debug=args.debug, use_reloader=False,
+        log_output=args.debug, allow_unsafe_werkzeug=args.mode == 'threading'
+    )
+
+
+def run_cluster(args):
+    # Broker plus one process per worker; put a load balancer with sticky
+    # sessions in front of ports port .. port + workers - 1
+    env = {name: value for name, value in os.environ.items() if name != 'DT_BROKER'}
+    # A one-off broker key unless one is configured, passed on to every process
+    env.setdefault('DT_BROKER_KEY', secrets.token_hex(32))
+    processes = [subprocess.Popen([sys.executable, os.path.join(ROOT, 'cluster.py'), args.broker],
+                                  env=dict(env, DT_ASYNC_MODE='threading'), stdout=subprocess.PIPE, text=True)]
+    print(processes[0].stdout.readline().strip(), flush=True)
+    for i in range(args.workers):
+        command = [
+            sys.executable, os.path.abspath(__file__), '--host', args.host, '--port', str(args.port + i),
+            '--mode', args.mode, '--workers', '1'
+        ]
+        if args.debug:
+            command.append('--debug')
+        processes.append(subprocess.Popen(command, env=dict(env, DT_BROKER=args.broker)))
+    try:
+        while all(process.poll() is None for process in processes):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.workers > 1:
+        run_cluster(args)
+    else:
+        run(args)
+
+
+if __name__ == '__main__':
+    main()
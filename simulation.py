@@ -0,0 +1,121 @@
+import math
+import time
+
+# Ticks per second; anything faster just spins the loop
+MAX_RATE = 1000.0
+
+
+def count(value, name):
+    if isinstance(value, float) and not math.isfinite(value):
+        raise ValueError(f'{name} must be a whole number')
+    value = int(value)
+    if value < 0:
+        raise ValueError(f'{name} must not be negative')
+    return value
+
+
+class Simulation:
+    # Fixed-rate loop on the Socket.IO server's own background task/sleep
+    # primitives, so it runs as a thread, eventlet or gevent green thread
+    # depending on the async mode. Each tick calls
+    # tick(pcs_per_tick, events_per_tick) once.
+    def __init__(self, socketio, tick, rate=1.0, pcs_per_tick=None, events_per_tick=0):
+        self.socketio = socketio
+        self.tick = tick
+        self.rate = rate
+        self.pcs_per_tick = pcs_per_tick
+        self.events_per_tick = events_per_tick
+        self.running = False
+        self.generation = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.ticks = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.last_duration = 0.0
+        self.max_duration = 0.0
+        self.total_duration = 0.0
+        self.last_drift = 0.0
+        self.max_drift = 0.0
+        self.last_batch = 0
+
+    def configure(self, rate=None, pcs_per_tick=None, events_per_tick=None):
+        # Everything is checked before anything is applied
+        if rate is not None:
+            rate = float(rate)
+            # JSON bodies can carry Infinity and NaN, which slip past a plain <= 0
+            if not math.isfinite(rate) or rate <= 0 or rate > MAX_RATE:
+                raise ValueError(f'rate must be above 0 and at most {MAX_RATE:g}')
+        if pcs_per_tick is not None:
+            pcs_per_tick = count(pcs_per_tick, 'pcs_per_tick')
+        if events_per_tick is not None:
+            events_per_tick = count(events_per_tick, 'events_per_tick')
+        if rate is not None:
+            self.rate = rate
+        if pcs_per_tick is not None:
+            self.pcs_per_tick = pcs_per_tick or None
+        if events_per_tick is not None:
+            self.events_per_tick = events_per_tick
+
+    def start(self):
+        if self.running:
+            return False
+        self.running = True
+        self.generation += 1
+        self.reset_stats()
+        self.socketio.start_background_task(self._run, self.generation)
+        return True
+
+    def stop(self):
+        if not self.running:
+            return False
+        self.running = False
+        return True
+
+    def _run(self, generation):
+        next_tick = time.perf_counter()
+        while self.running and self.generation == generation:
+            started = time.perf_counter()
+            drift = started - next_tick
+            self.last_batch = self.tick(self.pcs_per_tick, self.events_per_tick) or 0
+            duration = time.perf_counter() - started
+
+            period = 1.0 / self.rate
+            self.ticks += 1
+            self.last_duration = duration
+            self.max_duration = max(self.max_duration, duration)
+            self.total_duration += duration
+            self.last_drift = drift
+            self.max_drift = max(self.max_drift, drift)
+            if duration > period:
+                self.overruns += 1
+
+            # Ticks that are already a full period late are dropped rather
+            # than run back to back
+            next_tick += period
+            now = time.perf_counter()
+            if now - next_tick > period:
+                missed = int((now - next_tick) / period)
+                self.skipped += missed
+                next_tick += missed * period
+            self.socketio.sleep(max(0.0, next_tick - now))
+
+    def stats(self):
+        period = 1.0 / self.rate
+        return {
+            'running': self.running,
+            'rate': self.rate,
+            'budget_ms': round(period * 1e3, 3),
+            'pcs_per_tick': self.pcs_per_tick,
+            'events_per_tick': self.events_per_tick,
+            'ticks': self.ticks,
+            'last_batch': self.last_batch,
+            'last_tick_ms': round(self.last_duration * 1e3, 3),
+            'avg_tick_ms': round(self.total_duration / self.ticks * 1e3, 3) if self.ticks else 0.0,
+            'max_tick_ms': round(self.max_duration * 1e3, 3),
+            'last_drift_ms': round(self.last_drift * 1e3, 3),
+            'max_drift_ms': round(self.max_drift * 1e3, 3),
+            'overruns': self.overruns,
+            'skipped': self.skipped
+        }
@@ -0,0 +1,107 @@
+import math
+
+import numpy as np
+
+CELL_SIZE = 10.0
+
+MIN_CAPACITY = 64
+
+
+class SpatialGrid:
+    # Uniform grid over the floor plan, so a region query only looks at the
+    # cells it overlaps. Per row it keeps a cell number and the x/z it was
+    # placed at in NumPy arrays; the rows of each cell are a slice of one
+    # array sorted by cell, rebuilt on the first query after seats move.
+    def __init__(self, cell=CELL_SIZE):
+        self.cell = cell
+        # (floor, cell x, cell z) -> cell number, and back
+        self.cells = {}
+        self.keys = []
+        self.floors = {}
+        self.placed = 0
+        self.cell_of = np.full(MIN_CAPACITY, -1, np.int32)
+        self.x = np.zeros(MIN_CAPACITY)
+        self.z = np.zeros(MIN_CAPACITY)
+        self.order = None
+        self.starts = None
+
+    def __len__(self):
+        return self.placed
+
+    def key(self, floor, x, z):
+        return floor, math.floor(x / self.cell), math.floor(z / self.cell)
+
+    def reserve(self, capacity):
+        current = len(self.cell_of)
+        if capacity <= current:
+            return
+        capacity = max(capacity, current * 2)
+        cell_of = np.full(capacity, -1, np.int32)
+        cell_of[:current] = self.cell_of
+        self.cell_of = cell_of
+        self.x = np.concatenate([self.x, np.zeros(capacity - current)])
+        self.z = np.concatenate([self.z, np.zeros(capacity - current)])
+
+    def insert(self, row, floor, x, z):
+        if x is None or z is None:
+            return
+        self.reserve(row + 1)
+        key = self.key(floor, x, z)
+        cell = self.cells.get(key)
+        if cell is None:
+            cell = self.cells[key] = len(self.keys)
+            self.keys.append(key)
+        self.cell_of[row] = cell
+        self.x[row] = x
+        self.z[row] = z
+        self.floors[floor] = self.floors.get(floor, 0) + 1
+        self.placed += 1
+        self.order = None
+
+    def remove(self, row):
+        if row >= len(self.cell_of) or self.cell_of[row] < 0:
+            return
+        floor = self.keys[self.cell_of[row]][0]
+        self.cell_of[row] = -1
+        self.floors[floor] -= 1
+        if not self.floors[floor]:
+            del self.floors[floor]
+        self.placed -= 1
+        self.order = None
+
+    def move(self, row, floor, x, z):
+        self.remove(row)
+        self.insert(row, floor, x, z)
+
+    def members(self, cell):
+        if self.order is None:
+            # Rows grouped by cell, in row order within each cell; unplaced rows sort first
+            self.order = np.argsort(self.cell_of, kind='stable').astype(np.int32)
+            self.starts = np.searchsorted(self.cell_of[self.order], np.arange(len(self.keys) + 1))
+        return self.order[self.starts[cell]:self.starts[cell + 1]]
+
+    def query(self, x0, z0, x1, z1, floor=None):
+        # Sorted rows with x0 <= x <= x1 and z0 <= z <= z1, on one floor or all of them
+        x0, x1 = min(x0, x1), max(x0, x1)
+        z0, z1 = min(z0, z1), max(z0, z1)
+        floors = list(self.floors) if floor is None else [floor]
+        _, cx0, cz0 = self.key(None, x0, z0)
+        _, cx1, cz1 = self.key(None, x1, z1)
+        if (cx1 - cx0 + 1) * (cz1 - cz0 + 1) * len(floors) > len(self.cells):
+            # A region bigger than the occupied area: walk the occupied cells instead
+            wanted = set(floors)
+            keys = [key for key in self.cells if key[0] in wanted and cx0 <= key[1] <= cx1 and cz0 <= key[2] <= cz1]
+        else:
+            keys = [(f, cx, cz) for f in floors for cx in range(cx0, cx1 + 1) for cz in range(cz0, cz1 + 1)]
+        parts = []
+        for key in keys:
+            cell = self.cells.get(key)
+            if cell is None:
+                continue
+            rows = self.members(cell)
+            # Cells strictly inside the region need no per-row check
+            if not (cx0 < key[1] < cx1 and cz0 < key[2] < cz1):
+                x, z = self.x[rows], self.z[rows]
+                rows = rows[(x0 <= x) & (x <= x1) & (z0 <= z) & (z <= z1)]
+            parts.append(rows)
+        return np.sort(np.concatenate(parts)) if parts else np.array([], np.int32)
@@ -0,0 +1,834 @@
+// The control panel is served with <body class="control-panel">
+const showControls = document.body.classList.contains('control-panel');
+
+// Scene setup
+const scene = new THREE.Scene();
+scene.background = new THREE.Color(0xADD8E6);
+
+const camera = new THREE.PerspectiveCamera(75, window.innerWidth / window.innerHeight, 0.1, 1000);
+camera.position.set(10, 15, 15);
+
+const renderer = new THREE.WebGLRenderer({ antialias: true });
+renderer.setSize(window.innerWidth, window.innerHeight);
+renderer.shadowMap.enabled = true;
+renderer.shadowMap.type = THREE.PCFSoftShadowMap;
+document.body.appendChild(renderer.domElement);
+
+// Controls
+const controls = new THREE.OrbitControls(camera, renderer.domElement);
+controls.enableDamping = true;
+controls.dampingFactor = 0.05;
+controls.target.set(0, 0.5, 0);
+
+// Lighting
+const ambientLight = new THREE.AmbientLight(0x404040, 0.6);
+scene.add(ambientLight);
+
+const directionalLight = new THREE.DirectionalLight(0xffffff, 0.8);
+directionalLight.position.set(10, 20, 10);
+directionalLight.castShadow = true;
+directionalLight.shadow.mapSize.width = 2048;
+directionalLight.shadow.mapSize.height = 2048;
+scene.add(directionalLight);
+
+// Rooms: floor, walls with a door, ceiling, projector screen and projector
+// around the seats of each room on the floor being shown, sized from the
+// seat extents in /api/layout. The margins give the original 36x36 lab
+// around its 20 seats; ROOM_BACK leaves space behind the first row for the
+// projector and the door.
+const wallHeight = 8;
+const wallThickness = 0.2;
+const doorWidth = 3;
+const doorHeight = 4;
+const screenWidth = 8;
+const screenHeight = 4.5;
+const screenY = wallHeight * 0.6;
+const projectorHeight = 0.3;
+const projectorStandHeight = screenY - (projectorHeight / 2) - 0.15;
+const ROOM_MARGIN = 8;
+const ROOM_BACK = 13;
+
+// The original single room, drawn until the layout arrives
+const DEFAULT_ROOMS = [{ floor: null, room: 'Lab', count: 20, x0: -10, z0: -10, x1: 10, z1: 5 }];
+
+// Unit geometries scaled per mesh, so every room shares them
+const unitBox = new THREE.BoxGeometry(1, 1, 1);
+const unitPlane = new THREE.PlaneGeometry(1, 1);
+const floorMaterial = new THREE.MeshPhongMaterial({ color: 0xAAAAAA });
+const wallMaterial = new THREE.MeshPhongMaterial({ color: 0xF0F0F0 });
+const doorMaterial = new THREE.MeshPhongMaterial({ color: 0x964B00 });
+const ceilingMaterial = new THREE.MeshPhongMaterial({ color: 0xE0E0E0, side: THREE.DoubleSide });
+const screenMaterial = new THREE.MeshBasicMaterial({ color: 0xFFFFFF, side: THREE.DoubleSide });
+const projectorStandMaterial = new THREE.MeshPhongMaterial({ color: 0x888888 });
+const projectorMaterial = new THREE.MeshPhongMaterial({ color: 0x333333 });
+
+const roomGroup = new THREE.Group();
+scene.add(roomGroup);
+let layoutRooms = DEFAULT_ROOMS;
+let gridHelper = null;
+let gridVisible = true;
+
+function roomMesh(geometry, material, [width, height, depth], [x, y, z]) {
+    const mesh = new THREE.Mesh(geometry, material);
+    mesh.scale.set(width, height, depth);
+    mesh.position.set(x, y, z);
+    mesh.receiveShadow = true;
+    return mesh;
+}
+
+// One room around a seat extent; returns its outer bounds [x0, z0, x1, z1]
+function buildRoom(room) {
+    const x0 = room.x0 - ROOM_MARGIN, x1 = room.x1 + ROOM_MARGIN;
+    const z0 = room.z0 - ROOM_MARGIN, z1 = room.z1 + ROOM_BACK;
+    const width = x1 - x0, depth = z1 - z0;
+    const cx = (x0 + x1) / 2, cz = (z0 + z1) / 2;
+
+    const floorMesh = roomMesh(unitPlane, floorMaterial, [width, depth, 1], [cx, 0, cz]);
+    floorMesh.rotation.x = -Math.PI / 2;
+    roomGroup.add(floorMesh);
+
+    // Front wall, back wall with door, left and right walls
+    const segment = (width - doorWidth) / 2;
+    roomGroup.add(roomMesh(unitBox, wallMaterial, [width, wallHeight, wallThickness], [cx, wallHeight / 2, z0 - wallThickness / 2]));
+    roomGroup.add(roomMesh(unitBox, wallMaterial, [segment, wallHeight, wallThickness], [x0 + segment / 2, wallHeight / 2, z1 + wallThickness / 2]));
+    roomGroup.add(roomMesh(unitBox, wallMaterial, [segment, wallHeight, wallThickness], [x1 - segment / 2, wallHeight / 2, z1 + wallThickness / 2]));
+    roomGroup.add(roomMesh(unitBox, wallMaterial, [wallThickness, wallHeight, depth + 2 * wallThickness], [x0 - wallThickness / 2, wallHeight / 2, cz]));
+    roomGroup.add(roomMesh(unitBox, wallMaterial, [wallThickness, wallHeight, depth + 2 * wallThickness], [x1 + wallThickness / 2, wallHeight / 2, cz]));
+
+    const doorGroup = new THREE.Group();
+    doorGroup.position.set(cx - doorWidth / 2, 0, z1 + wallThickness / 2);
+    doorGroup.rotation.y = -Math.PI / 4;
+    doorGroup.add(roomMesh(unitBox, doorMaterial, [doorWidth, doorHeight, wallThickness * 1.1], [doorWidth / 2, doorHeight / 2, 0]));
+    roomGroup.add(doorGroup);
+
+    const ceiling = roomMesh(unitPlane, ceilingMaterial, [width, depth, 1], [cx, wallHeight, cz]);
+    ceiling.rotation.x = Math.PI / 2;
+    roomGroup.add(ceiling);
+
+    // Projector screen on the front wall, projector behind the first row
+    roomGroup.add(roomMesh(unitPlane, screenMaterial, [screenWidth, screenHeight, 1], [cx, screenY, z0 + wallThickness * 0.51]));
+    const stand = roomMesh(unitBox, projectorStandMaterial, [0.5, projectorStandHeight, 0.5], [cx, projectorStandHeight / 2, room.z1 + 4]);
+    const projector = roomMesh(unitBox, projectorMaterial, [1.0, projectorHeight, 1.2], [cx, projectorStandHeight + projectorHeight / 2, room.z1 + 4]);
+    stand.castShadow = projector.castShadow = true;
+    roomGroup.add(stand, projector);
+    return [x0, z0, x1, z1];
+}
+
+// Rebuild the rooms and grid for the floor being shown
+function showRooms() {
+    if (gridHelper) {
+        gridHelper.geometry.dispose();
+        gridHelper.material.dispose();
+    }
+    roomGroup.clear();
+    let bounds = null;
+    layoutRooms.filter(onViewedFloor).forEach(room => {
+        const [x0, z0, x1, z1] = buildRoom(room);
+        bounds = bounds ? [Math.min(bounds[0], x0), Math.min(bounds[1], z0), Math.max(bounds[2], x1), Math.max(bounds[3], z1)] : [x0, z0, x1, z1];
+    });
+    if (!bounds) return;
+    // One-unit cells over the whole floor
+    const size = Math.ceil(Math.max(bounds[2] - bounds[0], bounds[3] - bounds[1]));
+    gridHelper = new THREE.GridHelper(size, size, 0xCCCCCC, 0x999999);
+    gridHelper.position.set((bounds[0] + bounds[2]) / 2, 0.01, (bounds[1] + bounds[3]) / 2);
+    gridHelper.visible = gridVisible;
+    roomGroup.add(gridHelper);
+}
+
+// PC status colours
+const statusColors = {
+    'active': new THREE.Color(0x4CAF50),
+    'user': new THREE.Color(0x2196F3),
+    'conflict': new THREE.Color(0xf44336),
+    'backup': new THREE.Color(0xFFC107)
+};
+const conflictColor = new THREE.Color(0xff0000);
+const remoteColor = new THREE.Color(0xFFA500);
+const ledIdleColor = new THREE.Color(0x00ff00);
+const screenIdleColor = new THREE.Color(0x000000);
+
+// One InstancedMesh per PC part. Geometry and material are shared by the
+// whole fleet; each PC is an instance whose matrix places it and whose
+// instance colour carries its status, so the lab is one draw call per part.
+// scale says which axes follow pc.size_variation. The 'far' part is the
+// low-detail model drawn instead of all the others for distant PCs.
+const pcParts = {
+    desk: { geometry: new THREE.BoxGeometry(2.0, 0.7, 1.5), material: new THREE.MeshPhongMaterial({ specular: 0x555555, shininess: 10 }), position: [0, 0.35, 0], scale: 'x', color: 0x8B4513, castShadow: true, receiveShadow: true },
+    tower: { geometry: new THREE.BoxGeometry(0.3, 0.8, 0.8), material: new THREE.MeshPhongMaterial({ specular: 0x555555, shininess: 30 }), position: [-0.8, 0.4, 0], scale: 'x', castShadow: true, receiveShadow: true },
+    led: { geometry: new THREE.SphereGeometry(0.05, 16, 16), material: new THREE.MeshBasicMaterial(), position: [-0.8, 0.6, 0.41], scale: 'xyz' },
+    monitor: { geometry: new THREE.BoxGeometry(1.2, 0.7, 0.1), material: new THREE.MeshPhongMaterial({ specular: 0x555555, shininess: 50 }), position: [0, 0.85, -0.5], scale: 'x', color: 0x333333, castShadow: true, receiveShadow: true },
+    stand: { geometry: new THREE.BoxGeometry(0.4, 0.2, 0.4), material: new THREE.MeshPhongMaterial(), position: [0, 0.45, -0.5], scale: 'x', color: 0x333333, castShadow: true },
+    screen: { geometry: new THREE.PlaneGeometry(1.0, 0.6), material: new THREE.MeshBasicMaterial({ side: THREE.DoubleSide }), position: [0, 0.85, -0.55], scale: 'x' },
+    keyboard: { geometry: new THREE.BoxGeometry(1.0, 0.05, 0.4), material: new THREE.MeshPhongMaterial(), position: [0, 0.375, -0.2], scale: 'x', color: 0x222222, castShadow: true },
+    box: { geometry: new THREE.BoxGeometry(2.0, 1.2, 1.5), material: new THREE.MeshLambertMaterial(), position: [0, 0.6, 0], scale: 'x', lod: 'far', castShadow: true, receiveShadow: true }
+};
+
+// Level of detail: PCs further than LOD_DISTANCE from the camera get the box,
+// closer ones the full model; the hysteresis stops PCs on the boundary from
+// flipping back and forth. slotDetail is 1 for slots drawn in full detail.
+const LOD_DISTANCE = 60;
+const LOD_HYSTERESIS = 5;
+let slotDetail = new Uint8Array(0);
+const hiddenMatrix = new THREE.Matrix4().makeScale(0, 0, 0);
+const lodCamera = new THREE.Vector3(Infinity, Infinity, Infinity);
+
+// PC models
+const pcMeshes = {};
+let pcCapacity = 0;
+const pcSlots = {};
+let slotPcIds = [];
+let pcs = [];
+const pcById = {};
+let selectedPc = null;
+
+// Slots of PCs whose screen and LED pulse (conflict or remote session),
+// keyed by PC id, so each frame only visits PCs that actually animate
+const animatedSlots = new Map();
+
+// Delta sync state: last epoch/seq applied from the server
+let syncEpoch = null;
+let syncSeq = null;
+let syncPending = false;
+
+// Fields that feed each kind of instance attribute
+const transformFields = ['x', 'z', 'size_variation', 'rotation_y'];
+const colorFields = ['status', 'remote_active'];
+
+// Socket.io connection
+const socket = io();
+
+// (Re)allocate the instanced meshes when the fleet outgrows them
+function ensureCapacity(count) {
+    if (count <= pcCapacity && Object.keys(pcMeshes).length) return;
+    pcCapacity = Math.max(64, 2 ** Math.ceil(Math.log2(Math.max(count, 1))));
+    slotDetail = new Uint8Array(pcCapacity);
+    Object.entries(pcParts).forEach(([name, part]) => {
+        if (pcMeshes[name]) {
+            // Frees the old instance buffers on the GPU; geometry and material are shared and kept
+            dirtyRanges.delete(pcMeshes[name].instanceMatrix);
+            dirtyRanges.delete(pcMeshes[name].instanceColor);
+            scene.remove(pcMeshes[name]);
+            pcMeshes[name].dispose();
+        }
+        const mesh = new THREE.InstancedMesh(part.geometry, part.material, pcCapacity);
+        mesh.instanceMatrix.setUsage(THREE.DynamicDrawUsage);
+        mesh.castShadow = !!part.castShadow;
+        mesh.receiveShadow = !!part.receiveShadow;
+        // Instances are spread over the whole floor, so the part geometry's
+        // own bounding sphere can't be used for culling
+        mesh.frustumCulled = false;
+        mesh.userData.part = name;
+        // The colour attribute must exist before the first render compiles the shader
+        const color = new THREE.Color(part.color !== undefined ? part.color : 0x000000);
+        for (let i = 0; i < pcCapacity; i++) mesh.setColorAt(i, color);
+        mesh.count = 0;
+        pcMeshes[name] = mesh;
+        scene.add(mesh);
+    });
+}
+
+// Instance slots written since the last frame, per attribute, so only the
+// touched [min, max] range is uploaded instead of the whole buffer
+const dirtyRanges = new Map();
+
+function markDirty(attribute, slot) {
+    const range = dirtyRanges.get(attribute);
+    if (range) {
+        range[0] = Math.min(range[0], slot);
+        range[1] = Math.max(range[1], slot);
+    } else {
+        dirtyRanges.set(attribute, [slot, slot]);
+    }
+}
+
+function flushDirtyRanges() {
+    dirtyRanges.forEach(([min, max], attribute) => {
+        attribute.updateRange.offset = min * attribute.itemSize;
+        attribute.updateRange.count = (max - min + 1) * attribute.itemSize;
+        attribute.needsUpdate = true;
+    });
+    dirtyRanges.clear();
+}
+
+const instanceMatrix = new THREE.Matrix4();
+const pcMatrix = new THREE.Matrix4();
+const partMatrix = new THREE.Matrix4();
+
+// Write one PC's transforms into every part's instance slot; parts of the
+// other level of detail get a zero-scale matrix so they draw nothing
+function setPCTransform(slot, pc) {
+    pcMatrix.makeRotationY(pc.rotation_y).setPosition(pc.x, 0, pc.z);
+    const size = pc.size_variation;
+    const detailed = slotDetail[slot] === 1;
+    Object.entries(pcParts).forEach(([name, part]) => {
+        if ((part.lod === 'far') === detailed) {
+            pcMeshes[name].setMatrixAt(slot, hiddenMatrix);
+            markDirty(pcMeshes[name].instanceMatrix, slot);
+            return;
+        }
+        const [x, y, z] = part.position;
+        partMatrix.makeScale(size, part.scale === 'xyz' ? size : 1, part.scale === 'xyz' ? size : 1)
+            .setPosition(x * size, y, z);
+        instanceMatrix.multiplyMatrices(pcMatrix, partMatrix);
+        pcMeshes[name].setMatrixAt(slot, instanceMatrix);
+        markDirty(pcMeshes[name].instanceMatrix, slot);
+    });
+}
+
+function isNear(pc, wasNear) {
+    const dx = pc.x - camera.position.x;
+    const dz = pc.z - camera.position.z;
+    const limit = LOD_DISTANCE + (wasNear ? LOD_HYSTERESIS : -LOD_HYSTERESIS);
+    return dx * dx + camera.position.y * camera.position.y + dz * dz < limit * limit;
+}
+
+// Swap PCs between the full and the box model as the camera moves; only
+// the slots that cross the boundary are rewritten
+function updateLevelOfDetail() {
+    if (camera.position.distanceToSquared(lodCamera) < 1) return;
+    lodCamera.copy(camera.position);
+    slotPcIds.forEach((pcId, slot) => {
+        const pc = pcById[pcId];
+        const wasNear = slotDetail[slot] === 1;
+        const near = isNear(pc, wasNear);
+        if (near !== wasNear) {
+            slotDetail[slot] = near ? 1 : 0;
+            setPCTransform(slot, pc);
+        }
+    });
+}
+
+function updateAnimated(slot, pc) {
+    if (pc.status === 'conflict' || pc.remote_active) {
+        animatedSlots.set(pc.id, slot);
+    } else {
+        animatedSlots.delete(pc.id);
+    }
+}
+
+// Status colours: tower by status, LED and screen by conflict/remote state
+function setPCColors(slot, pc) {
+    updateAnimated(slot, pc);
+    const indicator = pc.status === 'conflict' ? conflictColor : pc.remote_active ? remoteColor : null;
+    pcMeshes.tower.setColorAt(slot, statusColors[pc.status] || statusColors.active);
+    pcMeshes.box.setColorAt(slot, pc.status === 'conflict' ? conflictColor : pc.remote_active ? remoteColor : statusColors[pc.status] || statusColors.active);
+    pcMeshes.led.setColorAt(slot, indicator || ledIdleColor);
+    pcMeshes.screen.setColorAt(slot, indicator || screenIdleColor);
+    ['tower', 'box', 'led', 'screen'].forEach(name => markDirty(pcMeshes[name].instanceColor, slot));
+}
+
+// Load initial data (or catch up after a reconnect)
+function loadInitialData() {
+    if (syncPending) return;
+    syncPending = true;
+    socket.emit('sync', { epoch: syncEpoch, seq: syncSeq });
+}
+
+// Apply a sequenced delta of changed fields per PC
+function applyDelta(changes) {
+    let floorChanged = false;
+    Object.entries(changes).forEach(([pcId, fields]) => {
+        const pc = pcById[pcId];
+        if (!pc) return;
+        Object.assign(pc, fields);
+        if ('floor' in fields) floorChanged = true;
+
+        // Only rewrite the instance attributes whose inputs changed
+        const slot = pcSlots[pcId];
+        if (slot !== undefined) {
+            if (transformFields.some(field => field in fields)) setPCTransform(slot, pc);
+            if (colorFields.some(field => field in fields)) setPCColors(slot, pc);
+        }
+
+        if (selectedPc && selectedPc.id === pcId) {
+            showPCDetails(pcId);
+        }
+    });
+    // PCs that changed floor appear on or leave the floor being shown
+    if (floorChanged) renderPCs();
+}
+
+// Render the PCs on the floor being shown
+function renderPCs() {
+    const shown = pcs.filter(onViewedFloor);
+    ensureCapacity(shown.length);
+    Object.keys(pcSlots).forEach(key => delete pcSlots[key]);
+    animatedSlots.clear();
+    slotPcIds = shown.map(pc => pc.id);
+    lodCamera.copy(camera.position);
+
+    shown.forEach((pc, slot) => {
+        pcSlots[pc.id] = slot;
+        slotDetail[slot] = isNear(pc, false) ? 1 : 0;
+        setPCTransform(slot, pc);
+        setPCColors(slot, pc);
+    });
+    Object.values(pcMeshes).forEach(mesh => { mesh.count = shown.length; });
+}
+
+// Update stats (counted on the server, see /api/stats)
+function updateStats(stats) {
+    document.getElementById('active-count').textContent = stats.active;
+    document.getElementById('user-count').textContent = stats.user;
+    document.getElementById('hardware-conflict-count').textContent = stats.hardware_conflict;
+    document.getElementById('software-conflict-count').textContent = stats.software_conflict;
+    document.getElementById('remote-count').textContent = stats.remote;
+}
+
+// Show PC details
+function showPCDetails(pcId) {
+    const pc = pcById[pcId];
+    if (!pc) return;
+
+    selectedPc = pc;
+    const details = document.getElementById('pc-details');
+
+    document.getElementById('pc-title').textContent = pc.id;
+    document.getElementById('pc-status').textContent = `Status: ${pc.status.toUpperCase()}`;
+    document.getElementById('pc-conflict-type').textContent = pc.conflict_type ? `Conflict Type: ${pc.conflict_type.replace('_', ' ').toUpperCase()}` : '';
+    document.getElementById('pc-remote-status').textContent = `Remote: ${pc.remote_active ? 'Active' : 'Inactive'}`;
+    document.getElementById('pc-location').textContent = `Location: ${pc.location}`;
+    document.getElementById('pc-last-updated').textContent = `Updated: ${pc.last_updated}`;
+    document.getElementById('pc-os-version').textContent = `OS: ${pc.os_version}`;
+    document.getElementById('pc-uptime').textContent = `Uptime: ${pc.uptime} hours`;
+
+    document.getElementById('pc-cpu').textContent = pc.cpu;
+    document.getElementById('cpu-bar').style.width = `${pc.cpu}%`;
+    document.getElementById('pc-ram').textContent = pc.ram;
+    document.getElementById('ram-bar').style.width = `${pc.ram}%`;
+    document.getElementById('pc-disk').textContent = pc.disk;
+    document.getElementById('disk-bar').style.width = `${pc.disk}%`;
+
+    // Action buttons (only in control panel)
+    const actionsDiv = document.getElementById('pc-actions');
+    actionsDiv.innerHTML = '';
+
+    if (showControls) {
+        const actions = [
+            { name: 'Restart', action: 'restart', color: '#4CAF50' },
+            { name: 'Shutdown', action: 'shutdown', color: '#f44336' },
+            { name: 'Remote', action: 'remote', color: '#2196F3' }
+        ];
+
+        if (pc.status === 'conflict') {
+            actions.push({ name: 'Resolve', action: 'resolve', color: '#FFC107' });
+        }
+        if (pc.status === 'active') {
+            actions.push({ name: 'Assign', action: 'assign', color: '#2196F3' });
+        }
+        if (pc.status === 'user') {
+            actions.push({ name: 'Release', action: 'release', color: '#4CAF50' });
+        }
+
+        actions.forEach(action => {
+            const btn = document.createElement('button');
+            btn.textContent = action.name;
+            btn.style.backgroundColor = action.color;
+            btn.style.margin = '5px';
+            btn.onclick = () => handleAction(pc.id, action.action);
+            actionsDiv.appendChild(btn);
+        });
+    }
+
+    details.style.display = 'block';
+}
+
+// Handle PC actions
+function handleAction(pcId, action) {
+    fetch(`/api/pcs/${pcId}/action`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ action: action })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            alert(data.message);
+        } else {
+            alert('Error: ' + data.message);
+        }
+    });
+}
+
+// Close details
+function closeDetails() {
+    document.getElementById('pc-details').style.display = 'none';
+    selectedPc = null;
+}
+
+// Refresh data
+function refreshData() {
+    fetch('/api/pcs/refresh', { method: 'POST' })
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                alert('Error: ' + data.message);
+            }
+        });
+}
+
+// Reset camera
+function resetCamera() {
+    camera.position.set(10, 15, 15);
+    controls.target.set(0, 0, 0);
+    controls.update();
+}
+
+// Toggle grid
+function toggleGrid() {
+    gridVisible = !gridVisible;
+    if (gridHelper) gridHelper.visible = gridVisible;
+}
+
+// Handle clicks
+function onMouseClick(event) {
+    const mouse = new THREE.Vector2(
+        (event.clientX / window.innerWidth) * 2 - 1,
+        -(event.clientY / window.innerHeight) * 2 + 1
+    );
+
+    const raycaster = new THREE.Raycaster();
+    raycaster.setFromCamera(mouse, camera);
+
+    const intersects = raycaster.intersectObjects(Object.values(pcMeshes), false);
+
+    if (intersects.length > 0 && intersects[0].instanceId !== undefined) {
+        const pcId = slotPcIds[intersects[0].instanceId];
+        if (pcId) {
+            showPCDetails(pcId);
+        }
+    }
+}
+
+// Handle window resize
+function onWindowResize() {
+    camera.aspect = window.innerWidth / window.innerHeight;
+    camera.updateProjectionMatrix();
+    renderer.setSize(window.innerWidth, window.innerHeight);
+}
+
+// One floor is shown at a time: ?floor= picks it and PageUp/PageDown change
+// it. View streaming: on fleets too big to hold whole (or with ?view) the
+// client subscribes to the layout rooms its camera covers on that floor and
+// only receives those PCs; ?room=, ?row= and ?status= (comma-separated
+// lists) subscribe to the matching PCs instead of following the camera.
+const FULL_SYNC_LIMIT = 2000;
+const VIEW_RANGE = 150;
+const pageParams = new URLSearchParams(window.location.search);
+let viewMode = false;
+let viewFloor = Number(pageParams.get('floor')) || null;
+let viewFloors = null;
+let viewKey = null;
+let viewTimer = null;
+let viewFields = [];
+let viewChannels = new Set();
+const selectorParams = ['room', 'row', 'status'].filter(name => pageParams.has(name));
+
+// Also true for everything without a floor (older saved labs, the default room)
+function onViewedFloor(item) {
+    return viewFloor === null || item.floor === null || item.floor === undefined || item.floor === viewFloor;
+}
+
+const groundPlane = new THREE.Plane(new THREE.Vector3(0, 1, 0), 0);
+const viewRaycaster = new THREE.Raycaster();
+const viewCorners = [[-1, -1], [1, -1], [1, 1], [-1, 1], [0, 0]].map(([x, y]) => new THREE.Vector2(x, y));
+const groundPoint = new THREE.Vector3();
+
+// Camera footprint on the floor as [x0, z0, x1, z1]: where rays through the
+// screen corners hit it, cut off at VIEW_RANGE for rays near the horizon
+function viewRegion() {
+    let x0 = camera.position.x, z0 = camera.position.z, x1 = x0, z1 = z0;
+    viewCorners.forEach(corner => {
+        viewRaycaster.setFromCamera(corner, camera);
+        const ray = viewRaycaster.ray;
+        if (!ray.intersectPlane(groundPlane, groundPoint) || groundPoint.distanceTo(camera.position) > VIEW_RANGE) {
+            groundPoint.copy(ray.direction).setY(0).normalize().multiplyScalar(VIEW_RANGE).add(camera.position);
+        }
+        x0 = Math.min(x0, groundPoint.x);
+        z0 = Math.min(z0, groundPoint.z);
+        x1 = Math.max(x1, groundPoint.x);
+        z1 = Math.max(z1, groundPoint.z);
+    });
+    return [x0, z0, x1, z1];
+}
+
+// The region is rounded out to 10 units so small camera moves don't resubscribe
+function sendView() {
+    const view = { floor: viewFloor };
+    if (selectorParams.length) {
+        selectorParams.forEach(name => {
+            view[name] = pageParams.get(name).split(',').map(value => (name === 'row' ? Number(value) : value));
+        });
+    } else {
+        view.region = viewRegion().map((value, i) => (i < 2 ? Math.floor(value / 10) : Math.ceil(value / 10)) * 10);
+    }
+    const key = JSON.stringify(view);
+    if (key === viewKey) return;
+    viewKey = key;
+    socket.emit('subscribe', view);
+}
+
+function scheduleView() {
+    if (!viewMode || viewTimer) return;
+    viewTimer = setTimeout(() => {
+        viewTimer = null;
+        sendView();
+    }, 250);
+}
+
+function startStreaming() {
+    if (viewMode) {
+        sendView();
+    } else {
+        loadInitialData();
+    }
+}
+
+controls.addEventListener('change', scheduleView);
+
+// Socket.io events
+socket.on('connect', () => {
+    syncPending = false;
+    viewKey = null;
+    if (viewFloors) {
+        startStreaming();
+        return;
+    }
+    // The layout decides between whole-fleet sync and view streaming
+    fetch('/api/layout')
+        .then(response => response.json())
+        .then(data => {
+            const total = data.rooms.reduce((sum, room) => sum + room.count, 0);
+            viewFloors = [...new Set(data.rooms.map(room => room.floor))].sort((a, b) => a - b);
+            viewMode = pageParams.has('view') || selectorParams.length > 0 || total > FULL_SYNC_LIMIT;
+            if (viewFloors.length && !viewFloors.includes(viewFloor)) viewFloor = viewFloors[0];
+            if (data.rooms.length) layoutRooms = data.rooms;
+            showRooms();
+            startStreaming();
+        })
+        .catch(() => {
+            viewFloor = null;
+            showRooms();
+            loadInitialData();
+        });
+});
+
+// The channel a PC is in, keyed like the server's [values] lists; rows
+// come from the location ('Row-3, Seat-2')
+function channelOf(pc) {
+    return JSON.stringify(viewFields.map(field => {
+        if (field !== 'row') return pc[field];
+        const match = /^Row-(\d+)/.exec(pc.location || '');
+        return match ? Number(match[1]) : null;
+    }));
+}
+
+function dropOutOfView() {
+    pcs = pcs.filter(pc => viewChannels.has(channelOf(pc)));
+    Object.keys(pcById).forEach(key => delete pcById[key]);
+    pcs.forEach(pc => { pcById[pc.id] = pc; });
+    if (selectedPc && !pcById[selectedPc.id]) closeDetails();
+}
+
+// PCs of the channels entered since the last subscribe; PCs of channels
+// that left the view are dropped
+socket.on('view_update', (data) => {
+    viewFields = data.fields;
+    viewChannels = new Set(data.channels.map(values => JSON.stringify(values)));
+    dropOutOfView();
+    data.pcs.forEach(pc => {
+        if (pcById[pc.id]) {
+            Object.assign(pcById[pc.id], pc);
+        } else {
+            pcs.push(pc);
+            pcById[pc.id] = pc;
+        }
+    });
+    renderPCs();
+    updateStats(data.stats);
+});
+
+// PCs that moved into a channel in view arrive as full records; ones that
+// moved out arrive as a change that puts them outside every channel
+socket.on('view_delta', (data) => {
+    let membership = false;
+    Object.entries(data.changes).forEach(([pcId, fields]) => {
+        if (!pcById[pcId] && fields.id === pcId) {
+            pcs.push(fields);
+            pcById[pcId] = fields;
+            membership = true;
+        }
+    });
+    applyDelta(data.changes);
+    if (membership || Object.keys(data.changes).some(pcId => pcById[pcId] && !viewChannels.has(channelOf(pcById[pcId])))) {
+        dropOutOfView();
+        renderPCs();
+    }
+});
+
+socket.on('pcs_snapshot', (data) => {
+    syncPending = false;
+    syncEpoch = data.epoch;
+    syncSeq = data.seq;
+    pcs = data.pcs;
+    Object.keys(pcById).forEach(key => delete pcById[key]);
+    pcs.forEach(pc => { pcById[pc.id] = pc; });
+    renderPCs();
+    updateStats(data.stats);
+});
+
+socket.on('stats_update', updateStats);
+
+socket.on('pcs_delta', (data) => {
+    if (data.epoch !== syncEpoch || data.since !== syncSeq) {
+        // Missed a delta or the server restarted: resync
+        if (data.epoch !== syncEpoch || data.seq > syncSeq) {
+            loadInitialData();
+        }
+        return;
+    }
+    syncPending = false;
+    syncSeq = data.seq;
+    applyDelta(data.changes || expandColumns(data.columns));
+});
+
+// Column-wise deltas (whole-fleet refreshes) back to {pcId: fields}
+function expandColumns(columns) {
+    const changes = {};
+    columns.groups.forEach(group => {
+        const names = Object.keys(group.columns);
+        group.ids.forEach((pcId, i) => {
+            const fields = {};
+            names.forEach(name => { fields[name] = group.columns[name][i]; });
+            changes[pcId] = fields;
+        });
+    });
+    return changes;
+}
+
+// Optional perf HUD: open the page with ?perf or press P to toggle
+const perfHud = document.createElement('div');
+perfHud.id = 'perf-hud';
+document.body.appendChild(perfHud);
+perfHud.style.display = new URLSearchParams(window.location.search).has('perf') ? 'block' : 'none';
+const perfSamples = [];
+let lastFrameStart = performance.now();
+
+function updatePerfHud(frameStart, workMs) {
+    perfSamples.push([frameStart - lastFrameStart, workMs]);
+    lastFrameStart = frameStart;
+    if (perfSamples.length < 30) return;
+    const frameMs = perfSamples.reduce((sum, sample) => sum + sample[0], 0) / perfSamples.length;
+    const cpuMs = perfSamples.reduce((sum, sample) => sum + sample[1], 0) / perfSamples.length;
+    perfSamples.length = 0;
+    perfHud.textContent = `${(1000 / frameMs).toFixed(0)} fps | frame ${frameMs.toFixed(2)} ms | ` +
+        `cpu ${cpuMs.toFixed(2)} ms | draw calls ${renderer.info.render.calls} | ` +
+        `PCs ${pcs.length} | detailed ${slotDetail.subarray(0, pcs.length).reduce((sum, near) => sum + near, 0)} | ` +
+        `animated ${animatedSlots.size}` + (viewFloors && viewFloors.length > 1 ? ` | floor ${viewFloor}` : '');
+}
+
+window.addEventListener('keydown', (event) => {
+    if (event.key === 'p' || event.key === 'P') {
+        perfHud.style.display = perfHud.style.display === 'none' ? 'block' : 'none';
+    }
+    if (viewFloors && (event.key === 'PageUp' || event.key === 'PageDown')) {
+        const index = viewFloors.indexOf(viewFloor) + (event.key === 'PageUp' ? 1 : -1);
+        if (index >= 0 && index < viewFloors.length) {
+            viewFloor = viewFloors[index];
+            showRooms();
+            if (selectedPc && !onViewedFloor(selectedPc)) closeDetails();
+            if (viewMode) {
+                sendView();
+            } else {
+                renderPCs();
+            }
+        }
+    }
+});
+
+// Animation loop
+const pulseColor = new THREE.Color();
+
+function animate() {
+    requestAnimationFrame(animate);
+    const frameStart = performance.now();
+    controls.update();
+    updateLevelOfDetail();
+
+    // Animate conflict PCs and remote sessions through their instance colours
+    if (pcMeshes.screen) {
+        const conflictIntensity = 0.5 + 0.5 * Math.sin(Date.now() * 0.005);
+        const remoteIntensity = 0.5 + 0.5 * Math.sin(Date.now() * 0.003);
+        const screenColors = pcMeshes.screen.instanceColor;
+        const ledColors = pcMeshes.led.instanceColor;
+        animatedSlots.forEach((slot, pcId) => {
+            // Distant PCs show only the box, which has no screen or LED
+            if (!slotDetail[slot]) return;
+            if (pcById[pcId].status === 'conflict') {
+                pulseColor.setRGB(conflictIntensity, 0, 0);
+            } else {
+                pulseColor.setRGB(remoteIntensity, 0.5, 0);
+            }
+            pcMeshes.screen.setColorAt(slot, pulseColor);
+            pcMeshes.led.setColorAt(slot, pulseColor);
+            markDirty(screenColors, slot);
+            markDirty(ledColors, slot);
+        });
+    }
+
+    flushDirtyRanges();
+
+    renderer.render(scene, camera);
+    if (perfHud.style.display !== 'none') {
+        updatePerfHud(frameStart, performance.now() - frameStart);
+    }
+
+    // Cold-start time to the first frame that shows the fleet, measured from navigation start
+    if (!window.labTiming && pcs.length) {
+        performance.mark('lab-first-frame');
+        window.labTiming = { firstFrame: performance.now() };
+        console.info(`Time to first frame: ${window.labTiming.firstFrame.toFixed(0)} ms`);
+    }
+}
+
+// Soak test: open the page with ?soak=100000 to push that many synthetic
+// status/remote deltas through applyDelta and log GPU resource counts and
+// JS heap before and after; all of them should stay flat
+function runSoakTest(total) {
+    const statuses = Object.keys(statusColors);
+    const sample = () => ({
+        geometries: renderer.info.memory.geometries,
+        textures: renderer.info.memory.textures,
+        heapMB: performance.memory ? +(performance.memory.usedJSHeapSize / 1048576).toFixed(1) : null
+    });
+    const before = sample();
+    let done = 0;
+
+    function step() {
+        const changes = {};
+        for (let i = 0; i < 1000 && done < total; i++, done++) {
+            const pc = pcs[Math.floor(Math.random() * pcs.length)];
+            changes[pc.id] = { status: statuses[done % statuses.length], remote_active: Math.random() > 0.5 };
+        }
+        applyDelta(changes);
+        if (done < total) {
+            requestAnimationFrame(step);
+        } else {
+            console.info('Soak test', { updates: total, before, after: sample() });
+        }
+    }
+    step();
+}
+
+const soakUpdates = Number(new URLSearchParams(window.location.search).get('soak'));
+if (soakUpdates > 0) {
+    socket.once('pcs_snapshot', () => setTimeout(() => runSoakTest(soakUpdates), 1000));
+}
+
+// Event listeners
+window.addEventListener('click', onMouseClick, false);
+window.addEventListener('resize', onWindowResize, false);
+
+// Initialize (initial data arrives on socket connect)
+showRooms();
+animate();
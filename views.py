@@ -0,0 +1,163 @@
+import itertools
+import math
+from operator import attrgetter
+
+# Most PCs one region view streams; when a camera covers more, the rooms
+# nearest the centre of its footprint win
+VIEW_LIMIT = 5000
+# Most channels one selector may expand to
+MAX_CHANNELS = 1000
+
+# Fields a subscription selects on, as clients name them, and the PC record
+# attribute each reads. A channel is (attributes, values), attributes in this
+# order, so every PC is in exactly one channel per set of attributes.
+SELECTOR_FIELDS = {'floor': 'floor', 'room': 'room', 'row': 'lab_row', 'status': 'status'}
+SELECTOR_NAMES = {attribute: name for name, attribute in SELECTOR_FIELDS.items()}
+ROOM_SHAPE = ('floor', 'room')
+
+
+class ViewError(ValueError):
+    pass
+
+
+def parse_view(data):
+    # -> (selector, region). Either {'floor': 2, 'region': [x0, z0, x1, z1]}
+    # for a camera footprint on the floor plan, or a selector such as
+    # {'floor': 2, 'room': 'Room-204'} or {'room': 'Lab', 'status': ['conflict', 'user']}.
+    # selector maps record attributes to lists of accepted values.
+    if not isinstance(data, dict):
+        raise ViewError('View must be an object')
+    unknown = [name for name in data if name not in SELECTOR_FIELDS and name != 'region']
+    if unknown:
+        raise ViewError(f"Unknown view fields: {', '.join(unknown)}")
+    selector = {}
+    for name, attribute in SELECTOR_FIELDS.items():
+        if data.get(name) is None:
+            continue
+        values = data[name] if isinstance(data[name], list) else [data[name]]
+        kind = int if name in ('floor', 'row') else str
+        if not values or not all(isinstance(v, kind) and not isinstance(v, bool) for v in values):
+            raise ViewError(f"{name} must be {'an integer' if kind is int else 'a string'} or a list of them")
+        selector[attribute] = list(dict.fromkeys(values))
+    region = data.get('region')
+    if region is None:
+        if not selector:
+            raise ViewError('View needs a region or at least one of floor, room, row, status')
+        return selector, None
+    if (not isinstance(region, list) or len(region) != 4
+            or not all(isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v) for v in region)):
+        raise ViewError('region must be [x0, z0, x1, z1]')
+    if set(selector) - {'floor'}:
+        raise ViewError('A region view can only be narrowed by floor')
+    return selector, tuple(region)
+
+
+def wire_view(keys):
+    # (field names, [values...]) as sent to clients, e.g. (['floor', 'room'], [[1, 'Lab']])
+    shape = next(iter(keys))[0] if keys else ROOM_SHAPE
+    return [SELECTOR_NAMES[attribute] for attribute in shape], sorted(list(values) for _, values in keys)
+
+
+class ViewRegistry:
+    # Which channels each client streams, keyed by Socket.IO sid. Each
+    # channel is one Socket.IO room; channels counts clients per channel, so
+    # splitting a delta costs one lookup per changed PC per selector shape in
+    # use and nothing while nobody subscribes, and each part only goes to the
+    # clients that asked for it.
+    def __init__(self, limit=VIEW_LIMIT):
+        self.limit = limit
+        self.views = {}
+        self.channels = {}
+        self.getters = {}
+
+    def __len__(self):
+        return len(self.views)
+
+    def resolve(self, rooms, selector, region=None):
+        # Channel keys for a parsed view; rooms as from fleet.rooms()
+        if region is None:
+            shape = tuple(attribute for attribute in SELECTOR_FIELDS.values() if attribute in selector)
+            combinations = math.prod(len(selector[attribute]) for attribute in shape)
+            if combinations > MAX_CHANNELS:
+                raise ViewError(f'View selects {combinations} channels, more than {MAX_CHANNELS}')
+            return {(shape, values) for values in itertools.product(*(selector[attribute] for attribute in shape))}
+        floors = selector.get('floor')
+        x0, z0, x1, z1 = region
+        x0, x1 = min(x0, x1), max(x0, x1)
+        z0, z1 = min(z0, z1), max(z0, z1)
+        candidates = [
+            r for r in rooms
+            if (floors is None or r['floor'] in floors)
+            and r['x0'] <= x1 and r['x1'] >= x0 and r['z0'] <= z1 and r['z1'] >= z0
+        ]
+        cx, cz = (x0 + x1) / 2, (z0 + z1) / 2
+        candidates.sort(key=lambda r: max(r['x0'] - cx, 0, cx - r['x1']) ** 2 + max(r['z0'] - cz, 0, cz - r['z1']) ** 2)
+        keys = set()
+        total = 0
+        for r in candidates:
+            if keys and total + r['count'] > self.limit:
+                break
+            keys.add((ROOM_SHAPE, (r['floor'], r['room'])))
+            total += r['count']
+        return keys
+
+    def subscribe(self, sid, keys):
+        # Replaces the client's view; returns the (added, removed) channels
+        current = self.views.get(sid, set())
+        added, removed = keys - current, current - keys
+        for shape, values in added:
+            watched = self.channels.setdefault(shape, {})
+            watched[values] = watched.get(values, 0) + 1
+            if shape not in self.getters:
+                getter = attrgetter(*shape)
+                self.getters[shape] = getter if len(shape) > 1 else (lambda record, getter=getter: (getter(record),))
+        for key in removed:
+            self._unwatch(key)
+        self.views[sid] = set(keys)
+        return added, removed
+
+    def unsubscribe(self, sid):
+        keys = self.views.pop(sid, set())
+        for key in keys:
+            self._unwatch(key)
+        return keys
+
+    def _unwatch(self, key):
+        shape, values = key
+        watched = self.channels[shape]
+        watched[values] -= 1
+        if not watched[values]:
+            del watched[values]
+            if not watched:
+                del self.channels[shape]
+
+    def rows(self, fleet, key):
+        shape, values = key
+        return fleet.find_rows(**dict(zip(shape, values)))
+
+    def split(self, fleet, changes):
+        # {channel: changes} for the watched channels a delta touches. A PC
+        # whose change moves it into a channel is sent there as a full record;
+        # the channels it may have left get the change so clients can drop it.
+        channels = self.channels
+        if not channels:
+            return {}
+        parts = {}
+        rows = fleet.rows
+        records = fleet.records
+        for shape, watched in channels.items():
+            getter = self.getters[shape]
+            for pc_id, fields in changes.items():
+                row = rows.get(pc_id)
+                if row is None:
+                    continue
+                values = getter(records[row])
+                moved = any(attribute in fields for attribute in shape)
+                if values in watched:
+                    parts.setdefault((shape, values), {})[pc_id] = fleet.to_dict(row) if moved else fields
+                if moved:
+                    fixed = [i for i, attribute in enumerate(shape) if attribute not in fields]
+                    for other in watched:
+                        if other != values and all(other[i] == values[i] for i in fixed):
+                            parts.setdefault((shape, other), {})[pc_id] = fields
+        return parts